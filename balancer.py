@@ -0,0 +1,202 @@
+'''balancer.py'''
+
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Set
+import httpx
+from gateway_config import gateway_settings
+from resilience import RETRY_STATUSES
+
+P2C, LEAST_OUTSTANDING = "p2c", "least_outstanding"
+
+class Replica:
+    '''Класс реплики сервиса: адрес, число выполняемых запросов и состояние исключения'''
+    def __init__(self, url: str):
+        self.url = httpx.URL(url)
+        self.outstanding = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until: Optional[float] = None
+        self.readmitted_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def healthy(self) -> bool:
+        '''Принимает ли реплика запросы'''
+        return self.ejected_until is None
+
+    def stats(self) -> dict:
+        '''Функция состояния реплики'''
+        return {"healthy": self.healthy, "outstanding": self.outstanding,
+                "consecutive_failures": self.failures, "ejections": self.ejections}
+
+class LoadBalancer:
+    '''Класс балансировки запросов по репликам сервиса
+
+    Реплика выбирается по меньшему числу выполняемых запросов: из двух случайных
+    (p2c) или из всех (least_outstanding). После UPSTREAM_EJECT_FAILURES ошибок
+    подряд (сетевых, тайм-аутов, 502/503/504) реплика исключается на
+    UPSTREAM_EJECT_SECONDS, с каждым повторным исключением вдвое дольше. По
+    истечении срока реплике отправляется проверочный запрос, и она возвращается
+    в работу, если ответила. После UPSTREAM_EJECT_RESET_SECONDS работы без
+    исключений срок снова начинается с минимального. Если исключены все реплики,
+    запросы идут на все.
+    '''
+    def __init__(self, name: str, urls: Sequence[str], strategy: str = P2C):
+        if not urls:
+            raise ValueError(f"Upstream {name} has no replicas")
+        if strategy not in (P2C, LEAST_OUTSTANDING):
+            raise ValueError(f"Unknown balancing strategy: {strategy}")
+        self.name = name
+        self.strategy = strategy
+        self.replicas = [Replica(url) for url in urls]
+
+    def due_probes(self, now: float) -> List[Replica]:
+        '''Функция исключенных реплик, срок исключения которых истек'''
+        return [replica for replica in self.replicas
+                if not replica.healthy and not replica.probing and replica.ejected_until <= now]
+
+    def choose(self) -> Replica:
+        '''Функция выбора реплики для запроса'''
+        candidates = [replica for replica in self.replicas if replica.healthy] or self.replicas
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == P2C:
+            candidates = random.sample(candidates, 2)
+        least = min(replica.outstanding for replica in candidates)
+        return random.choice([replica for replica in candidates if replica.outstanding == least])
+
+    def record(self, replica: Replica, failed: bool):
+        '''Функция учета результата запроса к реплике'''
+        if not failed:
+            replica.failures = 0
+            if replica.readmitted_at is not None and time.monotonic() - replica.readmitted_at \
+                    >= gateway_settings.UPSTREAM_EJECT_RESET_SECONDS:
+                # Реплика долго работает без исключений: следующее исключение снова короткое
+                replica.ejections = 0
+                replica.readmitted_at = None
+            return
+        replica.failures += 1
+        if replica.healthy and replica.failures >= gateway_settings.UPSTREAM_EJECT_FAILURES:
+            self.eject(replica)
+
+    def eject(self, replica: Replica):
+        '''Функция исключения реплики до проверки'''
+        duration = min(gateway_settings.UPSTREAM_EJECT_SECONDS * 2 ** replica.ejections,
+                       gateway_settings.UPSTREAM_EJECT_MAX_SECONDS)
+        replica.ejected_until = time.monotonic() + duration
+        replica.ejections += 1
+        print(f"Replica {replica.url} of {self.name} ejected for {duration:.0f}s")
+
+    def readmit(self, replica: Replica):
+        '''Функция возврата реплики в работу'''
+        replica.ejected_until = None
+        replica.failures = 0
+        replica.readmitted_at = time.monotonic()
+        print(f"Replica {replica.url} of {self.name} re-admitted")
+
+    def stats(self) -> Dict[str, dict]:
+        '''Функция состояния реплик'''
+        return {str(replica.url): replica.stats() for replica in self.replicas}
+
+class BalancingTransport(httpx.AsyncBaseTransport):
+    '''Класс транспорта httpx, отправляющего запросы к сервисам на их реплики
+
+    Запросы к логическому адресу сервиса (http://user-service) переадресуются на
+    реплику, выбранную балансировщиком этого сервиса; остальные адреса не меняются.
+    '''
+    def __init__(self, transport: httpx.AsyncBaseTransport,
+                 balancers: Dict[str, LoadBalancer]):
+        self.transport = transport
+        # Балансировщики по логическому имени хоста сервиса
+        self.balancers = balancers
+        self._probes: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _route(request: httpx.Request, logical: httpx.URL, replica: Replica):
+        url = replica.url
+        path = url.raw_path.rstrip(b"/") + logical.raw_path
+        request.url = logical.copy_with(scheme=url.scheme, host=url.host, port=url.port,
+                                        raw_path=path)
+        request.headers["host"] = url.netloc.decode("ascii")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Повтор отправляет тот же запрос: реплика выбирается заново по исходному адресу
+        logical = request.extensions.get("logical_url", request.url)
+        balancer = self.balancers.get(logical.host)
+        if balancer is None:
+            return await self.transport.handle_async_request(request)
+        request.extensions["logical_url"] = logical
+        self._start_probes(balancer)
+        replica = balancer.choose()
+        self._route(request, logical, replica)
+        replica.outstanding += 1
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError:
+            replica.outstanding -= 1
+            balancer.record(replica, True)
+            raise
+        except BaseException:
+            # Отмена (общий тайм-аут или разрыв соединения клиента) не говорит о реплике
+            replica.outstanding -= 1
+            raise
+        balancer.record(replica, response.status_code in RETRY_STATUSES)
+        try:
+            response.content
+        except httpx.ResponseNotRead:
+            # Тело еще не прочитано: запрос выполняется, пока тело не закрыто
+            response.stream = _ReleasingStream(response.stream, replica)
+        else:
+            replica.outstanding -= 1
+        return response
+
+    def _start_probes(self, balancer: LoadBalancer):
+        for replica in balancer.due_probes(time.monotonic()):
+            replica.probing = True
+            task = asyncio.ensure_future(self._probe(balancer, replica))
+            self._probes.add(task)
+            task.add_done_callback(self._probes.discard)
+
+    async def _probe(self, balancer: LoadBalancer, replica: Replica):
+        '''Функция проверки исключенной реплики: любой ответ, кроме 5xx, возвращает ее'''
+        url = replica.url.copy_with(raw_path=replica.url.raw_path.rstrip(b"/")
+                                    + gateway_settings.UPSTREAM_PROBE_PATH.encode())
+        request = httpx.Request("GET", url, extensions={"timeout": httpx.Timeout(
+            gateway_settings.UPSTREAM_PROBE_TIMEOUT).as_dict()})
+        alive = False
+        try:
+            response = await self.transport.handle_async_request(request)
+            await response.aclose()
+            alive = response.status_code < 500
+        except httpx.TransportError:
+            pass
+        finally:
+            replica.probing = False
+        if alive:
+            balancer.readmit(replica)
+        else:
+            balancer.eject(replica)
+
+    async def aclose(self):
+        for task in list(self._probes):
+            task.cancel()
+        await self.transport.aclose()
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    '''Класс тела ответа, по закрытии которого запрос к реплике считается завершенным'''
+    def __init__(self, stream, replica: Replica):
+        self.stream = stream
+        self.replica = replica
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        if not self._released:
+            self._released = True
+            self.replica.outstanding -= 1
+        await self.stream.aclose()
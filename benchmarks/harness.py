@@ -0,0 +1,305 @@
+'''harness.py
+
+Бенчмарк шлюза без сети: user-service и task-service подменяются заглушками в
+том же процессе (benchmarks/stubs.py), маршруты router.py и запросы GraphQL
+прогоняются с фиксированной параллельностью. Отчет (JSON): пропускная
+способность, p50/p95/p99, накладные расходы шлюза (время ответа минус время
+ожидания сервисов) и RSS процесса.
+
+Запуск из корня репозитория:
+    python -m benchmarks.harness --tasks 10,1000,50000 --concurrency 16 --requests 200
+'''
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import httpx
+import jwt
+from benchmarks.stubs import StubConfig, make_data, task_service, user_service
+from email_config import email_settings
+from gateway_config import gateway_settings
+from response_cache import response_cache
+from singleflight import SingleFlight
+from token_cache import token_cache
+from upstream import upstreams
+
+# Интервалы ожидания сервисов в рамках текущего запроса к шлюзу
+_upstream_spans: contextvars.ContextVar[Optional[List[Tuple[float, float]]]] = \
+    contextvars.ContextVar("upstream_spans", default=None)
+
+TASK = {"title": "bench", "description": "benchmark task", "due_date": "2024-12-01T10:00:00",
+        "project_id": 1, "type": "at work"}
+GRAPHQL_TASKS = "{ allTask(limit: 50) { id title assignee { login } project { name } } }"
+GRAPHQL_EMPLOYEES = "{ allEmployees { id login email } }"
+
+# Сценарии: имя, метод, путь и аргументы запроса
+SCENARIOS = [
+    ("users_me", "GET", "/authentication/users/me", {}),
+    ("employees", "GET", "/employee-service/employees", {}),
+    ("employees_page", "GET", "/employee-service/employees", {"params": {"limit": 50}}),
+    ("employee", "GET", "/employee-service/employee/7", {}),
+    ("employee_batch", "GET", "/employee-service/employee/batch",
+     {"params": {"ids": "1,2,3,4,5,6,7,8"}}),
+    ("subdivisions", "GET", "/employee-service/subdivision/get_all", {}),
+    ("subdivision", "GET", "/employee-service/subdivision/2", {}),
+    ("vacations", "GET", "/employee-service/vacation/get_all", {}),
+    ("vacation_search", "GET", "/employee-service/vacation/search",
+     {"params": {"type": "vacation"}}),
+    ("projects", "GET", "/task-service/project/read_all", {}),
+    ("tasks", "GET", "/task-service/task/read_all", {}),
+    ("tasks_page", "GET", "/task-service/task/read_all", {"params": {"limit": 100}}),
+    ("tasks_list_fields", "GET", "/task-service/task/read_all", {"params": {"fields": "@list"}}),
+    ("task_search", "GET", "/task-service/task/search", {"params": {"project_id": 1}}),
+    ("dashboard", "GET", "/dashboard", {}),
+    ("graphql_tasks", "POST", "/graphql", {"json": {"query": GRAPHQL_TASKS}}),
+    ("graphql_employees", "POST", "/graphql", {"json": {"query": GRAPHQL_EMPLOYEES}}),
+    ("task_add", "POST", "/task-service/task/add", {"params": TASK}),
+    ("task_bulk_add", "POST", "/task-service/task/bulk_add", {"json": [TASK] * 20}),
+    ("task_delete", "DELETE", "/task-service/task/5", {}),
+]
+
+class TimedTransport(httpx.AsyncBaseTransport):
+    '''Класс транспорта к заглушке, запоминающего интервалы ожидания сервиса
+
+    Интервал заканчивается, когда тело ответа прочитано и закрыто: потоковая
+    передача тела клиенту тоже считается ожиданием сервиса.
+    '''
+    def __init__(self, app):
+        self.transport = httpx.ASGITransport(app=app)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        spans = _upstream_spans.get()
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            if spans is not None:
+                spans.append((started, time.perf_counter()))
+            raise
+        response.stream = _TimedStream(response.stream, started, spans)
+        return response
+
+class _TimedStream(httpx.AsyncByteStream):
+    '''Класс тела ответа заглушки, по закрытии которого запоминается интервал ожидания'''
+    def __init__(self, stream, started: float, spans: Optional[List[Tuple[float, float]]]):
+        self.stream = stream
+        self.started = started
+        self.spans = spans
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        if self.spans is not None:
+            self.spans.append((self.started, time.perf_counter()))
+            self.spans = None
+        await self.stream.aclose()
+
+@contextlib.contextmanager
+def _credit_shared_calls():
+    '''Функция учета общего вызова SingleFlight у каждого ожидающего
+
+    Общий вызов выполняется в задаче с контекстом первого запроса, поэтому его
+    интервалы ожидания сервиса иначе достались бы только этому запросу, а у
+    остальных ожидание сервиса считалось бы накладными расходами шлюза.
+    '''
+    do = SingleFlight.do
+
+    async def do_with_spans(self, key, func):
+        async def call():
+            # Контекст задачи общего вызова - копия: список не виден запросу-инициатору
+            shared: List[Tuple[float, float]] = []
+            _upstream_spans.set(shared)
+            return await func(), shared
+
+        result, shared = await do(self, key, call)
+        spans = _upstream_spans.get()
+        if spans is not None:
+            spans.extend(shared)
+        return result
+
+    SingleFlight.do = do_with_spans
+    try:
+        yield
+    finally:
+        SingleFlight.do = do
+
+def _union(spans: List[Tuple[float, float]]) -> float:
+    '''Функция суммарной длительности объединения интервалов (параллельные вызовы не
+    складываются)'''
+    total, end = 0.0, float("-inf")
+    for start, stop in sorted(spans):
+        if stop <= end:
+            continue
+        total += stop - max(start, end)
+        end = stop
+    return total
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def _rss_mb() -> float:
+    '''Функция текущего RSS процесса (МБ)'''
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _token() -> str:
+    '''Функция JWT пользователя заглушки, который примет user_logined'''
+    from router import ALGORITHM, SECRET_KEY  # pylint: disable=import-outside-toplevel
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    return jwt.encode({"sub": "bench", "exp": expires}, SECRET_KEY, algorithm=ALGORITHM)
+
+async def run_scenario(client: httpx.AsyncClient, scenario, requests: int, concurrency: int,
+                       warmup: int) -> dict:
+    '''Функция прогона сценария: requests запросов, не больше concurrency одновременно'''
+    name, method, path, kwargs = scenario
+    latencies, overheads, upstream_times = [], [], []
+    statuses = {}
+
+    async def one(record: bool):
+        spans: List[Tuple[float, float]] = []
+        token = _upstream_spans.set(spans)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        finally:
+            _upstream_spans.reset(token)
+        elapsed = time.perf_counter() - started
+        if record:
+            upstream = _union(spans)
+            latencies.append(elapsed)
+            upstream_times.append(upstream)
+            overheads.append(max(elapsed - upstream, 0.0))
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    for _ in range(warmup):
+        await one(False)
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            await one(True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    ms = lambda value: round(value * 1000, 3)  # noqa: E731
+    return {
+        "scenario": name,
+        "requests": requests,
+        "statuses": statuses,
+        "throughput_rps": round(requests / wall, 1),
+        "latency_ms": {f"p{p}": ms(_percentile(latencies, p)) for p in (50, 95, 99)},
+        "upstream_ms": {f"p{p}": ms(_percentile(upstream_times, p)) for p in (50, 95)},
+        "overhead_ms": {f"p{p}": ms(_percentile(overheads, p)) for p in (50, 95, 99)},
+        "rss_mb": _rss_mb(),
+    }
+
+async def run(sizes: List[int], config: StubConfig, requests: int, concurrency: int,
+              warmup: int, only: Optional[List[str]], no_cache: bool) -> dict:
+    '''Функция прогона всех сценариев для каждого размера коллекции задач'''
+    email_settings.REMINDER_SCHEDULER_ENABLED = False
+    if no_cache:
+        for resource_name in gateway_settings.RESPONSE_CACHE_TTLS:
+            gateway_settings.RESPONSE_CACHE_TTLS[resource_name] = 0
+    import main  # pylint: disable=import-outside-toplevel
+    scenarios = [s for s in SCENARIOS if not only or s[0] in only]
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "concurrency": concurrency,
+        "requests": requests,
+        "response_cache": not no_cache,
+        "stubs": config.as_dict(),
+        "runs": [],
+    }
+    headers = {"authorization": f"Bearer {_token()}"}
+    with _credit_shared_calls():
+        async with main.lifespan(main.app):
+            for size in sizes:
+                config.tasks = size
+                data = make_data(config)
+                await upstreams.set_transport("user", TimedTransport(user_service(config, data)))
+                await upstreams.set_transport("task", TimedTransport(task_service(config, data)))
+                response_cache.clear()
+                token_cache.clear()
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://gateway",
+                                             headers=headers, timeout=None) as client:
+                    results = []
+                    for scenario in scenarios:
+                        results.append(await run_scenario(client, scenario, requests, concurrency,
+                                                          warmup))
+                        print(f"tasks={size} {results[-1]['scenario']}: "
+                              f"{results[-1]['throughput_rps']} rps, "
+                              f"p50 {results[-1]['latency_ms']['p50']} ms", file=sys.stderr)
+                report["runs"].append({"tasks": size, "results": results})
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+def main():
+    '''Функция разбора аргументов и запуска бенчмарка'''
+    parser = argparse.ArgumentParser(description="Offline gateway benchmark with stub upstreams")
+    parser.add_argument("--tasks", default="10,1000,50000",
+                        help="Размеры коллекции задач через запятую")
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005, help="Задержка сервисов (с)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--scenarios", default="", help="Только эти сценарии (через запятую)")
+    parser.add_argument("--no-cache", action="store_true", help="Выключить кэш ответов")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Файл для отчета (по умолчанию stdout)")
+    args = parser.parse_args()
+    config = StubConfig(employees=args.employees, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, error_status=args.error_status,
+                        seed=args.seed)
+    sizes = [int(size) for size in args.tasks.split(",") if size]
+    only = [name for name in args.scenarios.split(",") if name] or None
+    # Вывод шлюза и заглушек уходит в stderr: в stdout - только отчет
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(sizes, config, args.requests, args.concurrency, args.warmup,
+                                 only, args.no_cache))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
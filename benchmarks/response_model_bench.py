@@ -0,0 +1,83 @@
+'''response_model_bench.py
+
+Микробенчмарк ответа /task-service/task/search: валидация через
+response_model=List[Task] против доверенного режима (тело сервиса как есть).
+
+Запуск из корня репозитория:
+    python -m benchmarks.response_model_bench --tasks 5000 --rounds 20
+'''
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+import httpx
+from fastapi import FastAPI
+from gateway_config import gateway_settings
+from passthrough import trusted_response
+from schemas import Task
+
+def make_tasks(count: int) -> list:
+    '''Функция построения тела ответа сервиса задач'''
+    return [{
+        "id": i,
+        "title": f"task {i}",
+        "description": "description " * 20,
+        "due_date": "2024-12-31T09:00:00",
+        "actual_due_date": None,
+        "hours_spent": i % 40,
+        "user_id": i % 100,
+        "project_id": i % 10,
+        "type": "at work",
+        "project": {"id": i % 10, "name": f"project {i % 10}", "type": "at work"},
+    } for i in range(count)]
+
+def make_app(body: bytes) -> FastAPI:
+    '''Функция сборки приложения с маршрутом поиска задач в обоих режимах'''
+    app = FastAPI()
+    upstream = httpx.Response(200, content=body,
+                              headers={"content-type": "application/json"})
+
+    @app.get("/validated", response_model=List[Task])
+    async def validated():
+        return upstream.json()
+
+    @app.get("/trusted", response_model=List[Task])
+    async def trusted():
+        return trusted_response("search_task", upstream)
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, rounds: int) -> dict:
+    '''Функция замера времени ответа маршрута'''
+    await client.get(path)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    timings.sort()
+    return {"mean_ms": round(sum(timings) / len(timings) * 1000, 2),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+            "bytes": len(response.content)}
+
+async def main(tasks: int, rounds: int):
+    '''Функция запуска бенчмарка'''
+    gateway_settings.TRUSTED_UPSTREAM_ROUTES.add("search_task")
+    app = make_app(json.dumps(make_tasks(tasks)).encode())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        report = {"tasks": tasks, "rounds": rounds,
+                  "validated": await measure(client, "/validated", rounds),
+                  "trusted": await measure(client, "/trusted", rounds)}
+    report["speedup"] = round(report["validated"]["mean_ms"] / report["trusted"]["mean_ms"], 1)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.rounds))
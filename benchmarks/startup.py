@@ -0,0 +1,119 @@
+'''startup.py
+
+Измерение холодного старта шлюза: время импорта по модулям (python -X importtime)
+и время от запуска процесса до первого ответа (импорт main, lifespan, первый
+запрос). Каждый замер - отдельный процесс, в отчет идет медиана по --runs.
+
+Запуск из корня репозитория:
+    python -m benchmarks.startup --runs 5 --out startup.json
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Собственные модули шлюза (файлы в корне репозитория)
+LOCAL_MODULES = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPATH=ROOT, REMINDER_SCHEDULER_ENABLED="false")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+def import_times() -> Dict[str, Dict[str, int]]:
+    '''Функция времени импорта (мкс, собственное и с зависимостями) каждого модуля main'''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, env=_environment(), capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = {"self_us": int(own), "cumulative_us": int(cumulative)}
+    return times
+
+async def _first_request() -> Dict[str, float]:
+    '''Функция замера в дочернем процессе: импорт main, lifespan и первый запрос'''
+    started = time.perf_counter()
+    import main  # pylint: disable=import-outside-toplevel
+    import httpx  # pylint: disable=import-outside-toplevel
+    imported = time.perf_counter()
+    async with main.lifespan(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+            response = await client.get("/metrics")
+        responded = time.perf_counter()
+        responded_at = time.time()
+    return {"import_s": imported - started, "lifespan_s": ready - imported,
+            "first_request_s": responded - ready, "status": response.status_code,
+            "responded_at": responded_at}
+
+def first_request() -> Dict[str, float]:
+    '''Функция времени от запуска процесса до первого ответа (отдельный процесс)'''
+    spawned_at = time.time()
+    result = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"], cwd=ROOT,
+                            env=_environment(), capture_output=True, text=True, check=True)
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    phases["process_to_first_response_s"] = phases.pop("responded_at") - spawned_at
+    return phases
+
+def _median(samples: List[Dict[str, float]], key: str) -> float:
+    return round(statistics.median(sample[key] for sample in samples), 4)
+
+def measure(runs: int, top: int) -> dict:
+    '''Функция отчета о старте: медианы по runs запускам'''
+    imports = [import_times() for _ in range(runs)]
+    modules = sorted({name for sample in imports for name in sample})
+
+    def median_us(name: str, key: str) -> int:
+        return int(statistics.median(sample.get(name, {}).get(key, 0) for sample in imports))
+
+    by_module = {name: {"self_us": median_us(name, "self_us"),
+                        "cumulative_us": median_us(name, "cumulative_us")} for name in modules}
+    heaviest = sorted(by_module.items(), key=lambda item: item[1]["self_us"], reverse=True)
+    requests = [first_request() for _ in range(runs)]
+    return {
+        "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                 capture_output=True, text=True, check=False).stdout.strip(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "import_main_us": by_module.get("main", {}).get("cumulative_us", 0),
+        "local_modules": {name: times for name, times in by_module.items()
+                          if name in LOCAL_MODULES},
+        "heaviest_modules": dict(heaviest[:top]),
+        "first_request": {key: _median(requests, key)
+                          for key in ("import_s", "lifespan_s", "first_request_s",
+                                      "process_to_first_response_s")},
+    }
+
+def main():
+    '''Функция разбора аргументов и запуска замера'''
+    parser = argparse.ArgumentParser(description="Gateway cold start measurement")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="Сколько самых тяжелых модулей")
+    parser.add_argument("--out", help="Файл для отчета (по умолчанию stdout)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(_first_request())))
+        return
+    output = json.dumps(measure(args.runs, args.top), indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
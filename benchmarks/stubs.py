@@ -0,0 +1,152 @@
+'''stubs.py
+
+Заглушки user-service и task-service для бенчмарков: ASGI-приложения в том же
+процессе с настраиваемой задержкой, размером коллекций и долей ошибок.
+'''
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+import orjson
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+class StubConfig:
+    '''Класс параметров заглушек'''
+    def __init__(self, tasks: int = 1000, employees: int = 200, projects: int = 20,
+                 subdivisions: int = 10, vacations: int = 100, latency: float = 0.005,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+                 seed: int = 1):
+        self.tasks = tasks
+        self.employees = employees
+        self.projects = projects
+        self.subdivisions = subdivisions
+        self.vacations = vacations
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    def as_dict(self) -> dict:
+        '''Функция параметров в виде словаря (для отчета)'''
+        return dict(vars(self))
+
+def make_data(config: StubConfig) -> dict:
+    '''Функция построения данных заглушек (детерминированно по seed)'''
+    rng = random.Random(config.seed)
+    start = datetime(2024, 1, 1, 9, 0)
+    employees = [{
+        "id": i, "last_name": f"last{i}", "first_name": f"first{i}", "patronymic": f"patr{i}",
+        "email": f"user{i}@example.com", "login": "bench" if i == 1 else f"user{i}",
+        "password": "x" * 60, "is_supervisor": "no", "is_vacation": "no",
+    } for i in range(1, config.employees + 1)]
+    projects = [{"id": i, "name": f"project {i}", "type": "at work"}
+                for i in range(1, config.projects + 1)]
+    tasks = [{
+        "id": i, "title": f"task {i}", "description": "description " * rng.randint(1, 30),
+        "due_date": (start + timedelta(hours=i)).isoformat(), "actual_due_date": None,
+        "hours_spent": rng.randint(0, 40), "user_id": rng.randint(1, config.employees),
+        "project_id": rng.randint(1, config.projects), "type": "at work",
+    } for i in range(1, config.tasks + 1)]
+    subdivisions = [{
+        "id": i, "name": f"subdivision {i}", "leader_id": i,
+        "employee_ids": list(range(i, config.employees + 1, config.subdivisions)),
+    } for i in range(1, config.subdivisions + 1)]
+    vacations = [{
+        "id": i, "employee_id": rng.randint(1, config.employees),
+        "type": rng.choice(("vacation", "business")),
+        "start_date": (start + timedelta(days=i)).date().isoformat(),
+        "end_date": (start + timedelta(days=i + 7)).date().isoformat(),
+    } for i in range(1, config.vacations + 1)]
+    projects_by_id = {project["id"]: project for project in projects}
+    return {
+        "employees": employees, "projects": projects, "tasks": tasks,
+        "subdivisions": subdivisions, "vacations": vacations,
+        "search": [dict(task, project=projects_by_id[task["project_id"]]) for task in tasks[:10]],
+    }
+
+class _Stub:
+    '''Класс общей части заглушек: задержка, ошибки и заранее сериализованные тела'''
+    def __init__(self, config: StubConfig, data: dict):
+        self.config = config
+        self.data = data
+        self.rng = random.Random(config.seed)
+        self.bodies = {name: orjson.dumps(items) for name, items in data.items()}
+        self.by_id = {name: {item["id"]: orjson.dumps(item) for item in items}
+                      for name, items in data.items() if name != "search"}
+
+    async def respond(self, body: bytes, status_code: int = 200) -> Response:
+        '''Функция ответа после задержки сервиса, с заданной долей ошибок'''
+        delay = self.config.latency + self.rng.uniform(-self.config.jitter, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.config.error_rate and self.rng.random() < self.config.error_rate:
+            return Response(b'{"detail":"stub error"}', self.config.error_status,
+                            media_type="application/json")
+        return Response(body, status_code, media_type="application/json")
+
+    def collection(self, resource: str):
+        '''Функция обработчика выгрузки коллекции'''
+        async def handler(request: Request) -> Response:
+            return await self.respond(self.bodies[resource])
+        return handler
+
+    def item(self, resource: str):
+        '''Функция обработчика объекта коллекции по id из пути'''
+        async def handler(request: Request) -> Response:
+            body = self.by_id[resource].get(request.path_params["id"])
+            if body is None:
+                return await self.respond(b'{"detail":"Not found"}', 404)
+            return await self.respond(body)
+        return handler
+
+    async def echo(self, request: Request) -> Response:
+        '''Функция ответа на изменение: объект из параметров запроса'''
+        return await self.respond(orjson.dumps({"id": 1, **request.query_params}))
+
+    async def deleted(self, request: Request) -> Response:
+        '''Функция ответа на удаление'''
+        return await self.respond(b'{"detail":"deleted"}')
+
+def user_service(config: StubConfig, data: dict) -> Starlette:
+    '''Функция заглушки user-service'''
+    stub = _Stub(config, data)
+
+    async def me(request: Request) -> Response:
+        return await stub.respond(stub.by_id["employees"][1])
+
+    async def token(request: Request) -> Response:
+        return await stub.respond(b'{"access_token":"stub","token_type":"bearer"}')
+
+    return Starlette(routes=[
+        Route("/employee/get_all", stub.collection("employees")),
+        Route("/employee/users/me", me),
+        Route("/employee/token", token, methods=["POST"]),
+        Route("/employee/register", stub.echo, methods=["POST"]),
+        Route("/employee/add", stub.echo, methods=["POST"]),
+        Route("/employee/update", stub.echo, methods=["PUT"]),
+        Route("/employee/{id:int}", stub.item("employees")),
+        Route("/employee/{id:int}", stub.deleted, methods=["DELETE"]),
+        Route("/subdivision/get_all", stub.collection("subdivisions")),
+        Route("/subdivision/add", stub.echo, methods=["POST"]),
+        Route("/subdivision/{id:int}", stub.item("subdivisions")),
+        Route("/business_and_vacations/get_all", stub.collection("vacations")),
+        Route("/business_and_vacations/search", stub.collection("vacations")),
+        Route("/business_and_vacations/add", stub.echo, methods=["POST"]),
+    ])
+
+def task_service(config: StubConfig, data: dict) -> Starlette:
+    '''Функция заглушки task-service'''
+    stub = _Stub(config, data)
+    return Starlette(routes=[
+        Route("/task/read_all", stub.collection("tasks")),
+        Route("/task/search", stub.collection("search")),
+        Route("/task/add", stub.echo, methods=["POST"]),
+        Route("/task/update", stub.echo, methods=["PUT"]),
+        Route("/task/{id:int}", stub.deleted, methods=["DELETE"]),
+        Route("/project/read_all", stub.collection("projects")),
+        Route("/project/add", stub.echo, methods=["POST"]),
+    ])
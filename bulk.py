@@ -0,0 +1,41 @@
+'''bulk.py'''
+
+import asyncio
+from typing import List, Optional
+import httpx
+from gateway_config import gateway_settings
+from resilience import error_status
+from response_cache import response_cache
+
+def _error_detail(response: httpx.Response):
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+async def create_tasks(client: httpx.AsyncClient, base_url: str, tasks: List[dict],
+                       concurrency: Optional[int] = None) -> List[dict]:
+    '''Функция создания пачки задач в task-service
+
+    Задачи создаются параллельно, не больше concurrency запросов одновременно, по
+    общему пулу соединений клиента. Ошибка одной задачи не прерывает остальные:
+    результат возвращается по каждой задаче в порядке пачки.
+    '''
+    semaphore = asyncio.Semaphore(concurrency or gateway_settings.TASK_BULK_CONCURRENCY)
+
+    async def create(index: int, params: dict) -> dict:
+        async with semaphore:
+            try:
+                response = await client.post(f"{base_url}/task/add", params=params)
+            except httpx.HTTPError as e:
+                return {"index": index, "status": error_status(e), "error": str(e)}
+        if response.status_code != 200:
+            return {"index": index, "status": response.status_code,
+                    "error": _error_detail(response)}
+        return {"index": index, "status": 200, "task": response.json()}
+
+    try:
+        return list(await asyncio.gather(*(create(index, params)
+                                           for index, params in enumerate(tasks))))
+    finally:
+        response_cache.invalidate("tasks")
@@ -0,0 +1,194 @@
+'''compression.py'''
+
+import gzip
+import weakref
+import zlib
+from typing import Dict, Optional
+import httpx
+from fastapi import Request, Response
+from etag import encoded_etag
+from gateway_config import gateway_settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы тел, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("application/json", "application/graphql-response+json", "text/")
+
+# Сжатые тела ответов сервиса из кэша: повторные опросы не сжимают одно и то же тело заново
+_compressed: "weakref.WeakKeyDictionary[httpx.Response, Dict[str, bytes]]" = \
+    weakref.WeakKeyDictionary()
+
+def supported_encodings() -> tuple:
+    '''Функция списка поддерживаемых сжатий в порядке предпочтения'''
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    '''Функция проверки, принимает ли клиент указанное сжатие (Accept-Encoding)'''
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip() in (encoding.lower(), "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    '''Функция выбора сжатия ответа по заголовку Accept-Encoding клиента'''
+    for encoding in supported_encodings():
+        if accepts_encoding(accept_encoding, encoding):
+            return encoding
+    return None
+
+def is_compressible(content_type: str) -> bool:
+    '''Функция проверки, стоит ли сжимать тело такого типа'''
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    '''Функция сжатия тела целиком'''
+    if encoding == "br":
+        return brotli.compress(body, quality=gateway_settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=gateway_settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class _StreamCompressor:
+    '''Класс потокового сжатия тела по частям'''
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=gateway_settings.COMPRESSION_BROTLI_QUALITY)
+            self._flush = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(gateway_settings.COMPRESSION_GZIP_LEVEL,
+                                                zlib.DEFLATED, 31)
+            self._flush = self._compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        '''Функция сжатия очередной части тела'''
+        if hasattr(self._compressor, "process"):
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def finish(self) -> bytes:
+        '''Функция завершения потока сжатия'''
+        return self._flush()
+
+def response_encoding(request: Request, body: bytes, content_type: str) -> Optional[str]:
+    '''Функция сжатия, которым тело будет отдано клиенту (None - без сжатия)'''
+    if len(body) < gateway_settings.COMPRESSION_MINIMUM_SIZE \
+            or not is_compressible(content_type):
+        return None
+    return choose_encoding(request.headers.get("accept-encoding", ""))
+
+def compressed_passthrough(request: Request, response: httpx.Response,
+                           etag: Optional[str] = None) -> Response:
+    '''Функция ответа телом сервиса как есть, сжатым по Accept-Encoding клиента
+
+    Сжатое тело запоминается на ответ сервиса, поэтому ответ из кэша сжимается
+    один раз на каждое сжатие, а не на каждый запрос; его объем учитывается
+    в записи кэша. ETag сжатого тела дополняется названием сжатия.
+    '''
+    content_type = response.headers.get("content-type", "application/json")
+    headers = {"vary": "Accept-Encoding"}
+    body = response.content
+    encoding = response_encoding(request, body, content_type)
+    if encoding:
+        bodies = _compressed.setdefault(response, {})
+        if encoding not in bodies:
+            # response_cache импортирует upstream, а тот - этот модуль
+            from response_cache import response_cache  # pylint: disable=import-outside-toplevel
+            bodies[encoding] = compress(body, encoding)
+            response_cache.charge(response, len(bodies[encoding]))
+        body = bodies[encoding]
+        headers["content-encoding"] = encoding
+    if etag:
+        headers["etag"] = encoded_etag(etag, encoding)
+    return Response(content=body, status_code=response.status_code, media_type=content_type,
+                    headers=headers)
+
+class CompressionMiddleware:
+    '''Класс ASGI-middleware сжатия ответов (br, если установлен brotli, и gzip)
+
+    Ответы с Content-Encoding (поток сервиса без распаковки, уже сжатые тела из
+    кэша) передаются как есть. Тела меньше COMPRESSION_MINIMUM_SIZE не сжимаются,
+    потоковые ответы сжимаются по частям. К ETag сжатого ответа добавляется
+    название сжатия.
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+class _CompressingSend:
+    '''Класс обертки send: решает по первой части тела, сжимать ли ответ'''
+    def __init__(self, send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            self.passthrough = (b"content-encoding" in headers or message["status"] < 200
+                                or message["status"] in (204, 304)
+                                or not is_compressible(content_type))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < gateway_settings.COMPRESSION_MINIMUM_SIZE:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            if not more_body:
+                body = compress(body, self.encoding)
+                await self.send(self._compressed_start(len(body)))
+                await self.send({"type": "http.response.body", "body": body})
+                self.passthrough = True
+                return
+            await self.send(self._compressed_start(None))
+            self.compressor = _StreamCompressor(self.encoding)
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk,
+                             "more_body": more_body})
+
+    def _compressed_start(self, length: Optional[int]):
+        headers = []
+        vary = b"Accept-Encoding"
+        for key, value in self.start.get("headers", []):
+            if key.lower() == b"content-length":
+                continue
+            if key.lower() == b"etag":
+                value = encoded_etag(value.decode("latin-1"), self.encoding).encode("latin-1")
+            if key.lower() == b"vary":
+                if b"accept-encoding" not in value.lower():
+                    vary = value + b", Accept-Encoding"
+                else:
+                    vary = value
+                continue
+            headers.append((key, value))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", vary))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**self.start, "headers": headers}
@@ -1,5 +1,6 @@
 '''email_config.py'''
 
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class EmailSettings(BaseSettings):
@@ -13,9 +14,49 @@ class EmailSettings(BaseSettings):
     MAIL_SSL_TLS: bool
     VALIDATE_CERTS: bool
     TIMEZONE: str
+    # Пул SMTP-сессий: число сессий, писем на сессию до переподключения, таймаут
+    MAIL_POOL_SIZE: int = 2
+    MAIL_MAX_MESSAGES_PER_SESSION: int = 50
+    MAIL_TIMEOUT: float = 30.0
+    # Параллельность задачи напоминаний: поиск email и отправка писем
+    REMINDER_LOOKUP_CONCURRENCY: int = 10
+    REMINDER_SEND_CONCURRENCY: int = 5
+    # Одно письмо-дайджест на работника вместо письма на каждую задачу
+    REMINDER_DIGEST: bool = False
+    # Время ежедневной проверки задач (в часовом поясе TIMEZONE) и файл блокировки,
+    # по которому один процесс из нескольких воркеров становится владельцем cron
+    REMINDER_CRON_HOUR: int = 9
+    REMINDER_CRON_MINUTE: int = 0
+    REMINDER_SCHEDULER_ENABLED: bool = True
+    REMINDER_LOCK_FILE: str = "/tmp/interface-service-reminders.lock"
+    REMINDER_LEADER_RETRY_INTERVAL: float = 60.0
 
     class Config:
         '''Класс конфига данных имейла'''
         env_file = ".env"
 
-email_settings = EmailSettings()
+class _LazyEmailSettings:
+    '''Класс настроек имейла, которые читаются из окружения и .env при первом обращении
+
+    Импорт модулей не требует .env и не тратит время на разбор настроек: воркер,
+    сбор тестов и перезапуск --reload стартуют быстрее, а настройки проверяются в
+    lifespan или при первой отправке письма.
+    '''
+    def __init__(self):
+        object.__setattr__(self, "_settings", None)
+
+    def load(self) -> EmailSettings:
+        '''Функция получения (и при первом вызове - чтения) настроек'''
+        settings: Optional[EmailSettings] = object.__getattribute__(self, "_settings")
+        if settings is None:
+            settings = EmailSettings()
+            object.__setattr__(self, "_settings", settings)
+        return settings
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+email_settings = _LazyEmailSettings()
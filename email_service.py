@@ -1,101 +1,155 @@
 '''email_service.py'''
 
+import asyncio
+import time
 from datetime import datetime, timedelta
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from typing import Dict, Iterable, Optional
 import httpx
 from email_config import email_settings
+from loaders import fetch_employees_by_ids
+from mail_sender import SMTPSessionPool
+from metrics import REMINDER_EMAILS, track_job
+from upstream import upstreams
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=email_settings.MAIL_USERNAME,
-    MAIL_PASSWORD=email_settings.MAIL_PASSWORD,
-    MAIL_PORT=email_settings.MAIL_PORT,
-    MAIL_SERVER=email_settings.MAIL_SERVER,
-    MAIL_FROM=email_settings.MAIL_FROM,
-    MAIL_STARTTLS=email_settings.MAIL_STARTTLS,
-    MAIL_SSL_TLS=email_settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=email_settings.VALIDATE_CERTS
-)
-
-USER_SERVICE_URL = "http://45.92.176.81:44444"
-TASK_SERVICE_URL = "http://45.92.176.81:44445"
+# Пул авторизованных SMTP-сессий: TLS и логин не повторяются на каждое письмо.
+# Создается при первой отправке, чтобы импорт модуля не читал настройки почты
+_mail_pool: Optional[SMTPSessionPool] = None
+
+# Логические адреса сервисов: реплики выбирает транспорт клиента (upstream.py)
+USER_SERVICE_URL = upstreams.url("user")
+TASK_SERVICE_URL = upstreams.url("task")
+
+def get_mail_pool() -> SMTPSessionPool:
+    '''Функция получения пула SMTP-сессий (создается при первом вызове)'''
+    global _mail_pool
+    if _mail_pool is None:
+        settings = email_settings.load()
+        _mail_pool = SMTPSessionPool(settings,
+                                     size=settings.MAIL_POOL_SIZE,
+                                     max_messages_per_session=settings.MAIL_MAX_MESSAGES_PER_SESSION)
+    return _mail_pool
+
+async def close_mail_pool():
+    '''Функция закрытия пула SMTP-сессий, если он создавался (хук остановки)'''
+    global _mail_pool
+    pool, _mail_pool = _mail_pool, None
+    if pool is not None:
+        await pool.close()
 
 async def send_email(subject: str, recipients: list, body: str):
     '''Функция отправки уведомления'''
-    message = MessageSchema(
-        subject=subject,
-        recipients=recipients,
-        body=body,
-        subtype="html"
-    )
-    fm = FastMail(conf)
+    mail_pool = get_mail_pool()
+    message = mail_pool.build_message(subject, recipients, body, subtype="html")
     try:
-        await fm.send_message(message)
+        await mail_pool.send(message)
         return True
     except Exception as e:
         print(f"Failed to send email: {e}")
         return False
 
-async def get_upcoming_tasks():
+async def get_upcoming_tasks(client: httpx.AsyncClient | None = None):
     '''Функция получения задач с близким сроком выполнения из task-сервиса'''
+    client = client or upstreams.task
     now = datetime.now()
     tomorrow = now + timedelta(days=1)
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TASK_SERVICE_URL}/task/read_all?due_date_lte={tomorrow.isoformat()}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Ошибка проверки задач: {response.status_code} {response.text}")
-            return []
+    response = await client.get(f"{TASK_SERVICE_URL}/task/read_all?due_date_lte={tomorrow.isoformat()}")
+    if response.status_code == 200:
+        return response.json()
+    else:
+        print(f"Ошибка проверки задач: {response.status_code} {response.text}")
+        return []
 
+@track_job("due_task_reminders")
 async def check_due_tasks(*args, **kwargs):
     '''Функция проверки задач на уведомление'''
-    upcoming_tasks = await get_upcoming_tasks()
-    for task in upcoming_tasks:
-        user_id = task.get('user_id')
-        if user_id:
-            email = await get_user_email(user_id)
-            if email:
-                success = await send_due_date_notification(email, task)
-                if success:
-                    print(f"Reminder sent to {email} for task {task['title']}")
-                else:
-                    print(f"Failed to send reminder to {email} for task {task['title']}")
-
-
-async def get_user_email(user_id: int) -> str:
-    '''Функция получения email пользователя по user_id из внешнего сервиса'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/employee/{user_id}")
-        print("Response:", response)
-        if response.status_code == 200:
-            user_data = response.json()
-            return user_data.get('email')
+    started = time.perf_counter()
+    upcoming_tasks = await get_upcoming_tasks(upstreams.task)
+    # Каждый email запрашиваем один раз, сколько бы задач ни было у работника
+    user_ids = {task['user_id'] for task in upcoming_tasks if task.get('user_id')}
+    emails = await get_user_emails(user_ids, upstreams.user)
+    lookup_seconds = time.perf_counter() - started
+
+    semaphore = asyncio.Semaphore(email_settings.REMINDER_SEND_CONCURRENCY)
+
+    async def notify(email: str, tasks: list) -> bool:
+        async with semaphore:
+            if email_settings.REMINDER_DIGEST:
+                success = await send_due_tasks_digest(email, tasks)
+            else:
+                success = await send_due_date_notification(email, tasks[0])
+        titles = ", ".join(task['title'] for task in tasks)
+        if success:
+            print(f"Reminder sent to {email} for task {titles}")
         else:
-            print(f"Ошибка получения email по ID: {response.status_code} {response.text}")
-            return ""
+            print(f"Failed to send reminder to {email} for task {titles}")
+        return success
+
+    if email_settings.REMINDER_DIGEST:
+        # Группируем задачи по работнику: одно письмо на получателя
+        tasks_by_user: Dict[int, list] = {}
+        for task in upcoming_tasks:
+            if emails.get(task.get('user_id')):
+                tasks_by_user.setdefault(task['user_id'], []).append(task)
+        messages = [(emails[user_id], tasks) for user_id, tasks in tasks_by_user.items()]
+    else:
+        messages = [(emails[task['user_id']], [task])
+                    for task in upcoming_tasks if emails.get(task.get('user_id'))]
+    results = await asyncio.gather(*(notify(email, tasks) for email, tasks in messages))
+    report = {
+        "tasks": len(upcoming_tasks),
+        "users": len(user_ids),
+        "emails_found": len(emails),
+        "digest": email_settings.REMINDER_DIGEST,
+        "sent": sum(results),
+        "failed": len(results) - sum(results),
+        "lookup_seconds": round(lookup_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    REMINDER_EMAILS.inc("sent", amount=report["sent"])
+    REMINDER_EMAILS.inc("failed", amount=report["failed"])
+    print(f"Due task reminders: {report}")
+    return report
+
+async def get_user_emails(user_ids: Iterable[int],
+                          client: httpx.AsyncClient | None = None) -> Dict[int, str]:
+    '''Функция получения email работников по набору user_id параллельно или одной выгрузкой'''
+    client = client or upstreams.user
+    try:
+        employees = await fetch_employees_by_ids(
+            client, USER_SERVICE_URL, list(user_ids),
+            concurrency=email_settings.REMINDER_LOOKUP_CONCURRENCY)
+    except httpx.HTTPError as e:
+        print(f"Ошибка получения email работников: {e}")
+        return {}
+    return {user_id: employee['email'] for user_id, employee in employees.items()
+            if employee and employee.get('email')}
+
+
+async def get_user_email(user_id: int, client: httpx.AsyncClient | None = None) -> str:
+    '''Функция получения email пользователя по user_id из внешнего сервиса'''
+    client = client or upstreams.user
+    response = await client.get(f"{USER_SERVICE_URL}/employee/{user_id}")
+    print("Response:", response)
+    if response.status_code == 200:
+        user_data = response.json()
+        return user_data.get('email')
+    else:
+        print(f"Ошибка получения email по ID: {response.status_code} {response.text}")
+        return ""
 
 async def send_due_date_notification(email: str, task):
     '''Функция для отправки уведомления'''
-    message = MessageSchema(
-        subject="Task Due Date Reminder",
-        recipients=[email],
-        body=f"Dear user,\n\nThis is a reminder that the task '{task['title']}' is due soon.\n\nRegards,\nYour Team",
-        subtype="plain"
-    )
-
-    return await send_email(subject=message.subject,
-                            recipients=message.recipients, body=message.body)
-
-# Шедулер это задачник бэкграунд который и добавляет задачу при запуске сервиса
-trigger = CronTrigger(hour=9, minute=0, timezone="Europe/Moscow")
-scheduler = BackgroundScheduler()
-
-def schedule_tasks():
-    '''Функция действия отправки'''
-    scheduler.add_job(check_due_tasks, trigger)
-    scheduler.start()
-
-schedule_tasks()
+    body = f"Dear user,\n\nThis is a reminder that the task '{task['title']}' is due soon.\n\nRegards,\nYour Team"
+    return await send_email(subject="Task Due Date Reminder",
+                            recipients=[email], body=body)
+
+async def send_due_tasks_digest(email: str, tasks: list):
+    '''Функция для отправки одного письма со всеми задачами работника с близким сроком'''
+    if len(tasks) == 1:
+        return await send_due_date_notification(email, tasks[0])
+    task_lines = "\n".join(
+        f"- '{task['title']}' (due {task.get('due_date') or 'soon'})" for task in tasks)
+    body = (f"Dear user,\n\nThis is a reminder that the following tasks are due soon:\n\n"
+            f"{task_lines}\n\nRegards,\nYour Team")
+    return await send_email(subject=f"Task Due Date Reminder: {len(tasks)} tasks",
+                            recipients=[email], body=body)
@@ -0,0 +1,60 @@
+'''etag.py'''
+
+import hashlib
+import weakref
+from typing import Any, Optional
+import httpx
+from fastapi import Response
+
+# Валидатор на каждый ответ сервиса: ответ из кэша хэшируется один раз,
+# повторные опросы получают тот же ETag без пересчета
+_validators: "weakref.WeakKeyDictionary[httpx.Response, str]" = weakref.WeakKeyDictionary()
+
+def _digest(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+def upstream_etag(response: httpx.Response) -> str:
+    '''Функция сильного ETag ответа сервиса: его собственный или хэш тела'''
+    etag = _validators.get(response)
+    if etag is None:
+        etag = response.headers.get("etag")
+        if not etag or etag.startswith("W/"):
+            etag = _digest(response.content)
+        _validators[response] = etag
+    return etag
+
+def response_etag(response: httpx.Response, *variant: Any) -> str:
+    '''Функция ETag представления ответа сервиса
+
+    Страница и отбор полей однозначно определяются телом сервиса и параметрами
+    запроса, поэтому их ETag строится из ETag тела и параметров без хэширования
+    самого ответа шлюза.
+    '''
+    etag = upstream_etag(response)
+    if all(part is None for part in variant):
+        return etag
+    return _digest(repr((etag, *variant)).encode())
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    '''Функция ETag сжатого представления: к тегу добавляется сжатие ("<тег>-gzip")
+
+    Сжатое и несжатое тело - разные представления с разными байтами, поэтому
+    сильный ETag у них должен различаться.
+    '''
+    if not encoding:
+        return etag
+    weak = "W/" if etag.startswith("W/") else ""
+    return f'{weak}"{etag.removeprefix("W/").strip(chr(34))}-{encoding}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    '''Функция проверки заголовка If-None-Match (слабое сравнение, RFC 9110)'''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    '''Функция ответа 304 без тела'''
+    return Response(status_code=304, headers={"etag": etag})
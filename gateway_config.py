@@ -0,0 +1,134 @@
+'''gateway_config.py'''
+
+from typing import Dict, List, Set
+from pydantic_settings import BaseSettings
+
+class GatewaySettings(BaseSettings):
+    '''Класс модели настроек шлюза'''
+    # Пул соединений к user-service и task-service
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = False
+    # Реплики сервисов (JSON в окружении; сервисы, которых там нет, берут адреса по
+    # умолчанию). Модули обращаются к логическим адресам http://<сервис>-service,
+    # запросы распределяются по репликам
+    UPSTREAM_REPLICAS: Dict[str, List[str]] = {
+        "user": ["http://45.92.176.81:44444"],
+        "task": ["http://45.92.176.81:44445"],
+    }
+    # Балансировка: p2c (меньше запросов из двух случайных реплик) или least_outstanding
+    UPSTREAM_BALANCER: str = "p2c"
+    # Исключение реплики после ошибок подряд: срок (удваивается при повторах) и
+    # проверочный запрос перед возвращением в работу
+    UPSTREAM_EJECT_FAILURES: int = 3
+    UPSTREAM_EJECT_SECONDS: float = 10.0
+    UPSTREAM_EJECT_MAX_SECONDS: float = 120.0
+    # Столько секунд без исключения после возвращения - и срок снова начинается с
+    # UPSTREAM_EJECT_SECONDS
+    UPSTREAM_EJECT_RESET_SECONDS: float = 300.0
+    UPSTREAM_PROBE_PATH: str = "/"
+    UPSTREAM_PROBE_TIMEOUT: float = 2.0
+    # Политика вызовов сервисов: тайм-ауты (с), повторы идемпотентных запросов
+    # с джиттером и бюджетом (доля от потока запросов и запас), автомат отключения
+    UPSTREAM_CONNECT_TIMEOUT: float = 3.0
+    UPSTREAM_READ_TIMEOUT: float = 10.0
+    # Общий тайм-аут вызова - до получения заголовков ответа (с повторами); чтение
+    # тела ограничивает только UPSTREAM_READ_TIMEOUT на каждую часть. Для потоковой
+    # передачи тела клиенту общего ограничения времени нет
+    UPSTREAM_TOTAL_TIMEOUT: float = 15.0
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF: float = 0.1
+    UPSTREAM_RETRY_BACKOFF_MAX: float = 1.0
+    UPSTREAM_RETRY_BUDGET_RATIO: float = 0.2
+    UPSTREAM_RETRY_BUDGET_RESERVE: float = 10.0
+    UPSTREAM_BREAKER_WINDOW: float = 30.0
+    UPSTREAM_BREAKER_MIN_REQUESTS: int = 20
+    UPSTREAM_BREAKER_ERROR_RATE: float = 0.5
+    UPSTREAM_BREAKER_SLOW_CALL: float = 5.0
+    UPSTREAM_BREAKER_SLOW_RATE: float = 0.8
+    UPSTREAM_BREAKER_OPEN_SECONDS: float = 10.0
+    # Замены политики для отдельных сервисов, например {"task": {"read_timeout": 30}}
+    UPSTREAM_POLICIES: Dict[str, Dict[str, float]] = {}
+    # Кэш проверенных токенов для user_logined. Кэши токенов и ответов свои в
+    # каждом воркере (serve.py): изменение через один воркер сбрасывает только его
+    # кэш, остальные отдают прежние данные до истечения срока - для токенов до
+    # TOKEN_CACHE_MAX_AGE, для коллекций до TTL + RESPONSE_CACHE_STALE_TTL
+    # (подразделения - до 90 с). Если это недопустимо, уменьшите сроки
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_MAX_AGE: float = 60.0
+    # Кэш ответов коллекций: время жизни по ресурсам (0 - не кэшировать), объем
+    # и окно, в котором устаревший ответ отдается во время фонового обновления
+    RESPONSE_CACHE_TTLS: Dict[str, float] = {
+        "employees": 30.0,
+        "subdivisions": 60.0,
+        "vacations": 60.0,
+        "projects": 60.0,
+        "tasks": 10.0,
+    }
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_STALE_TTL: float = 30.0
+    # Коллекции, которые передаются клиенту потоком напрямую из сервиса, минуя кэш:
+    # память на запрос не растет с размером коллекции, но каждый запрос всей коллекции
+    # идет в сервис отдельно (без кэша ответов и объединения одновременных запросов).
+    # Поток используется, только если сервис прислал свой ETag и клиент принимает
+    # его сжатие; иначе тело читается целиком и получает ETag шлюза. По умолчанию
+    # выключено: кэш и объединение запросов снимают нагрузку с сервисов
+    PASSTHROUGH_STREAMING_RESOURCES: Set[str] = set()
+    # Постраничная выдача коллекций: размер страницы по умолчанию и максимум
+    PAGINATION_DEFAULT_LIMIT: int = 50
+    PAGINATION_MAX_LIMIT: int = 500
+    # Сжатие ответов: минимальный размер тела и уровни gzip (1-9) и brotli (0-11)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    # Профилирование запросов: заголовок и токен администратора (пустой токен -
+    # профилирование по заголовку выключено), доля профилируемого трафика и каталог профилей
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_TOKEN: str = ""
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "/tmp/interface-service-profiles"
+    PROFILING_SORT: str = "cumulative"
+    PROFILING_TOP: int = 60
+    # Схема GraphQL строится при первом запросе к /graphql; True - заранее, в lifespan
+    GRAPHQL_PRELOAD: bool = False
+    # Маршруты с response_model, ответ которых отдается без повторной валидации.
+    # Только маршруты, чье тело сервиса совпадает с response_model: у остальных
+    # модель отбрасывает лишние поля (create_task, update_task) или приводит их к
+    # нижнему регистру (add_employee, update_employee, search_task), и сырое тело
+    # нарушило бы схему OpenAPI. Маршрут добавляется сюда только вместе с тестом,
+    # что сервис отдает ровно форму response_model
+    TRUSTED_UPSTREAM_ROUTES: Set[str] = set()
+    # Пакетная загрузка связанных объектов: сколько id запрашивать поштучно
+    # (больше - одной выгрузкой коллекции) и сколько запросов выполнять параллельно
+    LOADER_COLLECTION_THRESHOLD: int = 20
+    LOADER_CONCURRENCY: int = 10
+    # Максимум id в запросе работников по набору id
+    EMPLOYEE_BATCH_MAX_IDS: int = 1000
+    # Пакетное создание задач: максимум задач в пачке и параллельных запросов
+    TASK_BULK_MAX_ITEMS: int = 500
+    TASK_BULK_CONCURRENCY: int = 10
+    # Запуск сервера (serve.py): development - один процесс с --reload,
+    # production - несколько воркеров uvloop/httptools под супервизором
+    SERVER_ENV: str = "development"
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # Число воркеров (0 - по числу доступных процессу CPU с учетом квоты cgroup)
+    SERVER_WORKERS: int = 0
+    # Воркер перезапускается после стольких запросов (0 - без ограничения); разброс
+    # случайный, чтобы воркеры не перезапускались одновременно
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    # Время на завершение запросов при остановке воркера и на готовность нового (с)
+    SERVER_GRACEFUL_TIMEOUT: float = 20.0
+    SERVER_STARTUP_TIMEOUT: float = 60.0
+    SERVER_KEEPALIVE: int = 5
+    SERVER_LOG_LEVEL: str = "info"
+    SERVER_ACCESS_LOG: bool = True
+
+    class Config:
+        '''Класс конфига настроек шлюза'''
+        env_file = ".env"
+        extra = "ignore"
+
+gateway_settings = GatewaySettings()
@@ -2,13 +2,33 @@
 
 from typing import List, Optional
 from datetime import datetime
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
 import httpx
 import strawberry
+from strawberry.dataloader import DataLoader
 from strawberry.fastapi import GraphQLRouter
+from strawberry.types import Info
+from bulk import create_tasks
+from gateway_config import gateway_settings
+from loaders import fetch_employees_by_ids, fetch_projects_by_ids
+from pagination import encode_cursor, paginate
+from response_cache import cached_get, response_cache
+from upstream import get_user_client, get_task_client, upstreams
 
-USER_SERVICE_URL = "http://user-service:8003"
-TASK_SERVICE_URL = "http://task-service:8002"
+# Логические адреса сервисов: реплики выбирает транспорт клиента (upstream.py)
+USER_SERVICE_URL = upstreams.url("user")
+TASK_SERVICE_URL = upstreams.url("task")
+
+def item_cursor(root) -> str:
+    '''Курсор для запроса страницы, следующей за этим объектом'''
+    return encode_cursor(root.id)
+
+def _collection(response: httpx.Response, limit: Optional[int],
+                cursor: Optional[str]) -> List[dict]:
+    '''Функция выбора объектов коллекции: вся коллекция или страница после курсора'''
+    if limit is None and cursor is None:
+        return response.json()
+    return paginate(response, limit, cursor)[0]
 
 @strawberry.type
 class EmployeesType:
@@ -22,6 +42,7 @@ class EmployeesType:
     password: str
     is_supervisor: str
     is_vacation: str
+    cursor: str = strawberry.field(resolver=item_cursor)
 
 @strawberry.type
 class VacationsType:
@@ -31,6 +52,12 @@ class VacationsType:
     type: str
     start_date: str
     end_date: str
+    cursor: str = strawberry.field(resolver=item_cursor)
+
+    @strawberry.field
+    async def employee(self, info: Info) -> Optional[EmployeesType]:
+        '''Функция получения работника отпуска'''
+        return _employee(await info.context["employee_loader"].load(self.employee_id))
 
 @strawberry.type
 class SubdivisionsType:
@@ -39,6 +66,18 @@ class SubdivisionsType:
     name: str
     leader_id: int
     employee_ids: List[int]
+    cursor: str = strawberry.field(resolver=item_cursor)
+
+    @strawberry.field
+    async def leader(self, info: Info) -> Optional[EmployeesType]:
+        '''Функция получения руководителя подразделения'''
+        return _employee(await info.context["employee_loader"].load(self.leader_id))
+
+    @strawberry.field
+    async def employees(self, info: Info) -> List[EmployeesType]:
+        '''Функция получения работников подразделения'''
+        employees = await info.context["employee_loader"].load_many(self.employee_ids)
+        return [_employee(employee) for employee in employees if employee]
 
 @strawberry.type
 class ProjectsType:
@@ -46,6 +85,7 @@ class ProjectsType:
     id: int
     name: str
     type: str
+    cursor: str = strawberry.field(resolver=item_cursor)
 
 @strawberry.type
 class TaskType:
@@ -59,73 +99,98 @@ class TaskType:
     user_id: Optional[int] = None
     project_id: Optional[int] = None
     type: Optional[str] = None
+    cursor: str = strawberry.field(resolver=item_cursor)
+
+    @strawberry.field
+    async def assignee(self, info: Info) -> Optional[EmployeesType]:
+        '''Функция получения исполнителя задачи'''
+        if self.user_id is None:
+            return None
+        return _employee(await info.context["employee_loader"].load(self.user_id))
+
+    @strawberry.field
+    async def project(self, info: Info) -> Optional[ProjectsType]:
+        '''Функция получения проекта задачи'''
+        if self.project_id is None:
+            return None
+        project = await info.context["project_loader"].load(self.project_id)
+        return ProjectsType(**project) if project else None
+
+def _employee(employee: Optional[dict]) -> Optional[EmployeesType]:
+    '''Функция преобразования данных работника в тип GraphQL'''
+    return EmployeesType(**employee) if employee else None
 
 @strawberry.type
 class Query:
     '''Класс Запроса '''
     @strawberry.field
-    async def all_employees(self) -> List[EmployeesType]:
+    async def all_employees(self, info: Info, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[EmployeesType]:
         '''Функция для получения всех работников'''
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{USER_SERVICE_URL}/employee/get_all")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not fetch users")
-            return [EmployeesType(**user) for user in response.json()]
+        client = info.context["user_client"]
+        response = await cached_get("employees", client, f"{USER_SERVICE_URL}/employee/get_all")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not fetch users")
+        return [EmployeesType(**user) for user in _collection(response, limit, cursor)]
 
     @strawberry.field
-    async def all_vacations(self) -> List[VacationsType]:
+    async def all_vacations(self, info: Info, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[VacationsType]:
         '''Функция для получения всех вакансий'''
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{USER_SERVICE_URL}/business_and_vacations/get_all")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not fetch vacations")
-            return [VacationsType(**vacation) for vacation in response.json()]
+        client = info.context["user_client"]
+        response = await cached_get("vacations", client, f"{USER_SERVICE_URL}/business_and_vacations/get_all")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not fetch vacations")
+        return [VacationsType(**vacation) for vacation in _collection(response, limit, cursor)]
 
     @strawberry.field
-    async def all_subdivisions(self) -> List[SubdivisionsType]:
+    async def all_subdivisions(self, info: Info, limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> List[SubdivisionsType]:
         '''Функция для получения всех подразделений'''
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{USER_SERVICE_URL}/subdivision/get_all")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not fetch subdivisions")
-            subdivisions = response.json()
-            # Проверяем наличие 'employee_ids' в каждом подразделении
-            for subdivision in subdivisions:
-                if "employee_ids" not in subdivision:
-                    raise ValueError(f"'employee_ids' key is missing in the subdivision: {subdivision}")
-            # Возвращаем список подразделений
-            return [
-                SubdivisionsType(
-                    id=subdivision["id"],
-                    name=subdivision["name"],
-                    leader_id=subdivision["leader_id"],
-                    employee_ids=subdivision.get("employee_ids", [])
-                )
-                for subdivision in subdivisions
-            ]
+        client = info.context["user_client"]
+        response = await cached_get("subdivisions", client, f"{USER_SERVICE_URL}/subdivision/get_all")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not fetch subdivisions")
+        subdivisions = _collection(response, limit, cursor)
+        # Проверяем наличие 'employee_ids' в каждом подразделении
+        for subdivision in subdivisions:
+            if "employee_ids" not in subdivision:
+                raise ValueError(f"'employee_ids' key is missing in the subdivision: {subdivision}")
+        # Возвращаем список подразделений
+        return [
+            SubdivisionsType(
+                id=subdivision["id"],
+                name=subdivision["name"],
+                leader_id=subdivision["leader_id"],
+                employee_ids=subdivision.get("employee_ids", [])
+            )
+            for subdivision in subdivisions
+        ]
 
     @strawberry.field
-    async def all_projects(self) -> List[ProjectsType]:
+    async def all_projects(self, info: Info, limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> List[ProjectsType]:
         '''Функция для получения всех проектов'''
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{TASK_SERVICE_URL}/project/read_all")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not fetch projects")
-            return [ProjectsType(**project) for project in response.json()]
+        client = info.context["task_client"]
+        response = await cached_get("projects", client, f"{TASK_SERVICE_URL}/project/read_all")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not fetch projects")
+        return [ProjectsType(**project) for project in _collection(response, limit, cursor)]
 
     @strawberry.field
-    async def all_task(self) -> List[TaskType]:
+    async def all_task(self, info: Info, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> List[TaskType]:
         '''Функция для получения задач'''
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{TASK_SERVICE_URL}/task/read_all")
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not fetch tasks")
-            return [TaskType(**task) for task in response.json()]
+        client = info.context["task_client"]
+        response = await cached_get("tasks", client, f"{TASK_SERVICE_URL}/task/read_all")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not fetch tasks")
+        return [TaskType(**task) for task in _collection(response, limit, cursor)]
 
 @strawberry.input
 class EmployeeCreateInput:
@@ -172,99 +237,149 @@ class TaskCreateInput:
     project_id: int
     type: str
 
+@strawberry.type
+class TaskCreateResult:
+    '''Класс результата создания задачи из пачки'''
+    index: int
+    status: int
+    task: Optional[TaskType] = None
+    error: Optional[str] = None
+
 @strawberry.type
 class Mutation:
     '''Класс Мутаций'''
     @strawberry.mutation
-    async def create_employee(self, input: EmployeeCreateInput) -> EmployeesType:
+    async def create_employee(self, info: Info, input: EmployeeCreateInput) -> EmployeesType:
         '''Функция для создания работника'''
-        async with httpx.AsyncClient() as client:
-            input_params = {
-                "last_name": input.last_name,
-                "first_name": input.first_name,
-                "patronymic": input.patronymic,
-                "email": input.email,
-                "login": input.login,
-                "password": input.password,
-                "is_supervisor": input.is_supervisor,
-                "is_vacation": input.is_vacation
-            }
-            print(f"Sending data: {input_params}")  # Логирование данных
-            # Отправка POST-запроса с параметрами в строке запроса
-            response = await client.post(f"{USER_SERVICE_URL}/employee/add", params=input_params)
-            if response.status_code == 200:
-                employee_data = response.json()
-                return EmployeesType(**employee_data)
-            else:
-                error_details = response.text
-                print(f"Error details: {error_details}")  # Логирование ошибок
-                raise HTTPException(status_code=response.status_code,
-                                    detail=f"Could not create employee: {error_details}")
+        client = info.context["user_client"]
+        input_params = {
+            "last_name": input.last_name,
+            "first_name": input.first_name,
+            "patronymic": input.patronymic,
+            "email": input.email,
+            "login": input.login,
+            "password": input.password,
+            "is_supervisor": input.is_supervisor,
+            "is_vacation": input.is_vacation
+        }
+        print(f"Sending data: {input_params}")  # Логирование данных
+        # Отправка POST-запроса с параметрами в строке запроса
+        response = await client.post(f"{USER_SERVICE_URL}/employee/add", params=input_params)
+        response_cache.invalidate("employees")
+        if response.status_code == 200:
+            employee_data = response.json()
+            return EmployeesType(**employee_data)
+        else:
+            error_details = response.text
+            print(f"Error details: {error_details}")  # Логирование ошибок
+            raise HTTPException(status_code=response.status_code,
+                                detail=f"Could not create employee: {error_details}")
 
     @strawberry.mutation
-    async def create_vacation(self, input: VacationCreateInput) -> VacationsType:
+    async def create_vacation(self, info: Info, input: VacationCreateInput) -> VacationsType:
         '''Функция для создания отпуска/командировка'''
-        async with httpx.AsyncClient() as client:
-            input_dict = input.__dict__
-            response = await client.post(f"{USER_SERVICE_URL}/business_and_vacations/add",
-                                         params=input_dict)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not create vacation")
-            vacation_data = response.json()
-            return VacationsType(**vacation_data)
+        client = info.context["user_client"]
+        input_dict = input.__dict__
+        response = await client.post(f"{USER_SERVICE_URL}/business_and_vacations/add",
+                                     params=input_dict)
+        response_cache.invalidate("vacations")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not create vacation")
+        vacation_data = response.json()
+        return VacationsType(**vacation_data)
 
     @strawberry.mutation
-    async def create_subdivision(self, input: SubdivisionCreateInput) -> SubdivisionsType:
+    async def create_subdivision(self, info: Info, input: SubdivisionCreateInput) -> SubdivisionsType:
         '''Функция для создания подразделения'''
-        async with httpx.AsyncClient() as client:
-            input_dict = input.__dict__
-            response = await client.post(f"{USER_SERVICE_URL}/subdivision/add", params=input_dict)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not create subdivision")
-            
-            subdivision_data = response.json()
-            
-            # Убедитесь, что employee_ids присутствует в данных или задайте его по умолчанию
-            if 'employee_ids' not in subdivision_data:
-                subdivision_data['employee_ids'] = []
-
-            return SubdivisionsType(**subdivision_data)
+        client = info.context["user_client"]
+        input_dict = input.__dict__
+        response = await client.post(f"{USER_SERVICE_URL}/subdivision/add", params=input_dict)
+        response_cache.invalidate("subdivisions")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not create subdivision")
+
+        subdivision_data = response.json()
+
+        # Убедитесь, что employee_ids присутствует в данных или задайте его по умолчанию
+        if 'employee_ids' not in subdivision_data:
+            subdivision_data['employee_ids'] = []
+
+        return SubdivisionsType(**subdivision_data)
 
     @strawberry.mutation
-    async def create_project(self, input: ProjectCreateInput) -> ProjectsType:
+    async def create_project(self, info: Info, input: ProjectCreateInput) -> ProjectsType:
         '''Функция для создания проекта'''
-        async with httpx.AsyncClient() as client:
-            input_dict = input.__dict__
-            response = await client.post(f"{TASK_SERVICE_URL}/project/add", params=input_dict)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code,
-                                    detail="Could not create project")
-            project_data = response.json()
-            return ProjectsType(**project_data)
+        client = info.context["task_client"]
+        input_dict = input.__dict__
+        response = await client.post(f"{TASK_SERVICE_URL}/project/add", params=input_dict)
+        response_cache.invalidate("projects", "tasks")
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code,
+                                detail="Could not create project")
+        project_data = response.json()
+        return ProjectsType(**project_data)
 
     @strawberry.mutation
-    async def create_task(self, input: TaskCreateInput) -> TaskType:
+    async def create_task(self, info: Info, input: TaskCreateInput) -> TaskType:
         '''Функция для создания задачи'''
-        async with httpx.AsyncClient() as client:
-            task_dict = input.__dict__
-            task_dict['due_date'] = input.due_date.isoformat()
-            if input.actual_due_date:
-                task_dict['actual_due_date'] = input.actual_due_date.isoformat()
-            params = {k: v for k, v in task_dict.items() if v is not None}
-            response = await client.post(
-                f"{TASK_SERVICE_URL}/task/add",
-                params=params
-            )
-            if response.status_code != 200:
-                try:
-                    error_detail = response.json()
-                except Exception:
-                    error_detail = response.text
-                raise HTTPException(status_code=response.status_code, detail=f"Could not create task: {error_detail}")
-            task_data = response.json()
-            return TaskType(**task_data)
+        client = info.context["task_client"]
+        task_dict = input.__dict__
+        task_dict['due_date'] = input.due_date.isoformat()
+        if input.actual_due_date:
+            task_dict['actual_due_date'] = input.actual_due_date.isoformat()
+        params = {k: v for k, v in task_dict.items() if v is not None}
+        response = await client.post(
+            f"{TASK_SERVICE_URL}/task/add",
+            params=params
+        )
+        response_cache.invalidate("tasks")
+        if response.status_code != 200:
+            try:
+                error_detail = response.json()
+            except Exception:
+                error_detail = response.text
+            raise HTTPException(status_code=response.status_code, detail=f"Could not create task: {error_detail}")
+        task_data = response.json()
+        return TaskType(**task_data)
+
+    @strawberry.mutation
+    async def create_tasks(self, info: Info, input: List[TaskCreateInput]) -> List[TaskCreateResult]:
+        '''Функция для пакетного создания задач с результатом по каждой задаче'''
+        if len(input) > gateway_settings.TASK_BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413,
+                                detail=f"Too many tasks: max {gateway_settings.TASK_BULK_MAX_ITEMS}")
+        tasks = []
+        for task in input:
+            task_dict = dict(task.__dict__)
+            task_dict['due_date'] = task.due_date.isoformat()
+            if task.actual_due_date:
+                task_dict['actual_due_date'] = task.actual_due_date.isoformat()
+            tasks.append({k: v for k, v in task_dict.items() if v is not None})
+        results = await create_tasks(info.context["task_client"], TASK_SERVICE_URL, tasks)
+        return [TaskCreateResult(index=result["index"], status=result["status"],
+                                 task=TaskType(**result["task"]) if "task" in result else None,
+                                 error=str(result["error"]) if "error" in result else None)
+                for result in results]
 
 schema = strawberry.Schema(query=Query, mutation=Mutation)
-graphql_app = GraphQLRouter(schema)
+async def get_context(user_client: httpx.AsyncClient = Depends(get_user_client),
+                      task_client: httpx.AsyncClient = Depends(get_task_client)):
+    '''Функция контекста GraphQL: общие клиенты сервисов и загрузчики связей на запрос'''
+    async def load_employees(ids: List[int]) -> List[Optional[dict]]:
+        employees = await fetch_employees_by_ids(user_client, USER_SERVICE_URL, ids)
+        return [employees.get(user_id) for user_id in ids]
+
+    async def load_projects(ids: List[int]) -> List[Optional[dict]]:
+        projects = await fetch_projects_by_ids(task_client, TASK_SERVICE_URL, ids)
+        return [projects.get(project_id) for project_id in ids]
+
+    return {
+        "user_client": user_client,
+        "task_client": task_client,
+        "employee_loader": DataLoader(load_fn=load_employees),
+        "project_loader": DataLoader(load_fn=load_projects),
+    }
+
+graphql_app = GraphQLRouter(schema, context_getter=get_context)
@@ -0,0 +1,63 @@
+'''loaders.py'''
+
+import asyncio
+from typing import Dict, List, Optional, Sequence
+import httpx
+from gateway_config import gateway_settings
+from response_cache import cached_get, peek_cached
+from upstream import coalesced_get
+
+def _index_by_id(items: List[dict]) -> Dict[int, dict]:
+    '''Функция индексации объектов коллекции по id'''
+    return {item["id"]: item for item in items if "id" in item}
+
+async def fetch_employees_by_ids(client: httpx.AsyncClient, base_url: str,
+                                 ids: Sequence[int],
+                                 concurrency: Optional[int] = None) -> Dict[int, Optional[dict]]:
+    '''Функция получения работников по набору id минимальным числом запросов
+
+    Если коллекция работников уже есть в кэше ответов, набор берется из нее.
+    Иначе небольшой набор запрашивается параллельно по одному id, большой - одной
+    выгрузкой всей коллекции (через кэш ответов).
+    '''
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        return {}
+    url = f"{base_url}/employee/get_all"
+    response = peek_cached("employees", client, url)
+    if response is None and len(unique_ids) > gateway_settings.LOADER_COLLECTION_THRESHOLD:
+        response = await cached_get("employees", client, url)
+    if response is not None:
+        if response.status_code != 200:
+            raise httpx.HTTPStatusError("Could not fetch users",
+                                        request=response.request, response=response)
+        employees = _index_by_id(response.json())
+        return {user_id: employees.get(user_id) for user_id in unique_ids}
+
+    semaphore = asyncio.Semaphore(concurrency or gateway_settings.LOADER_CONCURRENCY)
+
+    async def fetch_one(user_id: int) -> Optional[dict]:
+        async with semaphore:
+            response = await coalesced_get(client, f"{base_url}/employee/{user_id}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise httpx.HTTPStatusError("Could not fetch user",
+                                        request=response.request, response=response)
+        return response.json()
+
+    results = await asyncio.gather(*(fetch_one(user_id) for user_id in unique_ids))
+    return dict(zip(unique_ids, results))
+
+async def fetch_projects_by_ids(client: httpx.AsyncClient, base_url: str,
+                                ids: Sequence[int]) -> Dict[int, Optional[dict]]:
+    '''Функция получения проектов по набору id одной выгрузкой коллекции'''
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        return {}
+    response = await cached_get("projects", client, f"{base_url}/project/read_all")
+    if response.status_code != 200:
+        raise httpx.HTTPStatusError("Could not fetch projects",
+                                    request=response.request, response=response)
+    projects = _index_by_id(response.json())
+    return {project_id: projects.get(project_id) for project_id in unique_ids}
@@ -0,0 +1,109 @@
+'''mail_sender.py'''
+
+import asyncio
+from email.message import EmailMessage
+from typing import List, Optional
+import aiosmtplib
+from email_config import EmailSettings
+
+class SMTPSession:
+    '''Класс авторизованной SMTP-сессии, через которую отправляется много писем'''
+    def __init__(self, settings: EmailSettings, max_messages: int):
+        self.settings = settings
+        self.max_messages = max_messages
+        self.sent = 0
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+
+    @property
+    def connected(self) -> bool:
+        '''Открыто ли соединение с сервером'''
+        return self._smtp is not None and self._smtp.is_connected
+
+    async def connect(self):
+        '''Функция подключения к серверу: TLS/STARTTLS и логин выполняются один раз на сессию'''
+        await self.close()
+        smtp = aiosmtplib.SMTP(
+            hostname=self.settings.MAIL_SERVER,
+            port=self.settings.MAIL_PORT,
+            use_tls=self.settings.MAIL_SSL_TLS,
+            start_tls=self.settings.MAIL_STARTTLS,
+            validate_certs=self.settings.VALIDATE_CERTS,
+            timeout=self.settings.MAIL_TIMEOUT,
+        )
+        await smtp.connect()
+        try:
+            await smtp.login(self.settings.MAIL_USERNAME, self.settings.MAIL_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.sent = 0
+
+    async def send(self, message: EmailMessage):
+        '''Функция отправки письма; сессия переоткрывается после max_messages писем'''
+        if not self.connected or self.sent >= self.max_messages:
+            await self.connect()
+        await self._smtp.send_message(message)
+        self.sent += 1
+
+    async def close(self):
+        '''Функция завершения сессии'''
+        smtp, self._smtp = self._smtp, None
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+
+class SMTPSessionPool:
+    '''Класс небольшого пула SMTP-сессий для параллельной отправки писем'''
+    def __init__(self, settings: EmailSettings, size: int, max_messages_per_session: int):
+        self.settings = settings
+        self._sessions: List[SMTPSession] = [
+            SMTPSession(settings, max_messages_per_session) for _ in range(max(size, 1))]
+        self._idle: Optional[asyncio.Queue] = None
+
+    def _queue(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for session in self._sessions:
+                self._idle.put_nowait(session)
+        return self._idle
+
+    def build_message(self, subject: str, recipients: list, body: str,
+                      subtype: str = "html") -> EmailMessage:
+        '''Функция сборки письма'''
+        message = EmailMessage()
+        message["From"] = self.settings.MAIL_FROM
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message.set_content(body, subtype=subtype)
+        return message
+
+    async def send(self, message: EmailMessage):
+        '''Функция отправки письма через свободную сессию с одним переподключением при сбое'''
+        idle = self._queue()
+        session = await idle.get()
+        try:
+            try:
+                await session.send(message)
+            except OSError:
+                # Сервер мог закрыть простаивающую сессию: переподключаемся и пробуем еще раз.
+                # Ошибки соединения aiosmtplib (разрыв, тайм-аут) - подклассы OSError
+                await session.connect()
+                await session.send(message)
+        except OSError:
+            # Соединение неисправно: следующее письмо через эту сессию подключится заново
+            await session.close()
+            raise
+        finally:
+            # Отказ сервера принять письмо (SMTPRecipientsRefused, 5xx) не повторяется:
+            # исключение уходит вызывающему, исправная сессия возвращается в пул
+            idle.put_nowait(session)
+
+    async def close(self):
+        '''Функция закрытия всех сессий пула'''
+        for session in self._sessions:
+            await session.close()
+        self._idle = None
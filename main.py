@@ -1,18 +1,92 @@
 '''main.py'''
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import math
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.openapi.utils import get_openapi
-from graphql_schema import graphql_app
+from compression import CompressionMiddleware
+import email_service
+from email_config import email_settings
+from gateway_config import gateway_settings
+from metrics import MetricsMiddleware, registry
+from profiling import ProfilingMiddleware
 from router import employee_router, task_router
 from router import authentication_router
-from router import project_router
+from reminder_scheduler import reminder_scheduler
+from resilience import UpstreamUnavailable
+from router import dashboard_router, project_router, service_router
+from upstream import upstreams
+
+class LazyGraphQL:
+    '''Класс ASGI-приложения /graphql, которое строит схему Strawberry при первом запросе
+
+    Импорт strawberry и сборка схемы занимают заметную часть старта процесса, а
+    GraphQL нужен не каждому воркеру сразу после запуска.
+    '''
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._app = None
+
+    def load(self) -> FastAPI:
+        '''Функция получения приложения GraphQL (при первом вызове - сборки схемы)'''
+        if self._app is None:
+            from graphql_schema import graphql_app  # pylint: disable=import-outside-toplevel
+            graphql = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+            graphql.include_router(graphql_app, prefix=self.prefix)
+            self._app = graphql
+        return self._app
+
+    async def __call__(self, scope, receive, send):
+        await self.load()(scope, receive, send)
+
+lazy_graphql = LazyGraphQL("/graphql")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''Функция жизненного цикла приложения: клиенты сервисов, SMTP-сессии и планировщик'''
+    await upstreams.start()
+    if gateway_settings.GRAPHQL_PRELOAD:
+        lazy_graphql.load()
+    if email_settings.REMINDER_SCHEDULER_ENABLED:
+        await reminder_scheduler.start()
+    yield
+    await reminder_scheduler.stop()
+    await email_service.close_mail_pool()
+    await upstreams.close()
 
 app = FastAPI(
         title="Interface-service",
         version="1.0.0",
         description="Сервис для создания и хранения данных о пользователях и задач.\
             Так же иметь доступ к двум другим сервисам,и объединить их взаимосвязь в Graphql",
+        lifespan=lifespan,
     )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    '''Функция ответа 503 без обращения к сервису, пока его автомат разомкнут'''
+    return ORJSONResponse(status_code=503, content={"detail": str(exc)},
+                          headers={"retry-after": str(math.ceil(exc.retry_after))})
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout_handler(request: Request, exc: httpx.TimeoutException):
+    '''Функция ответа 504, если сервис не ответил за время политики вызовов'''
+    return ORJSONResponse(status_code=504, content={"detail": "Upstream timed out"})
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_error_handler(request: Request, exc: httpx.TransportError):
+    '''Функция ответа 502 на остальные сетевые ошибки сервиса (отказ соединения, разрыв)'''
+    return ORJSONResponse(status_code=502, content={"detail": "Upstream connection failed"})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    '''Функция выдачи метрик шлюза в текстовом формате Prometheus'''
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 app.include_router(authentication_router,prefix="/authentication",
                             tags=["Authentication Interface Manager"])
@@ -22,7 +96,9 @@ app.include_router(project_router,prefix="/task-service",
                             tags=["Task Manager"])
 app.include_router(task_router,prefix="/task-service",
                             tags=["Task Manager"])
-app.include_router(graphql_app, tags=["Graphql Connect"], prefix="/graphql")
+app.include_router(dashboard_router, tags=["Dashboard"])
+app.add_route("/graphql", lazy_graphql, methods=["GET", "POST"])
+app.include_router(service_router, prefix="/service", tags=["Service"])
 
 # Обновление схемы OpenAPI
 def custom_openapi():
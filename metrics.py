@@ -0,0 +1,266 @@
+'''metrics.py'''
+
+import bisect
+import functools
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import httpx
+
+# Границы гистограмм времени ответа шлюза и сервисов (с)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы гистограммы длительности фоновых задач (с)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    '''Класс метрики с набором меток'''
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        '''Функция строк HELP и TYPE'''
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        '''Функция строк метрики в текстовом формате Prometheus'''
+        raise NotImplementedError
+
+class Counter(_Metric):
+    '''Класс счетчика'''
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        '''Функция увеличения счетчика'''
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self._values.items()]
+
+class Gauge(Counter):
+    '''Класс измерителя текущего значения'''
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        '''Функция уменьшения значения'''
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        '''Функция установки значения'''
+        self._values[labels] = value
+
+class CallbackMetric(_Metric):
+    '''Класс метрики, значения которой снимаются при выдаче /metrics
+
+    collect возвращает пары (значения меток, значение); так метрики кэшей и пулов
+    не стоят ничего на пути запроса.
+    '''
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Tuple, float]]], kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self.collect()]
+
+class Histogram(_Metric):
+    '''Класс гистограммы'''
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счетчики по корзинам (последняя - +Inf) и сумма
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, *labels):
+        '''Функция учета наблюдения'''
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    '''Класс набора метрик процесса'''
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        '''Функция регистрации метрики'''
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        '''Функция выдачи всех метрик в текстовом формате Prometheus'''
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.render()
+            except Exception as e:
+                print(f"Metric {metric.name} collection failed: {e}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "gateway_http_requests_total", "HTTP requests handled by the gateway",
+    ("method", "route", "status")))
+HTTP_DURATION = registry.register(Histogram(
+    "gateway_http_request_duration_seconds", "Gateway HTTP request latency",
+    ("method", "route")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "gateway_http_requests_in_flight", "HTTP requests being handled by the gateway"))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    "gateway_upstream_requests_total", "Requests sent to upstream services (each attempt)",
+    ("upstream", "method", "status")))
+UPSTREAM_DURATION = registry.register(Histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Upstream latency until response headers (each attempt)", ("upstream", "method")))
+UPSTREAM_IN_FLIGHT = registry.register(Gauge(
+    "gateway_upstream_requests_in_flight", "Requests waiting for an upstream response",
+    ("upstream",)))
+JOB_RUNS = registry.register(Counter(
+    "gateway_job_runs_total", "Background job runs", ("job", "outcome")))
+JOB_DURATION = registry.register(Histogram(
+    "gateway_job_duration_seconds", "Background job duration", ("job",), JOB_BUCKETS))
+JOB_IN_PROGRESS = registry.register(Gauge(
+    "gateway_job_in_progress", "Background job runs in progress", ("job",)))
+REMINDER_EMAILS = registry.register(Counter(
+    "gateway_reminder_emails_total", "Due task reminder emails", ("outcome",)))
+
+def track_job(job: str):
+    '''Декоратор учета длительности и исхода фоновой задачи'''
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            JOB_IN_PROGRESS.inc(job)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "success"
+                return result
+            finally:
+                JOB_IN_PROGRESS.dec(job)
+                JOB_DURATION.observe(time.perf_counter() - started, job)
+                JOB_RUNS.inc(job, outcome)
+        return wrapper
+    return decorator
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    '''Класс транспорта httpx, учитывающего каждый запрос к сервису'''
+    def __init__(self, transport: httpx.AsyncBaseTransport, upstream: str):
+        self.transport = transport
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        UPSTREAM_IN_FLIGHT.inc(self.upstream)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = response.status_code
+            return response
+        finally:
+            UPSTREAM_IN_FLIGHT.dec(self.upstream)
+            UPSTREAM_DURATION.observe(time.perf_counter() - started, self.upstream, request.method)
+            UPSTREAM_REQUESTS.inc(self.upstream, request.method, status)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def pool_connections(transport: Optional[httpx.AsyncBaseTransport]) -> Dict[str, int]:
+    '''Функция числа соединений пула httpcore по состояниям: занятые и свободные'''
+    while transport is not None and not hasattr(transport, "_pool"):
+        transport = getattr(transport, "transport", None)
+    connections = getattr(getattr(transport, "_pool", None), "connections", [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"active": len(connections) - idle, "idle": idle}
+
+class MetricsMiddleware:
+    '''Класс ASGI-middleware учета запросов: время, статус и число выполняемых
+
+    Метка route - шаблон пути маршрута (/employee-service/employee/{user_id}), а не
+    сам путь, чтобы число рядов метрики не росло с числом id.
+    '''
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route(scope)
+            HTTP_DURATION.observe(time.perf_counter() - started, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, status)
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            route = next((r.path for r in getattr(app, "routes", ())
+                          if getattr(r, "endpoint", None) is endpoint), "unmatched")
+            self._routes[endpoint] = route
+        return route
@@ -0,0 +1,87 @@
+'''pagination.py'''
+
+import base64
+import binascii
+import bisect
+import weakref
+from typing import List, Optional, Tuple
+import httpx
+from fastapi import HTTPException
+from gateway_config import gateway_settings
+from response_cache import response_cache
+
+# Разобранный и отсортированный по id снимок коллекции на каждый ответ из кэша:
+# страницы одного снимка не разбирают JSON повторно
+_snapshots: "weakref.WeakKeyDictionary[httpx.Response, Tuple[List[int], List[dict]]]" = \
+    weakref.WeakKeyDictionary()
+
+# Курсор указывает на последний объект страницы: "id:<id>" для объектов с id или
+# "pos:<номер>" среди объектов без id, которые идут в конце снимка в порядке сервиса
+ID_CURSOR, POSITION_CURSOR = "id", "pos"
+
+def encode_cursor(last_id: int, kind: str = ID_CURSOR) -> str:
+    '''Функция построения непрозрачного курсора из id последнего объекта страницы'''
+    return base64.urlsafe_b64encode(f"{kind}:{last_id}".encode()).decode().rstrip("=")
+
+def _decode(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        kind, _, value = raw.partition(":")
+        if kind not in (ID_CURSOR, POSITION_CURSOR):
+            raise ValueError(cursor)
+        return kind, int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def decode_cursor(cursor: str) -> int:
+    '''Функция разбора курсора'''
+    return _decode(cursor)[1]
+
+def page_limit(limit: Optional[int]) -> int:
+    '''Функция ограничения размера страницы максимумом сервера'''
+    if limit is None:
+        limit = gateway_settings.PAGINATION_DEFAULT_LIMIT
+    return max(1, min(limit, gateway_settings.PAGINATION_MAX_LIMIT))
+
+def _has_id(item) -> bool:
+    return isinstance(item, dict) and "id" in item
+
+def snapshot(response: httpx.Response) -> Tuple[List[int], List[dict]]:
+    '''Функция получения снимка коллекции: объекты по id, затем объекты без id'''
+    cached = _snapshots.get(response)
+    if cached is None:
+        data = response.json()
+        if not isinstance(data, list):
+            raise HTTPException(status_code=502, detail="Upstream collection is not a list")
+        items = sorted((item for item in data if _has_id(item)), key=lambda item: item["id"])
+        cached = ([item["id"] for item in items],
+                  items + [item for item in data if not _has_id(item)])
+        _snapshots[response] = cached
+        # Разобранные объекты занимают не меньше исходного JSON
+        response_cache.charge(response, len(response.content))
+    return cached
+
+def _start(ids: List[int], cursor: Optional[str]) -> int:
+    '''Функция индекса в снимке первого объекта после курсора'''
+    if not cursor:
+        return 0
+    kind, value = _decode(cursor)
+    if kind == POSITION_CURSOR:
+        return len(ids) + value + 1
+    return bisect.bisect_right(ids, value)
+
+def _cursor(ids: List[int], index: int) -> str:
+    '''Функция курсора объекта снимка с индексом index'''
+    if index < len(ids):
+        return encode_cursor(ids[index])
+    return encode_cursor(index - len(ids), POSITION_CURSOR)
+
+def paginate(response: httpx.Response, limit: Optional[int],
+             cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+    '''Функция выбора страницы снимка после курсора: объекты и курсор следующей страницы'''
+    ids, items = snapshot(response)
+    start = _start(ids, cursor)
+    end = start + page_limit(limit)
+    page = items[start:end]
+    next_cursor = _cursor(ids, end - 1) if page and end < len(items) else None
+    return page, next_cursor
@@ -0,0 +1,187 @@
+'''passthrough.py'''
+
+import weakref
+from typing import AsyncIterator, Dict, Optional
+import httpx
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from compression import (accepts_encoding, choose_encoding, compressed_passthrough,
+                         is_compressible, response_encoding)
+from etag import encoded_etag, etag_matches, not_modified, response_etag
+from gateway_config import gateway_settings
+from pagination import page_limit, paginate
+from projection import parse_fields, project_fields
+from response_cache import cached_get
+
+# Результат проверки тела на JSON по ответу сервиса: ответ из кэша проверяется один раз
+_valid_json: "weakref.WeakKeyDictionary[httpx.Response, bool]" = weakref.WeakKeyDictionary()
+
+def json_passthrough(response: httpx.Response) -> Response:
+    '''Функция ответа телом сервиса как есть, без разбора и повторной сериализации JSON'''
+    return Response(content=response.content, status_code=response.status_code,
+                    media_type=response.headers.get("content-type", "application/json"))
+
+def trusted_response(route: str, response: httpx.Response):
+    '''Функция ответа сервиса для маршрута с response_model
+
+    Для маршрутов из TRUSTED_UPSTREAM_ROUTES тело сервиса (уже проверенное им)
+    отдается как есть: FastAPI не валидирует и не сериализует его повторно через
+    response_model, а схема в OpenAPI остается прежней.
+    '''
+    if route in gateway_settings.TRUSTED_UPSTREAM_ROUTES:
+        return json_passthrough(response)
+    return response.json()
+
+async def open_stream(client: httpx.AsyncClient, url: str,
+                      params: Optional[dict] = None) -> httpx.Response:
+    '''Функция GET-запроса к сервису без чтения тела (тело читается потоком)'''
+    request = client.build_request("GET", url, params=params)
+    return await client.send(request, stream=True)
+
+async def _iterate(upstream: httpx.Response, raw: bool) -> AsyncIterator[bytes]:
+    try:
+        chunks = upstream.aiter_raw() if raw else upstream.aiter_bytes()
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await upstream.aclose()
+
+def _stream_is_raw(request: Request, upstream: httpx.Response) -> bool:
+    '''Передается ли поток сервиса без распаковки (клиент принимает его сжатие)'''
+    encoding = upstream.headers.get("content-encoding")
+    return encoding is None or accepts_encoding(request.headers.get("accept-encoding", ""),
+                                                encoding)
+
+def _stream_etag(request: Request, upstream: httpx.Response) -> Optional[str]:
+    '''Функция ETag представления, которое клиент получит потоком
+
+    None - у потока не будет валидатора (сервис не прислал ETag или тело пришлось
+    бы распаковывать). Несжатый поток сжимает CompressionMiddleware, добавляя
+    сжатие к ETag сервиса.
+    '''
+    etag = upstream.headers.get("etag")
+    if not etag or not _stream_is_raw(request, upstream):
+        return None
+    content_type = upstream.headers.get("content-type", "application/json")
+    if "content-encoding" in upstream.headers or not is_compressible(content_type):
+        return etag
+    return encoded_etag(etag, choose_encoding(request.headers.get("accept-encoding", "")))
+
+def streaming_passthrough(request: Request, upstream: httpx.Response) -> StreamingResponse:
+    '''Функция потоковой передачи тела сервиса клиенту
+
+    Если клиент принимает сжатие, которым сервис отдал тело, байты передаются
+    без распаковки вместе с Content-Encoding; иначе тело распаковывается на лету.
+    '''
+    headers = {}
+    encoding = upstream.headers.get("content-encoding")
+    raw = _stream_is_raw(request, upstream)
+    if encoding and raw:
+        headers["content-encoding"] = encoding
+    if raw and "content-length" in upstream.headers:
+        headers["content-length"] = upstream.headers["content-length"]
+    if raw and "etag" in upstream.headers:
+        headers["etag"] = upstream.headers["etag"]
+    return StreamingResponse(_iterate(upstream, raw), status_code=upstream.status_code,
+                             media_type=upstream.headers.get("content-type", "application/json"),
+                             headers=headers)
+
+async def proxy_collection(request: Request, resource: str, client: httpx.AsyncClient,
+                           url: str, error_detail: str, limit: Optional[int] = None,
+                           cursor: Optional[str] = None,
+                           fields: Optional[str] = None) -> Response:
+    '''Функция проксирования коллекции сервиса
+
+    Без преобразований тело передается без разбора JSON: ресурсы из
+    PASSTHROUGH_STREAMING_RESOURCES - потоком, если у тела есть ETag сервиса (память
+    на запрос не растет с размером коллекции), остальные - целиком через кэш ответов. Для страницы (limit/cursor)
+    и отбора полей (fields) коллекция берется из кэша и разбирается. Ответ несет
+    ETag; на совпавший If-None-Match отдается 304 без тела.
+    '''
+    keys = parse_fields(resource, fields)
+    paginated = limit is not None or cursor is not None
+    if resource in gateway_settings.PASSTHROUGH_STREAMING_RESOURCES and not paginated and not keys:
+        response = await open_stream(client, url)
+        if response.status_code != 200:
+            await response.aclose()
+            raise HTTPException(status_code=response.status_code, detail=error_detail)
+        etag = _stream_etag(request, response)
+        if etag is None:
+            # Без ETag сервиса (или с распаковкой) валидатор считает шлюз по телу
+            await response.aread()
+            return conditional_response(request, response, resource)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            await response.aclose()
+            return not_modified(etag)
+        return streaming_passthrough(request, response)
+    response = await cached_get(resource, client, url)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=error_detail)
+    if not paginated:
+        return conditional_response(request, response, resource, fields)
+    page, next_cursor = paginate(response, limit, cursor)
+    return _conditional_json(request, {"items": project_fields(page, keys),
+                                       "next_cursor": next_cursor, "limit": page_limit(limit)},
+                             response_etag(response, page_limit(limit), cursor, keys))
+
+def _conditional_json(request: Request, data, etag: str) -> Response:
+    '''Функция JSON-ответа шлюза с ETag и проверкой If-None-Match
+
+    Тело сжимает CompressionMiddleware, поэтому If-None-Match сравнивается с ETag
+    того сжатия, которым тело будет отдано этому клиенту.
+    '''
+    result = ORJSONResponse(data, headers={"etag": etag})
+    current = encoded_etag(etag, response_encoding(request, result.body, "application/json"))
+    if etag_matches(request.headers.get("if-none-match"), current):
+        return not_modified(current)
+    return result
+
+def conditional_response(request: Request, response: httpx.Response, resource: str,
+                         fields: Optional[str] = None) -> Response:
+    '''Функция ответа телом сервиса (с отбором полей) с ETag и проверкой If-None-Match
+
+    ETag сравнивается после выбора сжатия: 304 подтверждает только то
+    представление (gzip, br или несжатое), которое клиент получил бы сейчас.
+    '''
+    keys = parse_fields(resource, fields)
+    etag = response_etag(response, keys)
+    if keys:
+        return _conditional_json(request, project_fields(response.json(), keys), etag)
+    content_type = response.headers.get("content-type", "application/json")
+    current = encoded_etag(etag, response_encoding(request, response.content, content_type))
+    if etag_matches(request.headers.get("if-none-match"), current):
+        return not_modified(current)
+    return compressed_passthrough(request, response, etag)
+
+def projected_response(data, resource: str, fields: Optional[str]):
+    '''Функция ответа с отбором полей: без повторной валидации через response_model'''
+    keys = parse_fields(resource, fields)
+    if keys is None:
+        return data
+    return ORJSONResponse(project_fields(data, keys))
+
+def is_valid_json(response: httpx.Response) -> bool:
+    '''Функция проверки, что тело сервиса - корректный JSON и его можно вставить как есть'''
+    valid = _valid_json.get(response)
+    if valid is None:
+        try:
+            orjson.loads(response.content)
+            valid = True
+        except orjson.JSONDecodeError:
+            valid = False
+        _valid_json[response] = valid
+    return valid
+
+def composite_response(parts: Dict[str, Optional[bytes]], errors: dict,
+                       status_code: int = 200) -> Response:
+    '''Функция ответа из нескольких тел сервисов без их разбора
+
+    Тела коллекций вставляются в документ как есть: {"<ресурс>": <тело или null>,
+    ..., "errors": {...}}. Тела должны быть проверены is_valid_json.
+    '''
+    members = [orjson.dumps(name) + b":" + (part if part is not None else b"null")
+               for name, part in parts.items()]
+    members.append(b'"errors":' + orjson.dumps(errors))
+    return Response(content=b"{" + b",".join(members) + b"}", status_code=status_code,
+                    media_type="application/json")
@@ -0,0 +1,102 @@
+'''profiling.py'''
+
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import time
+from typing import Optional
+from gateway_config import gateway_settings
+
+ATTACHMENT, FILE = "attachment", "file"
+
+def _report(profiler: cProfile.Profile) -> bytes:
+    '''Функция текстового отчета профилировщика'''
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(gateway_settings.PROFILING_SORT).print_stats(gateway_settings.PROFILING_TOP)
+    return stream.getvalue().encode()
+
+def _dump(profiler: cProfile.Profile, method: str, path: str) -> str:
+    '''Функция сохранения профиля (формат pstats) в каталог PROFILING_DIR'''
+    os.makedirs(gateway_settings.PROFILING_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    name = f"{int(time.time() * 1000)}-{method}-{slug}.prof"
+    profiler.dump_stats(os.path.join(gateway_settings.PROFILING_DIR, name))
+    return name
+
+class ProfilingMiddleware:
+    '''Класс ASGI-middleware профилирования запросов (cProfile)
+
+    Запрос с заголовком PROFILING_HEADER, равным PROFILING_TOKEN, выполняется под
+    профилировщиком: по умолчанию вместо ответа возвращается текстовый отчет
+    (вложение), с заголовком "<PROFILING_HEADER>-output: file" профиль пишется в
+    PROFILING_DIR, а ответ возвращается как обычно. Доля PROFILING_SAMPLE_RATE
+    остального трафика профилируется в PROFILING_DIR.
+
+    cProfile работает на весь поток, поэтому одновременно профилируется один
+    запрос, а в профиль попадают и конкурентные запросы того же процесса.
+    '''
+    def __init__(self, app):
+        self.app = app
+        self._active = False
+
+    def _mode(self, scope) -> Optional[str]:
+        header = gateway_settings.PROFILING_HEADER.lower().encode()
+        headers = dict(scope.get("headers", []))
+        token = headers.get(header)
+        if token is not None and gateway_settings.PROFILING_TOKEN:
+            if hmac.compare_digest(token, gateway_settings.PROFILING_TOKEN.encode()):
+                output = headers.get(header + b"-output", b"").decode("latin-1").lower()
+                return FILE if output == FILE else ATTACHMENT
+            return None
+        rate = gateway_settings.PROFILING_SAMPLE_RATE
+        if rate > 0 and random.random() < rate:
+            return FILE
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active:
+            await self.app(scope, receive, send)
+            return
+        mode = self._mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        self._active = True
+        profiler = cProfile.Profile()
+        status = 500
+        started = time.perf_counter()
+
+        async def capture(message):
+            # Ответ приложения заменяется отчетом: запоминаем только статус
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, capture if mode == ATTACHMENT else send)
+            finally:
+                profiler.disable()
+        finally:
+            self._active = False
+        elapsed = time.perf_counter() - started
+        if mode == FILE:
+            name = await asyncio.to_thread(_dump, profiler, scope["method"], scope["path"])
+            print(f"Profile of {scope['method']} {scope['path']} ({elapsed:.3f}s) saved to {name}")
+            return
+        body = _report(profiler)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-disposition", b'attachment; filename="profile.txt"'),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profile-response-status", str(status).encode()),
+            (b"x-profile-seconds", f"{elapsed:.6f}".encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
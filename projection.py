@@ -0,0 +1,37 @@
+'''projection.py'''
+
+from typing import Any, Optional, Tuple
+
+# Имя набора полей "для списка" в параметре fields
+LIST_VIEW = "@list"
+
+# Поля, которые показывают списки: без пароля и длинных описаний
+LIST_VIEWS = {
+    "employees": ("id", "last_name", "first_name", "patronymic", "email", "login",
+                  "is_supervisor", "is_vacation"),
+    "tasks": ("id", "title", "due_date", "actual_due_date", "hours_spent", "user_id",
+              "project_id", "type"),
+    "projects": ("id", "name", "type"),
+    "subdivisions": ("id", "name", "leader_id", "employee_ids"),
+    "vacations": ("id", "employee_id", "type", "start_date", "end_date"),
+}
+
+def parse_fields(resource: str, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    '''Функция разбора параметра fields: список полей через запятую или @list'''
+    if not fields:
+        return None
+    if fields.strip() == LIST_VIEW:
+        return LIST_VIEWS[resource]
+    keys = tuple(dict.fromkeys(key.strip() for key in fields.split(",") if key.strip()))
+    return keys or None
+
+def project_fields(data: Any, keys: Optional[Tuple[str, ...]]) -> Any:
+    '''Функция отбора только запрошенных полей у объекта или списка объектов'''
+    if keys is None:
+        return data
+    if isinstance(data, list):
+        return [{key: item[key] for key in keys if key in item} if isinstance(item, dict) else item
+                for item in data]
+    if isinstance(data, dict):
+        return {key: data[key] for key in keys if key in data}
+    return data
@@ -0,0 +1,115 @@
+'''reminder_scheduler.py'''
+
+import asyncio
+import os
+from typing import Optional
+from email_config import email_settings
+import email_service
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки файла нет, каждый процесс считается ведущим
+    fcntl = None
+
+class ReminderScheduler:
+    '''Класс планировщика напоминаний в цикле событий приложения
+
+    Cron запускается только в одном процессе: в том, который удерживает
+    файловую блокировку. Остальные воркеры периодически пытаются ее захватить
+    и становятся ведущими, если прежний ведущий процесс завершился.
+    '''
+    def __init__(self, lock_path: Optional[str] = None, retry_interval: Optional[float] = None):
+        # Без явных значений берутся из email_settings при старте, а не при импорте
+        self._lock_path = lock_path
+        self._retry_interval = retry_interval
+        self._scheduler = None
+        self._lock_fd: Optional[int] = None
+        self._campaign: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+
+    @property
+    def lock_path(self) -> str:
+        '''Путь к файлу блокировки ведущего процесса'''
+        return self._lock_path or email_settings.REMINDER_LOCK_FILE
+
+    @property
+    def retry_interval(self) -> float:
+        '''Интервал повторного захвата блокировки (с)'''
+        if self._retry_interval is None:
+            return email_settings.REMINDER_LEADER_RETRY_INTERVAL
+        return self._retry_interval
+
+    @property
+    def is_leader(self) -> bool:
+        '''Владеет ли процесс cron-задачей'''
+        return self._scheduler is not None
+
+    def _acquire_lock(self) -> bool:
+        if fcntl is None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self):
+        fd, self._lock_fd = self._lock_fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _become_leader(self):
+        # apscheduler нужен только ведущему процессу: импорт не замедляет старт остальных
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler  # pylint: disable=import-outside-toplevel
+        from apscheduler.triggers.cron import CronTrigger  # pylint: disable=import-outside-toplevel
+        scheduler = AsyncIOScheduler(event_loop=asyncio.get_running_loop())
+        scheduler.add_job(
+            self.run_now,
+            CronTrigger(hour=email_settings.REMINDER_CRON_HOUR,
+                        minute=email_settings.REMINDER_CRON_MINUTE,
+                        timezone=email_settings.TIMEZONE),
+            id="due_task_reminders",
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.start()
+        self._scheduler = scheduler
+        print(f"Reminder scheduler started in process {os.getpid()}")
+
+    async def _campaign_loop(self):
+        while not self._acquire_lock():
+            await asyncio.sleep(self.retry_interval)
+        self._become_leader()
+
+    async def start(self) -> bool:
+        '''Функция запуска планировщика (хук старта приложения)'''
+        if self._scheduler is not None or self._campaign is not None:
+            return self.is_leader
+        if self._acquire_lock():
+            self._become_leader()
+        else:
+            self._campaign = asyncio.ensure_future(self._campaign_loop())
+        return self.is_leader
+
+    async def stop(self):
+        '''Функция остановки планировщика и освобождения блокировки (хук остановки)'''
+        if self._campaign is not None:
+            self._campaign.cancel()
+            self._campaign = None
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        self._release_lock()
+
+    async def run_now(self) -> dict:
+        '''Функция ручного запуска проверки задач; запуски в процессе не пересекаются'''
+        async with self._run_lock:
+            return await email_service.check_due_tasks()
+
+reminder_scheduler = ReminderScheduler()
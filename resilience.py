@@ -0,0 +1,221 @@
+'''resilience.py'''
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+import httpx
+from gateway_config import gateway_settings
+
+# Методы, которые безопасно повторять
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Статусы сервиса, после которых GET повторяется
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+class UpstreamUnavailable(httpx.TransportError):
+    '''Исключение: сервис недоступен (разомкнут автомат), запрос не отправлялся'''
+    def __init__(self, name: str, retry_after: float, request: Optional[httpx.Request] = None):
+        super().__init__(f"Upstream {name} is unavailable", request=request)
+        self.name = name
+        self.retry_after = retry_after
+
+def error_status(error: httpx.HTTPError) -> int:
+    '''Функция статуса ответа шлюза для ошибки вызова сервиса'''
+    if isinstance(error, UpstreamUnavailable):
+        return 503
+    if isinstance(error, httpx.TimeoutException):
+        return 504
+    return 502
+
+class UpstreamPolicy:
+    '''Класс политики вызовов сервиса: тайм-ауты, повторы и пороги автомата'''
+    FIELDS = ("connect_timeout", "read_timeout", "total_timeout", "retries", "retry_backoff",
+              "retry_backoff_max", "retry_budget_ratio", "retry_budget_reserve",
+              "breaker_window", "breaker_min_requests", "breaker_error_rate",
+              "breaker_slow_call", "breaker_slow_rate", "breaker_open_seconds")
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values[field])
+
+    @classmethod
+    def for_upstream(cls, name: str) -> "UpstreamPolicy":
+        '''Функция политики сервиса: общие настройки UPSTREAM_* с заменами из UPSTREAM_POLICIES'''
+        values = {field: getattr(gateway_settings, f"UPSTREAM_{field.upper()}")
+                  for field in cls.FIELDS}
+        values.update(gateway_settings.UPSTREAM_POLICIES.get(name, {}))
+        return cls(**values)
+
+    def timeout(self) -> httpx.Timeout:
+        '''Функция тайм-аутов httpx по политике'''
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def as_dict(self) -> dict:
+        '''Функция политики в виде словаря'''
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+class RetryBudget:
+    '''Класс бюджета повторов: каждый запрос пополняет его на ratio, повтор тратит единицу
+
+    Пока сервис здоров, бюджет держится на запасе reserve; при массовых ошибках
+    повторов не больше доли ratio от потока запросов, и они не умножают нагрузку.
+    '''
+    def __init__(self, ratio: float, reserve: float):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.spent = 0
+
+    def deposit(self):
+        '''Функция пополнения бюджета за исходный запрос'''
+        self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        '''Функция получения разрешения на повтор'''
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+class CircuitBreaker:
+    '''Класс автомата сервиса: closed -> open -> half_open -> closed
+
+    Автомат размыкается, когда за окно breaker_window набралось не меньше
+    breaker_min_requests вызовов и доля ошибок (сетевых и 5xx) или медленных
+    вызовов превысила порог. Разомкнутый автомат отказывает сразу, через
+    breaker_open_seconds пропускает один пробный вызов.
+    '''
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, policy: UpstreamPolicy):
+        self.name = name
+        self.policy = policy
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._probe = False
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+
+    def before_call(self, request: Optional[httpx.Request] = None):
+        '''Функция проверки перед вызовом: при разомкнутом автомате - UpstreamUnavailable'''
+        if self.state == self.CLOSED:
+            return
+        retry_after = self.opened_at + self.policy.breaker_open_seconds - time.monotonic()
+        if self.state == self.OPEN and retry_after <= 0:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe:
+            self._probe = True
+            return
+        self.rejected += 1
+        raise UpstreamUnavailable(self.name, max(retry_after, 0.0), request)
+
+    def record(self, failed: bool, duration: float):
+        '''Функция учета результата вызова'''
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._probe = False
+            if failed:
+                self._open(now)
+            else:
+                self.state = self.CLOSED
+                self._calls.clear()
+            return
+        if self.state == self.OPEN:
+            return
+        self._calls.append((now, failed, duration >= self.policy.breaker_slow_call))
+        while self._calls and self._calls[0][0] < now - self.policy.breaker_window:
+            self._calls.popleft()
+        total = len(self._calls)
+        if total < self.policy.breaker_min_requests:
+            return
+        errors = sum(1 for _, call_failed, _ in self._calls if call_failed)
+        slow = sum(1 for _, _, call_slow in self._calls if call_slow)
+        if errors / total >= self.policy.breaker_error_rate \
+                or slow / total >= self.policy.breaker_slow_rate:
+            self._open(now)
+
+    def cancelled(self):
+        '''Функция учета отмененного вызова: пробный вызов не считается ни успехом, ни ошибкой'''
+        if self.state == self.HALF_OPEN:
+            self._probe = False
+
+    def _open(self, now: float):
+        print(f"Circuit breaker for {self.name} opened")
+        self.state = self.OPEN
+        self.opened_at = now
+        self.opens += 1
+        self._calls.clear()
+
+    def stats(self) -> dict:
+        '''Функция состояния автомата'''
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "window_calls": total,
+            "window_errors": sum(1 for _, failed, _ in self._calls if failed),
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    '''Класс транспорта httpx с общим тайм-аутом, повторами и автоматом'''
+    def __init__(self, transport: httpx.AsyncBaseTransport, policy: UpstreamPolicy,
+                 breaker: CircuitBreaker, budget: RetryBudget):
+        self.transport = transport
+        self.policy = policy
+        self.breaker = breaker
+        self.budget = budget
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        '''Функция вызова сервиса
+
+        total_timeout ограничивает все попытки вместе с паузами до получения
+        заголовков ответа; тело читается с тайм-аутом чтения.
+        '''
+        deadline = time.monotonic() + self.policy.total_timeout
+        retryable = request.method in IDEMPOTENT_METHODS
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            self.breaker.before_call(request)
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self.transport.handle_async_request(request),
+                                                  max(deadline - start, 0.001))
+            except asyncio.CancelledError:
+                self.breaker.cancelled()
+                raise
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                self.breaker.record(True, time.monotonic() - start)
+                if not retryable or not await self._backoff(attempt, deadline):
+                    if isinstance(e, httpx.TransportError):
+                        raise
+                    raise httpx.TimeoutException(f"Upstream {self.breaker.name} timed out",
+                                                 request=request) from e
+            else:
+                failed = response.status_code >= 500
+                self.breaker.record(failed, time.monotonic() - start)
+                if not (retryable and response.status_code in RETRY_STATUSES) \
+                        or not await self._backoff(attempt, deadline, response):
+                    return response
+            attempt += 1
+
+    async def _backoff(self, attempt: int, deadline: float,
+                       response: Optional[httpx.Response] = None) -> bool:
+        '''Функция паузы перед повтором (полный джиттер); False - повтор невозможен'''
+        if attempt >= self.policy.retries:
+            return False
+        delay = random.uniform(0, min(self.policy.retry_backoff_max,
+                                      self.policy.retry_backoff * 2 ** attempt))
+        if time.monotonic() + delay >= deadline or not self.budget.withdraw():
+            return False
+        if response is not None:
+            await response.aclose()
+        await asyncio.sleep(delay)
+        return True
+
+    async def aclose(self):
+        await self.transport.aclose()
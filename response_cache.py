@@ -0,0 +1,178 @@
+'''response_cache.py'''
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+import httpx
+from gateway_config import gateway_settings
+from metrics import CallbackMetric, registry
+from upstream import coalesced_get
+
+class _Entry:
+    '''Класс записи кэша: ответ сервиса и сроки его свежести'''
+    __slots__ = ("response", "size", "fresh_until", "stale_until", "refreshing")
+
+    def __init__(self, response: httpx.Response, ttl: float, stale_ttl: float):
+        now = time.monotonic()
+        self.response = response
+        self.size = len(response.content)
+        self.fresh_until = now + ttl
+        self.stale_until = self.fresh_until + stale_ttl
+        self.refreshing = False
+
+class ResponseCache:
+    '''Класс кэша ответов коллекций сервисов с LRU по объему и инвалидацией по ресурсу'''
+    def __init__(self, max_bytes: int, ttls: Dict[str, float], stale_ttl: float):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # Ключ записи по id ответа: запись держит ответ, поэтому id не переиспользуется
+        self._keys: Dict[int, Tuple[str, str]] = {}
+        # Поколение ресурса: ответ, запрошенный до инвалидации, не попадет в кэш
+        self._generations: Dict[str, int] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get_or_fetch(self, resource: str, key: str,
+                           fetch: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        '''Функция получения ответа из кэша или из сервиса при промахе'''
+        ttl = self.ttls.get(resource, 0)
+        if ttl <= 0:
+            return await fetch()
+        entry = self._entries.get((resource, key))
+        now = time.monotonic()
+        if entry is not None and now < entry.fresh_until:
+            self._entries.move_to_end((resource, key))
+            self.hits += 1
+            return entry.response
+        if entry is not None and now < entry.stale_until:
+            # Отдаем устаревший ответ, пока один фоновый запрос его обновляет
+            self._entries.move_to_end((resource, key))
+            self.stale_hits += 1
+            if not entry.refreshing:
+                entry.refreshing = True
+                task = asyncio.ensure_future(self._refresh(resource, key, entry, fetch))
+                self._refreshes.add(task)
+                task.add_done_callback(self._refreshes.discard)
+            return entry.response
+        self.misses += 1
+        generation = self._generations.get(resource, 0)
+        response = await fetch()
+        self._store(resource, key, response, generation)
+        return response
+
+    def peek(self, resource: str, key: str) -> Optional[httpx.Response]:
+        '''Функция получения свежего ответа из кэша без обращения к сервису'''
+        entry = self._entries.get((resource, key))
+        if entry is None or time.monotonic() >= entry.fresh_until:
+            return None
+        self._entries.move_to_end((resource, key))
+        self.hits += 1
+        return entry.response
+
+    async def _refresh(self, resource: str, key: str, entry: _Entry,
+                       fetch: Callable[[], Awaitable[httpx.Response]]):
+        generation = self._generations.get(resource, 0)
+        try:
+            response = await fetch()
+        except Exception as e:
+            print(f"Background refresh of {resource} failed: {e}")
+            return
+        finally:
+            entry.refreshing = False
+        self._store(resource, key, response, generation)
+
+    def _store(self, resource: str, key: str, response: httpx.Response, generation: int):
+        if response.status_code != 200 or self._generations.get(resource, 0) != generation:
+            return
+        entry = _Entry(response, self.ttls[resource], self.stale_ttl)
+        if entry.size > self.max_bytes:
+            return
+        self._remove((resource, key))
+        self._entries[(resource, key)] = entry
+        self._keys[id(response)] = (resource, key)
+        self.bytes += entry.size
+        self._evict()
+
+    def charge(self, response: httpx.Response, size: int):
+        '''Функция учета данных, построенных по ответу из кэша (снимка, сжатой копии)
+
+        Такие данные живут, пока жив ответ, поэтому их объем добавляется к записи
+        и освобождается вместе с ней при вытеснении.
+        '''
+        cache_key = self._keys.get(id(response))
+        entry = self._entries.get(cache_key) if cache_key else None
+        if entry is None or entry.response is not response:
+            return
+        entry.size += size
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, cache_key: Tuple[str, str]):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+            self._keys.pop(id(entry.response), None)
+
+    def invalidate(self, *resources: str):
+        '''Функция сброса всех записей указанных ресурсов после изменения данных'''
+        for resource in resources:
+            self._generations[resource] = self._generations.get(resource, 0) + 1
+        for cache_key in [k for k in self._entries if k[0] in resources]:
+            self._remove(cache_key)
+
+    def clear(self):
+        '''Функция очистки кэша'''
+        self.invalidate(*{resource for resource, _ in self._entries})
+
+    def stats(self) -> dict:
+        '''Функция статистики кэша: доля попаданий и занятый объем'''
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.stale_hits) / total if total else 0.0,
+        }
+
+response_cache = ResponseCache(gateway_settings.RESPONSE_CACHE_MAX_BYTES,
+                               gateway_settings.RESPONSE_CACHE_TTLS,
+                               gateway_settings.RESPONSE_CACHE_STALE_TTL)
+
+registry.register(CallbackMetric(
+    "gateway_response_cache_requests_total", "Response cache lookups by result", ("result",),
+    lambda: [(("hit",), response_cache.hits), (("stale",), response_cache.stale_hits),
+             (("miss",), response_cache.misses)],
+    kind="counter"))
+registry.register(CallbackMetric(
+    "gateway_response_cache_bytes", "Response cache size in bytes", (),
+    lambda: [((), response_cache.bytes)]))
+registry.register(CallbackMetric(
+    "gateway_response_cache_entries", "Response cache entries", (),
+    lambda: [((), len(response_cache._entries))]))
+
+def _cache_key(client: httpx.AsyncClient, url: str, params: Optional[dict]) -> str:
+    return str(client.build_request("GET", url, params=params).url)
+
+async def cached_get(resource: str, client: httpx.AsyncClient, url: str,
+                     params: Optional[dict] = None) -> httpx.Response:
+    '''Функция GET-запроса коллекции через кэш ответов'''
+    return await response_cache.get_or_fetch(resource, _cache_key(client, url, params),
+                                             lambda: coalesced_get(client, url, params))
+
+def peek_cached(resource: str, client: httpx.AsyncClient, url: str,
+                params: Optional[dict] = None) -> Optional[httpx.Response]:
+    '''Функция получения свежей коллекции из кэша ответов, если она там есть'''
+    return response_cache.peek(resource, _cache_key(client, url, params))
@@ -1,15 +1,27 @@
 '''router.py'''
 
+import asyncio
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Path, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Path, Query, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import httpx
 import jwt
-import email_service
+from bulk import create_tasks
+from gateway_config import gateway_settings
+from loaders import fetch_employees_by_ids
+from reminder_scheduler import reminder_scheduler
 from schemas import Employee, EmployeeAdd, EmployeeUpdate
 from schemas import ProjectBase, ProjectCreate, ProjectResponse
 from schemas import Task, TaskCreate, TaskUpdate, Token
 from schemas import VacationAdd, VacationUpdate, SubdivisionLeaderUpdate
+from token_cache import token_cache
+from projection import parse_fields, project_fields
+from passthrough import (composite_response, conditional_response, is_valid_json,
+                         projected_response, proxy_collection, trusted_response)
+from resilience import error_status
+from response_cache import cached_get, response_cache
+from upstream import coalesced_get, get_user_client, get_task_client, upstreams
 
 # Определите SECRET_KEY и ALGORITHM такие же, как в user-service
 SECRET_KEY = "kains"
@@ -18,11 +30,22 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 # Конфигурация URL-ов первых двух сервисовё
-USER_SERVICE_URL = "http://45.92.176.81:44444"
-TASK_SERVICE_URL = "http://45.92.176.81:44445"
+# Логические адреса сервисов: реплики выбирает транспорт клиента (upstream.py)
+USER_SERVICE_URL = upstreams.url("user")
+TASK_SERVICE_URL = upstreams.url("task")
+
+# Общие клиенты сервисов с пулом соединений (создаются в lifespan приложения)
+UserClient = Annotated[httpx.AsyncClient, Depends(get_user_client)]
+TaskClient = Annotated[httpx.AsyncClient, Depends(get_task_client)]
+
+# Параметры постраничной выдачи коллекций
+PageLimit = Annotated[Optional[int], Query(ge=1, description="Размер страницы (ограничен сервером)")]
+PageCursor = Annotated[Optional[str], Query(description="Курсор следующей страницы из next_cursor")]
+# Отбор полей ответа: список через запятую или @list (поля для списков)
+Fields = Annotated[Optional[str], Query(description="Поля через запятую или @list")]
 
 # Функция для проверки, что пользователь аутентифицирован
-async def user_logined(token: str = Depends(oauth2_scheme)) -> Employee:
+async def user_logined(client: UserClient, token: str = Depends(oauth2_scheme)) -> Employee:
     '''Функция для подтверждения аутентификации пользователя'''
     credentials_exception = HTTPException(
         status_code=401,
@@ -37,15 +60,21 @@ async def user_logined(token: str = Depends(oauth2_scheme)) -> Employee:
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
+    # Подпись и срок токена уже проверены, работника берем из кэша если он есть
+    cache_key = token_cache.make_key(username, token)
+    cached_user = token_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
     # Запрос данных о пользователе в user-service по login
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/employee/users/me",
-                                    params={"login": username})
-        if response.status_code == 200:
-            user_data = response.json()
-            return Employee(**user_data)  # Преобразование JSON в объект Employee
-        else:
-            raise credentials_exception
+    response = await coalesced_get(client, f"{USER_SERVICE_URL}/employee/users/me",
+                                   params={"login": username})
+    if response.status_code == 200:
+        user_data = response.json()
+        employee = Employee(**user_data)  # Преобразование JSON в объект Employee
+        token_cache.put(cache_key, employee, payload.get("exp"))
+        return employee
+    else:
+        raise credentials_exception
 
 authentication_router = APIRouter()
 
@@ -55,7 +84,7 @@ async def read_users_me(current_user: Employee = Depends(user_logined)):
     return {"id": current_user.id,"username": current_user.login,"email": current_user.email}
 
 @authentication_router.post("/register", response_model=Token)
-async def register(user: Annotated[EmployeeAdd , Depends()]):
+async def register(user: Annotated[EmployeeAdd , Depends()], client: UserClient):
     '''Эндпоинт для регистрации через user-service'''
     params = {
         "last_name": user.last_name,
@@ -68,420 +97,527 @@ async def register(user: Annotated[EmployeeAdd , Depends()]):
         "is_vacation": user.is_vacation.value
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{USER_SERVICE_URL}/employee/register", params=params)
-        if response.status_code == 200:
-            token_data = response.json()
-            return {"access_token": token_data["access_token"], "token_type": "bearer"}
-        else:
-            raise HTTPException(status_code=response.status_code,
-                                detail=response.json().get("detail", "Registration failed"))
+    response = await client.post(f"{USER_SERVICE_URL}/employee/register", params=params)
+    response_cache.invalidate("employees")
+    if response.status_code == 200:
+        token_data = response.json()
+        return {"access_token": token_data["access_token"], "token_type": "bearer"}
+    else:
+        raise HTTPException(status_code=response.status_code,
+                            detail=response.json().get("detail", "Registration failed"))
 
 @authentication_router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(client: UserClient, form_data: OAuth2PasswordRequestForm = Depends()):
     '''Эндпоинт для логина через user-service'''
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{USER_SERVICE_URL}/employee/token", data={
-            'username': form_data.username,
-            'password': form_data.password
-        })
-        if response.status_code == 200:
-            token_data = response.json()
-            return {"access_token": token_data["access_token"], "token_type": "bearer"}
-        else:
-            raise HTTPException(status_code=response.status_code,
-                                detail=response.json().get("detail", "Login failed"))
+    response = await client.post(f"{USER_SERVICE_URL}/employee/token", data={
+        'username': form_data.username,
+        'password': form_data.password
+    })
+    if response.status_code == 200:
+        token_data = response.json()
+        return {"access_token": token_data["access_token"], "token_type": "bearer"}
+    else:
+        raise HTTPException(status_code=response.status_code,
+                            detail=response.json().get("detail", "Login failed"))
 
 @authentication_router.post("/notify_due_tasks")
 async def notify_due_tasks(background_tasks: BackgroundTasks, current_user: Employee = Depends(user_logined)):
     '''Эндпоинт для уведомления пользователя на имейл'''
-    background_tasks.add_task(email_service.check_due_tasks, current_user.email)
+    background_tasks.add_task(reminder_scheduler.run_now)
     return {"message": "Notification task has been scheduled"}
 
 employee_router = APIRouter()
 
 @employee_router.get("/employees", dependencies=[Depends(user_logined)])
-async def get_employees():
+async def get_employees(request: Request, client: UserClient, limit: PageLimit = None,
+                        cursor: PageCursor = None, fields: Fields = None):
     '''Функция для получения всех работников'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/employee/get_all")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not fetch users")
-        return response.json()
+    return await proxy_collection(request, "employees", client,
+                                  f"{USER_SERVICE_URL}/employee/get_all",
+                                  "Could not fetch users", limit, cursor, fields)
+
+@employee_router.get("/employee/batch", dependencies=[Depends(user_logined)])
+async def get_employees_batch(
+    client: UserClient,
+    ids: str = Query(..., description="id работников через запятую"),
+    fields: Fields = None,
+):
+    '''Функция для получения работников по набору id
+
+    Повторы id отбрасываются; работники берутся из кэша коллекции, если он есть,
+    иначе запрашиваются параллельно (или одной выгрузкой для большого набора).
+    '''
+    try:
+        user_ids = list(dict.fromkeys(int(item) for item in ids.split(",") if item.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not user_ids or any(user_id <= 0 for user_id in user_ids):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    if len(user_ids) > gateway_settings.EMPLOYEE_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many ids: max {gateway_settings.EMPLOYEE_BATCH_MAX_IDS}")
+    try:
+        employees = await fetch_employees_by_ids(client, USER_SERVICE_URL, user_ids)
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail="Could not fetch users")
+    found = [employee for employee in employees.values() if employee is not None]
+    return ORJSONResponse({
+        "employees": project_fields(found, parse_fields("employees", fields)),
+        "not_found": [user_id for user_id, employee in employees.items() if employee is None],
+    })
 
 @employee_router.get("/employee/{user_id}", dependencies=[Depends(user_logined)])
-async def get_employee(user_id: int):
+async def get_employee(request: Request, user_id: int, client: UserClient,
+                       fields: Fields = None):
     '''Функция для получения конкретного работника'''
     if user_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid user ID")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/employee/{user_id}")
-        print("response:", response)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not fetch user")
-        return response.json()
+    response = await coalesced_get(client, f"{USER_SERVICE_URL}/employee/{user_id}")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not fetch user")
+    return conditional_response(request, response, "employees", fields)
 
 @employee_router.post("/employee/add", dependencies=[Depends(user_logined)], response_model=Employee)
-async def add_employee(employee: Annotated[EmployeeAdd, Depends()]):
+async def add_employee(employee: Annotated[EmployeeAdd, Depends()], client: UserClient):
     '''Функция создания работника'''
-    async with httpx.AsyncClient() as client:
-        employee_dict = employee.model_dump(exclude_none=True)
-        employee_dict['email'] = employee.email.format()
-        employee_dict['is_supervisor'] = employee.is_supervisor.value
-        employee_dict['is_vacation'] = employee.is_vacation.value
-        params = {k: v for k, v in employee_dict.items() if v is not None}
-        response = await client.post(
-            f"{USER_SERVICE_URL}/employee/add",
-            params=params
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                                detail="Could not create employee")
-        return response.json()
+    employee_dict = employee.model_dump(exclude_none=True)
+    employee_dict['email'] = employee.email.format()
+    employee_dict['is_supervisor'] = employee.is_supervisor.value
+    employee_dict['is_vacation'] = employee.is_vacation.value
+    params = {k: v for k, v in employee_dict.items() if v is not None}
+    response = await client.post(
+        f"{USER_SERVICE_URL}/employee/add",
+        params=params
+    )
+    response_cache.invalidate("employees")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,
+                            detail="Could not create employee")
+    return trusted_response("add_employee", response)
 
 @employee_router.put("/employee/update", dependencies=[Depends(user_logined)], response_model = Employee)
-async def update_employee(id: int, employee: Annotated[EmployeeUpdate, Depends()]):
+async def update_employee(id: int, employee: Annotated[EmployeeUpdate, Depends()],
+                          client: UserClient):
     """Функция для обновления работника"""
-    async with httpx.AsyncClient() as client:
-        employee_dict = employee.model_dump(exclude_none=True)
-        response = await client.put(
-            f"{USER_SERVICE_URL}/employee/update",
-            params={"id": id, **employee_dict}
-        )
-        if response.status_code != 200:
-            try:
-                error_detail = response.json()
-            except Exception:
-                error_detail = response.text
-            raise HTTPException(status_code=response.status_code,
-                                detail=f"Could not updated employee: {error_detail}")
-        return response.json()
+    employee_dict = employee.model_dump(exclude_none=True)
+    response = await client.put(
+        f"{USER_SERVICE_URL}/employee/update",
+        params={"id": id, **employee_dict}
+    )
+    response_cache.invalidate("employees")
+    if response.status_code != 200:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+        raise HTTPException(status_code=response.status_code,
+                            detail=f"Could not updated employee: {error_detail}")
+    token_cache.invalidate_user(id)
+    return trusted_response("update_employee", response)
 
 @employee_router.delete("/employee/{id}", dependencies=[Depends(user_logined)])
-async def delete_employee(id: int):
+async def delete_employee(id: int, client: UserClient):
     '''Функция для удаления работника'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{USER_SERVICE_URL}/employee/{id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Not found employee")
-        return response.json()
+    response = await client.delete(f"{USER_SERVICE_URL}/employee/{id}")
+    response_cache.invalidate("employees", "subdivisions", "vacations")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Not found employee")
+    token_cache.invalidate_user(id)
+    return response.json()
 
 @employee_router.get("/subdivision/get_all", dependencies=[Depends(user_logined)])
-async def read_all_subdivision():
+async def read_all_subdivision(request: Request, client: UserClient, fields: Fields = None):
     '''Функция получения подразделения'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/subdivision/get_all")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not get subdivision")
-        return response.json()
+    return await proxy_collection(request, "subdivisions", client,
+                                  f"{USER_SERVICE_URL}/subdivision/get_all",
+                                  "Could not get subdivision", fields=fields)
 
 @employee_router.get("/subdivision/{subdivision_id}", dependencies=[Depends(user_logined)])
-async def read_subdivision(subdivision_id: int):
+async def read_subdivision(request: Request, subdivision_id: int, client: UserClient,
+                           fields: Fields = None):
     '''Функция получения подразделения'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/subdivision/{subdivision_id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not found subdivision")
-        return response.json()
+    response = await coalesced_get(client, f"{USER_SERVICE_URL}/subdivision/{subdivision_id}")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not found subdivision")
+    return conditional_response(request, response, "subdivisions", fields)
 
 @employee_router.post("/subdivision/add", dependencies=[Depends(user_logined)])
-async def add_subdivision(subdivision: Annotated[SubdivisionLeaderUpdate, Depends()]):
+async def add_subdivision(subdivision: Annotated[SubdivisionLeaderUpdate, Depends()],
+                          client: UserClient):
     '''Функция создания подразделения'''
-    async with httpx.AsyncClient() as client:
-        subdivision_dict = subdivision.model_dump(exclude_none=True)
-        response = await client.post(
-            f"{USER_SERVICE_URL}/subdivision/add",
-            params=subdivision_dict
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                                detail="Could not create subdivision")
-        return response.json()
+    subdivision_dict = subdivision.model_dump(exclude_none=True)
+    response = await client.post(
+        f"{USER_SERVICE_URL}/subdivision/add",
+        params=subdivision_dict
+    )
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,
+                            detail="Could not create subdivision")
+    return response.json()
 
 @employee_router.put("/subdivision/update/{subdivision_id}", dependencies=[Depends(user_logined)])
-async def update_subdivision(subdivision_id: int,name: str,):
+async def update_subdivision(subdivision_id: int,name: str, client: UserClient):
     '''Функция обновления подразделения'''
-    async with httpx.AsyncClient() as client:
-        params = {
-            "subdivision_id": subdivision_id,
-            "name": name,
-        }
-        response = await client.put(f"{USER_SERVICE_URL}/subdivision/update/{subdivision_id}",
-                                    params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                                detail="Could not update subdivision")
-        return response.json()
+    params = {
+        "subdivision_id": subdivision_id,
+        "name": name,
+    }
+    response = await client.put(f"{USER_SERVICE_URL}/subdivision/update/{subdivision_id}",
+                                params=params)
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,
+                            detail="Could not update subdivision")
+    return response.json()
 
 @employee_router.put("/subdivision/{subdivision_id}/assign_leader/{leader_id}", dependencies=[Depends(user_logined)])
 async def assign_leader(
     subdivision_id: int,
+    client: UserClient,
     leader_id: int = Path(..., description="ID руководителя (является ID сотрудника)")):
     '''Функция обновления руководителя подразделения'''
-    async with httpx.AsyncClient() as client:
-        params = {
-            "subdivision_id": subdivision_id,
-            "leader_id_id": leader_id,
-        }
-        response = await client.put(f"{USER_SERVICE_URL}/subdivision/{subdivision_id}/assign_leader/{leader_id}",params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                                detail="Could assign leader to subdivision")
-        return response.json()
+    params = {
+        "subdivision_id": subdivision_id,
+        "leader_id_id": leader_id,
+    }
+    response = await client.put(f"{USER_SERVICE_URL}/subdivision/{subdivision_id}/assign_leader/{leader_id}",params=params)
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,
+                            detail="Could assign leader to subdivision")
+    return response.json()
 
 @employee_router.put("/subdivision/assign_employee", dependencies=[Depends(user_logined)])
 async def assign_employee_to_subdivision(
+    client: UserClient,
     subdivision_id: int = Query(..., description="ID Subdivision"),
     employee_id: int = Query(..., description="ID Employee")):
     '''Функция добновления работника к подразделению'''
-    async with httpx.AsyncClient() as client:
-        params = {
-            "subdivision_id": subdivision_id,
-            "employee_id": employee_id,
-        }
-        response = await client.put(f"{USER_SERVICE_URL}/subdivision/assign_employee",params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,
-                                detail="Could assign employee to subdivision")
-        return response.json()
+    params = {
+        "subdivision_id": subdivision_id,
+        "employee_id": employee_id,
+    }
+    response = await client.put(f"{USER_SERVICE_URL}/subdivision/assign_employee",params=params)
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,
+                            detail="Could assign employee to subdivision")
+    return response.json()
 
 @employee_router.delete("/subdivision/{subdivision_id}/employee/{employee_id}", dependencies=[Depends(user_logined)])
-async def remove_employee_from_subdivision(subdivision_id: int,employee_id: int):
+async def remove_employee_from_subdivision(subdivision_id: int,employee_id: int,
+                                           client: UserClient):
     '''Функция для удаления работника от подразделения'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{USER_SERVICE_URL}/subdivision/{subdivision_id}/employee/{employee_id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Not found subdivision")
-        return response.json()
+    response = await client.delete(f"{USER_SERVICE_URL}/subdivision/{subdivision_id}/employee/{employee_id}")
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Not found subdivision")
+    return response.json()
 
 @employee_router.delete("/subdivision/{id}", dependencies=[Depends(user_logined)])
-async def delete_subdivision(id: int):
+async def delete_subdivision(id: int, client: UserClient):
     '''Функция для удаления подразделения'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{USER_SERVICE_URL}/subdivision/{id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Not found subdivision")
-        return response.json()
+    response = await client.delete(f"{USER_SERVICE_URL}/subdivision/{id}")
+    response_cache.invalidate("subdivisions")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Not found subdivision")
+    return response.json()
 
 @employee_router.get("/vacation/get_all", dependencies=[Depends(user_logined)])
-async def get_all_vacations():
+async def get_all_vacations(request: Request, client: UserClient, limit: PageLimit = None,
+                            cursor: PageCursor = None, fields: Fields = None):
     '''Функция получения всех отпусков и командировок'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{USER_SERVICE_URL}/business_and_vacations/get_all")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not fetch projects")
-        return response.json()
+    return await proxy_collection(request, "vacations", client,
+                                  f"{USER_SERVICE_URL}/business_and_vacations/get_all",
+                                  "Could not fetch projects", limit, cursor, fields)
 
 @employee_router.get("/vacation/search", dependencies=[Depends(user_logined)])
 async def get_employees_with_vacations(
+    request: Request,
+    client: UserClient,
     employee_id: Optional[int] = Query(default=None),
     type: Optional[str] = Query(..., description="Type of leave: 'vacation' or 'business'"),
+    fields: Fields = None,
 ):
     '''Функция для получения списка отпуска или командировок на работника'''
-    async with httpx.AsyncClient() as client:
-        params = {
-            "employee_id": employee_id,
-            "type": type,
-        }
-        params = {k: v for k, v in params.items() if v is not None}
-        response = await client.get(
-            f"{USER_SERVICE_URL}/business_and_vacations/search",
-            params=params
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,detail="Not Found")
-        return response.json()
+    params = {
+        "employee_id": employee_id,
+        "type": type,
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    response = await coalesced_get(
+        client,
+        f"{USER_SERVICE_URL}/business_and_vacations/search",
+        params=params
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,detail="Not Found")
+    return conditional_response(request, response, "vacations", fields)
     
 @employee_router.post("/vacation/add", dependencies=[Depends(user_logined)])
 async def add_vacations_or_business(
     vacation: Annotated[VacationAdd, Depends()],
+    client: UserClient,
     type: str = Query(default=None, description="Type of leave: 'vacation' or 'business'")):
     '''Функция для создания отпуска или командировки'''
-    async with httpx.AsyncClient() as client:
-        vacation_dict = vacation.model_dump()
-        vacation_dict['start_date'] = vacation.start_date.isoformat()
-        if vacation.end_date:
-            vacation_dict['end_date'] = vacation.end_date.isoformat()
-        vacation_dict['type'] = vacation_dict['type'].value
-        params = {k: v for k, v in vacation_dict.items() if v is not None}
-        response = await client.post(
-            f"{USER_SERVICE_URL}/business_and_vacations/add",
-            params=params
-        )
-        if response.status_code != 200:
-            try:
-                error_detail = response.json()
-            except Exception:
-                error_detail = response.text
-            raise HTTPException(status_code=response.status_code,
-                                detail=f"Could not create task: {error_detail}")
-        return response.json()
+    vacation_dict = vacation.model_dump()
+    vacation_dict['start_date'] = vacation.start_date.isoformat()
+    if vacation.end_date:
+        vacation_dict['end_date'] = vacation.end_date.isoformat()
+    vacation_dict['type'] = vacation_dict['type'].value
+    params = {k: v for k, v in vacation_dict.items() if v is not None}
+    response = await client.post(
+        f"{USER_SERVICE_URL}/business_and_vacations/add",
+        params=params
+    )
+    response_cache.invalidate("vacations")
+    if response.status_code != 200:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+        raise HTTPException(status_code=response.status_code,
+                            detail=f"Could not create task: {error_detail}")
+    return response.json()
 
 @employee_router.put("/vacation/update", dependencies=[Depends(user_logined)])
-async def update_vacations_or_business(id: int, vacation: Annotated[VacationUpdate, Depends()]):
+async def update_vacations_or_business(id: int, vacation: Annotated[VacationUpdate, Depends()],
+                                       client: UserClient):
     '''Функция для обновления отпуска или командировки'''
-    async with httpx.AsyncClient() as client:
-        vacation_dict = vacation.model_dump(exclude_none=True)
-        if 'start_date' in vacation_dict:
-            vacation_dict['start_date'] = vacation_dict['start_date'].isoformat()
-        if 'end_date' in vacation_dict:
-            vacation_dict['end_date'] = vacation_dict['end_date'].isoformat()
-        vacation_dict['type'] = vacation_dict['type'].value
-        response = await client.put(
-            f"{USER_SERVICE_URL}/business_and_vacations/update",
-            params={"id": id, **vacation_dict}
-        )
-        if response.status_code != 200:
-            try:
-                error_detail = response.json()
-            except Exception:
-                error_detail = response.text
-            raise HTTPException(status_code=response.status_code,
-                                detail=f"Could not updated task: {error_detail}")
-        return response.json()
+    vacation_dict = vacation.model_dump(exclude_none=True)
+    if 'start_date' in vacation_dict:
+        vacation_dict['start_date'] = vacation_dict['start_date'].isoformat()
+    if 'end_date' in vacation_dict:
+        vacation_dict['end_date'] = vacation_dict['end_date'].isoformat()
+    vacation_dict['type'] = vacation_dict['type'].value
+    response = await client.put(
+        f"{USER_SERVICE_URL}/business_and_vacations/update",
+        params={"id": id, **vacation_dict}
+    )
+    response_cache.invalidate("vacations")
+    if response.status_code != 200:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+        raise HTTPException(status_code=response.status_code,
+                            detail=f"Could not updated task: {error_detail}")
+    return response.json()
 
 @employee_router.delete("/vacation/{id}", dependencies=[Depends(user_logined)])
-async def delete_vacations_or_business(id: int):
+async def delete_vacations_or_business(id: int, client: UserClient):
     '''Функция для удаления отпуска или командировки'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{USER_SERVICE_URL}/business_and_vacations/{id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not delete task")
-        return response.json()
+    response = await client.delete(f"{USER_SERVICE_URL}/business_and_vacations/{id}")
+    response_cache.invalidate("vacations")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not delete task")
+    return response.json()
 
 project_router = APIRouter()
 task_router = APIRouter()
 
 @project_router.get("/project/read_all", dependencies=[Depends(user_logined)])
-async def read_all_projects():
+async def read_all_projects(request: Request, client: TaskClient, limit: PageLimit = None,
+                            cursor: PageCursor = None, fields: Fields = None):
     '''Функция получения всех проектов'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TASK_SERVICE_URL}/project/read_all")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not fetch projects")
-        return response.json()
+    return await proxy_collection(request, "projects", client,
+                                  f"{TASK_SERVICE_URL}/project/read_all",
+                                  "Could not fetch projects", limit, cursor, fields)
 
 @project_router.post("/project/add", response_model=ProjectResponse, dependencies=[Depends(user_logined)])
-async def create_project(project: Annotated[ProjectCreate, Depends()]):
+async def create_project(project: Annotated[ProjectCreate, Depends()], client: TaskClient):
     '''Функция создания проектов'''
-    async with httpx.AsyncClient() as client:
-        project_dict = project.model_dump()
-        response = await client.post(
-            f"{TASK_SERVICE_URL}/project/add",
-            params=project_dict
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not create project")
-        return response.json()
+    project_dict = project.model_dump()
+    response = await client.post(
+        f"{TASK_SERVICE_URL}/project/add",
+        params=project_dict
+    )
+    response_cache.invalidate("projects", "tasks")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not create project")
+    return trusted_response("create_project", response)
 
 @project_router.put("/project/update", dependencies=[Depends(user_logined)])
-async def update_project(id: int, project: Annotated[ProjectBase, Depends()]):
+async def update_project(id: int, project: Annotated[ProjectBase, Depends()], client: TaskClient):
     '''Функция обновления проектов'''
-    async with httpx.AsyncClient() as client:
-        project_dict = project.model_dump()
-        response = await client.put(
-            f"{TASK_SERVICE_URL}/project/update",
-            params={"id": id, **project_dict}
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not update project")
-        return response.json()
+    project_dict = project.model_dump()
+    response = await client.put(
+        f"{TASK_SERVICE_URL}/project/update",
+        params={"id": id, **project_dict}
+    )
+    response_cache.invalidate("projects", "tasks")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not update project")
+    return response.json()
 
 @project_router.delete("/project/{id}", dependencies=[Depends(user_logined)])
-async def delete_project(id: int):
+async def delete_project(id: int, client: TaskClient):
     '''Функция для удаления проекта'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{TASK_SERVICE_URL}/project/{id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not delete project")
-        return response.json()
+    response = await client.delete(f"{TASK_SERVICE_URL}/project/{id}")
+    response_cache.invalidate("projects", "tasks")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not delete project")
+    return response.json()
 
 @task_router.get("/task/read_all", dependencies=[Depends(user_logined)])
-async def read_all_tasks():
+async def read_all_tasks(request: Request, client: TaskClient, limit: PageLimit = None,
+                         cursor: PageCursor = None, fields: Fields = None):
     '''Функция для получения всех задач'''
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TASK_SERVICE_URL}/task/read_all")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not fetch tasks")
-        return response.json()
+    return await proxy_collection(request, "tasks", client,
+                                  f"{TASK_SERVICE_URL}/task/read_all",
+                                  "Could not fetch tasks", limit, cursor, fields)
+
+def task_params(task: TaskCreate) -> dict:
+    '''Функция параметров запроса создания задачи в task-service'''
+    task_dict = task.model_dump()
+    task_dict['due_date'] = task.due_date.isoformat()
+    if task.actual_due_date:
+        task_dict['actual_due_date'] = task.actual_due_date.isoformat()
+    task_dict['type'] = task_dict['type'].value
+    return {k: v for k, v in task_dict.items() if v is not None}
 
 @task_router.post("/task/add", response_model=TaskCreate, dependencies=[Depends(user_logined)])
-async def create_task(task: Annotated[TaskCreate, Depends()]):
+async def create_task(task: Annotated[TaskCreate, Depends()], client: TaskClient):
     '''Функция для создания задачи'''
-    async with httpx.AsyncClient() as client:
-        task_dict = task.model_dump()
-        task_dict['due_date'] = task.due_date.isoformat()
-        if task.actual_due_date:
-            task_dict['actual_due_date'] = task.actual_due_date.isoformat()
-        task_dict['type'] = task_dict['type'].value
-        params = {k: v for k, v in task_dict.items() if v is not None}
-        response = await client.post(
-            f"{TASK_SERVICE_URL}/task/add",
-            params=params
-        )
-        if response.status_code != 200:
-            try:
-                error_detail = response.json()
-            except Exception:
-                error_detail = response.text
-            raise HTTPException(status_code=response.status_code, detail=f"Could not create task: {error_detail}")
-        return response.json()
+    response = await client.post(
+        f"{TASK_SERVICE_URL}/task/add",
+        params=task_params(task)
+    )
+    response_cache.invalidate("tasks")
+    if response.status_code != 200:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=f"Could not create task: {error_detail}")
+    return trusted_response("create_task", response)
+
+@task_router.post("/task/bulk_add", dependencies=[Depends(user_logined)])
+async def bulk_create_tasks(tasks: List[TaskCreate], client: TaskClient):
+    '''Функция для пакетного создания задач
+
+    Пачка проверяется целиком до отправки, аутентификация выполняется один раз,
+    задачи создаются параллельно; результат возвращается по каждой задаче.
+    '''
+    if len(tasks) > gateway_settings.TASK_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"Too many tasks: max {gateway_settings.TASK_BULK_MAX_ITEMS}")
+    results = await create_tasks(client, TASK_SERVICE_URL, [task_params(task) for task in tasks])
+    created = sum(1 for result in results if result["status"] == 200)
+    return {"created": created, "failed": len(results) - created, "results": results}
 
 @task_router.get("/task/search", response_model=List[Task], dependencies=[Depends(user_logined)])
 async def search_task(
+    client: TaskClient,
     id: Optional[int] = Query(default=None),
     title: Optional[str] = Query(default=None),
     description: Optional[str] = Query(default=None),
     user_id: Optional[int] = Query(default=None),
     project_id: Optional[int] = Query(default=None),
     project: Optional[str] = Query(default=None),
+    fields: Fields = None,
 ):
     '''Функция для поиска задач'''
-    async with httpx.AsyncClient() as client:
-        params = {
-            "id": id,
-            "title": title,
-            "description": description,
-            "user_id": user_id,
-            "project_id": project_id,
-            "project": project,
-        }
-        params = {k: v for k, v in params.items() if v is not None}
-        response = await client.get(
-            f"{TASK_SERVICE_URL}/task/search",
-            params=params
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code,detail="Not Found")
-        return response.json()
+    params = {
+        "id": id,
+        "title": title,
+        "description": description,
+        "user_id": user_id,
+        "project_id": project_id,
+        "project": project,
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    response = await coalesced_get(
+        client,
+        f"{TASK_SERVICE_URL}/task/search",
+        params=params
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code,detail="Not Found")
+    if fields:
+        return projected_response(response.json(), "tasks", fields)
+    return trusted_response("search_task", response)
 
 @task_router.put("/task/update", response_model=TaskUpdate, dependencies=[Depends(user_logined)])
-async def update_task(id: int, task: Annotated[TaskUpdate, Depends()]):
+async def update_task(id: int, task: Annotated[TaskUpdate, Depends()], client: TaskClient):
     '''Функция для обновления задачи'''
-    async with httpx.AsyncClient() as client:
-        task_dict = task.model_dump(exclude_none=True)
-        if 'due_date' in task_dict:
-            task_dict['due_date'] = task_dict['due_date'].isoformat()
-        if 'actual_due_date' in task_dict:
-            task_dict['actual_due_date'] = task_dict['actual_due_date'].isoformat()
-        task_dict['type'] = task_dict['type'].value
-        response = await client.put(
-            f"{TASK_SERVICE_URL}/task/update",
-            params={"id": id, **task_dict}
-        )
-        if response.status_code != 200:
-            try:
-                error_detail = response.json()
-            except Exception:
-                error_detail = response.text
-            raise HTTPException(status_code=response.status_code, detail=f"Could not updated task: {error_detail}")
-        return response.json()
+    task_dict = task.model_dump(exclude_none=True)
+    if 'due_date' in task_dict:
+        task_dict['due_date'] = task_dict['due_date'].isoformat()
+    if 'actual_due_date' in task_dict:
+        task_dict['actual_due_date'] = task_dict['actual_due_date'].isoformat()
+    task_dict['type'] = task_dict['type'].value
+    response = await client.put(
+        f"{TASK_SERVICE_URL}/task/update",
+        params={"id": id, **task_dict}
+    )
+    response_cache.invalidate("tasks")
+    if response.status_code != 200:
+        try:
+            error_detail = response.json()
+        except Exception:
+            error_detail = response.text
+        raise HTTPException(status_code=response.status_code, detail=f"Could not updated task: {error_detail}")
+    return trusted_response("update_task", response)
 
 @task_router.delete("/task/{id}", dependencies=[Depends(user_logined)])
-async def delete_task(id: int):
+async def delete_task(id: int, client: TaskClient):
     '''Функция для удаления задачи'''
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{TASK_SERVICE_URL}/task/{id}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Could not delete task")
-        return response.json()
\ No newline at end of file
+    response = await client.delete(f"{TASK_SERVICE_URL}/task/{id}")
+    response_cache.invalidate("tasks")
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Could not delete task")
+    return response.json()
+
+dashboard_router = APIRouter()
+
+# Коллекции сводки: ресурс, сервис и адрес выгрузки
+DASHBOARD_COLLECTIONS = (
+    ("employees", "user", f"{USER_SERVICE_URL}/employee/get_all"),
+    ("subdivisions", "user", f"{USER_SERVICE_URL}/subdivision/get_all"),
+    ("vacations", "user", f"{USER_SERVICE_URL}/business_and_vacations/get_all"),
+    ("projects", "task", f"{TASK_SERVICE_URL}/project/read_all"),
+    ("tasks", "task", f"{TASK_SERVICE_URL}/task/read_all"),
+)
+
+@dashboard_router.get("/dashboard", dependencies=[Depends(user_logined)])
+async def get_dashboard(user_client: UserClient, task_client: TaskClient):
+    '''Функция сводки для первой загрузки: все коллекции одним запросом
+
+    Коллекции запрашиваются параллельно (через кэш ответов), так что время ответа
+    определяет самый медленный сервис. Недоступная коллекция приходит как null,
+    а причина - в разделе errors.
+    '''
+    clients = {"user": user_client, "task": task_client}
+    responses = await asyncio.gather(
+        *(cached_get(resource, clients[name], url) for resource, name, url in DASHBOARD_COLLECTIONS),
+        return_exceptions=True)
+    parts, errors = {}, {}
+    for (resource, _, _), response in zip(DASHBOARD_COLLECTIONS, responses):
+        parts[resource] = None
+        if isinstance(response, httpx.HTTPError):
+            errors[resource] = {"status": error_status(response), "detail": str(response)}
+        elif isinstance(response, BaseException):
+            raise response
+        elif response.status_code != 200:
+            errors[resource] = {"status": response.status_code,
+                                "detail": f"Could not fetch {resource}"}
+        elif not is_valid_json(response):
+            errors[resource] = {"status": 502, "detail": f"Invalid JSON in {resource}"}
+        else:
+            parts[resource] = response.content
+    status_code = 502 if len(errors) == len(DASHBOARD_COLLECTIONS) else 200
+    return composite_response(parts, errors, status_code)
+
+service_router = APIRouter()
+
+@service_router.get("/cache", dependencies=[Depends(user_logined)])
+async def cache_stats():
+    '''Функция статистики кэшей шлюза: доля попаданий и занятый объем'''
+    return {"responses": response_cache.stats(), "tokens": token_cache.stats()}
+
+@service_router.get("/upstreams", dependencies=[Depends(user_logined)])
+async def upstream_stats():
+    '''Функция состояния сервисов: автоматы отключения, повторы и политики вызовов'''
+    return upstreams.stats()
@@ -0,0 +1,238 @@
+'''serve.py
+
+Точка запуска сервера. SERVER_ENV=development - один процесс uvicorn с --reload,
+SERVER_ENV=production - супервизор с несколькими воркерами uvloop/httptools на
+общем сокете:
+    SIGHUP          - поочередный перезапуск воркеров без потери соединений
+    SIGTERM, SIGINT - плавная остановка
+Воркер, обработавший SERVER_MAX_REQUESTS запросов или упавший, заменяется новым.
+Cron напоминаний выполняет один воркер: тот, что держит блокировку
+REMINDER_LOCK_FILE (см. reminder_scheduler.py).
+
+Кэши ответов и токенов у каждого воркера свои: запись через один воркер
+сбрасывает только его кэш, другие воркеры отдают прежние данные до истечения
+срока (TTL + RESPONSE_CACHE_STALE_TTL, TOKEN_CACHE_MAX_AGE; см. gateway_config.py).
+'''
+
+import importlib.util
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import signal
+import time
+from typing import List, Optional
+import uvicorn
+from gateway_config import gateway_settings
+
+APP = "main:app"
+DEVELOPMENT, PRODUCTION = "development", "production"
+
+def _cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    '''Функция квоты CPU контейнера (cgroup v2 или v1); None - квоты нет'''
+    try:
+        with open(os.path.join(root, "cpu.max"), encoding="ascii") as file:
+            quota, period = file.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us"), encoding="ascii") as file:
+            quota = int(file.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us"), encoding="ascii") as file:
+            period = int(file.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+def available_cpus(root: str = "/sys/fs/cgroup") -> int:
+    '''Функция числа CPU, доступных процессу: привязка к ядрам и квота cgroup'''
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
+
+def worker_count() -> int:
+    '''Функция числа воркеров: SERVER_WORKERS или по одному на доступный CPU'''
+    return gateway_settings.SERVER_WORKERS or available_cpus()
+
+def _implementation(name: str, fallback: str) -> str:
+    '''Функция выбора реализации uvicorn: name, если пакет установлен'''
+    if importlib.util.find_spec(name) is not None:
+        return name
+    print(f"Package '{name}' is not installed, using {fallback}")
+    return fallback
+
+def _worker_config(max_requests: Optional[int]) -> uvicorn.Config:
+    return uvicorn.Config(
+        APP,
+        host=gateway_settings.SERVER_HOST,
+        port=gateway_settings.SERVER_PORT,
+        loop=_implementation("uvloop", "asyncio"),
+        http=_implementation("httptools", "h11"),
+        lifespan="on",
+        log_level=gateway_settings.SERVER_LOG_LEVEL,
+        access_log=gateway_settings.SERVER_ACCESS_LOG,
+        timeout_keep_alive=gateway_settings.SERVER_KEEPALIVE,
+        timeout_graceful_shutdown=int(gateway_settings.SERVER_GRACEFUL_TIMEOUT),
+        limit_max_requests=max_requests,
+    )
+
+class _WorkerServer(uvicorn.Server):
+    '''Класс сервера воркера, который сообщает супервизору о готовности'''
+    def __init__(self, config: uvicorn.Config, ready):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+def _run_worker(sock, ready, max_requests: Optional[int]):
+    '''Функция процесса воркера: uvicorn на сокете, открытом супервизором'''
+    # SIGHUP адресован супервизору; SIGTERM и SIGINT обрабатывает uvicorn
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    _WorkerServer(_worker_config(max_requests), ready).run(sockets=[sock])
+
+class _Worker:
+    '''Класс процесса воркера и его признака готовности'''
+    def __init__(self, process: multiprocessing.Process, ready):
+        self.process = process
+        self.ready = ready
+
+class Supervisor:
+    '''Класс супервизора воркеров uvicorn на общем сокете'''
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._context = multiprocessing.get_context("spawn")
+        self._socket = None
+        self._pool: List[_Worker] = []
+        self._signals: List[int] = []
+        self._respawn_delay = 0.0
+        # Время, раньше которого не запускаются замены воркеров, не сумевших стартовать
+        self._respawn_at = 0.0
+
+    def _spawn(self) -> _Worker:
+        max_requests = None
+        if gateway_settings.SERVER_MAX_REQUESTS > 0:
+            max_requests = gateway_settings.SERVER_MAX_REQUESTS + random.randint(
+                0, max(gateway_settings.SERVER_MAX_REQUESTS_JITTER, 0))
+        ready = self._context.Event()
+        process = self._context.Process(target=_run_worker, name="interface-service-worker",
+                                        args=(self._socket, ready, max_requests))
+        process.start()
+        worker = _Worker(process, ready)
+        self._pool.append(worker)
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> bool:
+        deadline = time.monotonic() + gateway_settings.SERVER_STARTUP_TIMEOUT
+        while time.monotonic() < deadline and worker.process.is_alive():
+            if signal.SIGTERM in self._signals or signal.SIGINT in self._signals:
+                return False
+            if worker.ready.wait(0.1):
+                return True
+        return False
+
+    def _stop(self, workers: List[_Worker]):
+        '''Функция плавной остановки воркеров: SIGTERM, ожидание, затем SIGKILL'''
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + gateway_settings.SERVER_GRACEFUL_TIMEOUT + 5
+        for worker in workers:
+            worker.process.join(max(deadline - time.monotonic(), 0))
+            if worker.process.is_alive():
+                print(f"Worker {worker.process.pid} did not stop in time, killing it", flush=True)
+                worker.process.kill()
+                worker.process.join()
+            if worker in self._pool:
+                self._pool.remove(worker)
+
+    def restart(self):
+        '''Функция поочередного перезапуска: новый воркер готов - старый останавливается'''
+        print(f"Rolling restart of {len(self._pool)} workers", flush=True)
+        for old in list(self._pool):
+            new = self._spawn()
+            if not self._wait_ready(new):
+                print(f"Worker {new.process.pid} {self._not_ready_reason(new)}, "
+                      f"restart aborted", flush=True)
+                self._stop([new])
+                return
+            self._stop([old])
+        print("Rolling restart finished", flush=True)
+
+    def _not_ready_reason(self, worker: _Worker) -> str:
+        '''Функция причины, по которой воркер не стал готов'''
+        if not worker.process.is_alive():
+            return f"exited with code {worker.process.exitcode} during startup"
+        if signal.SIGTERM in self._signals or signal.SIGINT in self._signals:
+            return "was not ready before shutdown"
+        return f"was not ready in {gateway_settings.SERVER_STARTUP_TIMEOUT:.0f}s"
+
+    def _reap(self):
+        '''Функция замены завершившихся воркеров (лимит запросов или сбой)'''
+        for worker in [w for w in self._pool if not w.process.is_alive()]:
+            self._pool.remove(worker)
+            worker.process.join()
+            print(f"Worker {worker.process.pid} exited with code {worker.process.exitcode}",
+                  flush=True)
+            if worker.ready.is_set():
+                self._respawn_delay = 0.0
+            else:
+                # Воркер не смог стартовать: замена запускается после паузы, но цикл
+                # супервизора не блокируется и продолжает обрабатывать сигналы
+                self._respawn_delay = min(max(self._respawn_delay * 2, 1.0), 30.0)
+                self._respawn_at = time.monotonic() + self._respawn_delay
+        if time.monotonic() < self._respawn_at:
+            return
+        while len(self._pool) < self.workers and not self._signals:
+            self._spawn()
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def run(self):
+        '''Функция работы супервизора до SIGTERM или SIGINT'''
+        self._socket = _worker_config(None).bind_socket()
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._on_signal)
+        print(f"Supervisor {os.getpid()} starting {self.workers} workers on "
+              f"{gateway_settings.SERVER_HOST}:{gateway_settings.SERVER_PORT}", flush=True)
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            while True:
+                multiprocessing.connection.wait(
+                    [worker.process.sentinel for worker in self._pool], timeout=0.5)
+                if signal.SIGTERM in self._signals or signal.SIGINT in self._signals:
+                    break
+                if signal.SIGHUP in self._signals:
+                    self._signals.clear()
+                    self.restart()
+                self._reap()
+        finally:
+            print("Supervisor stopping workers", flush=True)
+            self._stop(list(self._pool))
+            self._socket.close()
+
+def main():
+    '''Функция запуска сервера в режиме SERVER_ENV'''
+    env = gateway_settings.SERVER_ENV.lower()
+    if env == PRODUCTION:
+        Supervisor(worker_count()).run()
+    elif env == DEVELOPMENT:
+        uvicorn.run(APP, host=gateway_settings.SERVER_HOST, port=gateway_settings.SERVER_PORT,
+                    reload=True, log_level="debug")
+    else:
+        raise SystemExit(f"Unknown SERVER_ENV: {gateway_settings.SERVER_ENV} "
+                         f"(expected {DEVELOPMENT} or {PRODUCTION})")
+
+if __name__ == "__main__":
+    main()
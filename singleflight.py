@@ -0,0 +1,43 @@
+'''singleflight.py'''
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _Call:
+    '''Класс выполняющегося общего вызова и числа его ожидающих'''
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    '''Класс объединения одинаковых одновременных вызовов в один'''
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        '''Функция выполнения func один раз на все одновременные вызовы с одним ключом
+
+        Результат или исключение получают все ожидающие. Отмена одного ожидающего
+        не отменяет общий вызов; он отменяется, только когда ушли все ожидающие.
+        '''
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Результат больше никому не нужен: новые вызовы начнут свой запрос
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -1,26 +1,46 @@
 '''conftest.py'''
 
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Dict, List
 from contextlib import asynccontextmanager
 import httpx
 import pytest_asyncio
 from fastapi import FastAPI
+from resilience import UpstreamPolicy
+from response_cache import response_cache
 from router import employee_router, task_router
-from router import authentication_router, project_router
+from router import authentication_router, project_router, user_logined
+from token_cache import token_cache
+from upstream import UpstreamClients, upstreams
+
+def make_policy(**overrides) -> UpstreamPolicy:
+    '''Функция политики с короткими паузами для тестов'''
+    values = {
+        "connect_timeout": 1.0, "read_timeout": 1.0, "total_timeout": 5.0, "retries": 2,
+        "retry_backoff": 0.001, "retry_backoff_max": 0.002, "retry_budget_ratio": 0.2,
+        "retry_budget_reserve": 10.0, "breaker_window": 30.0, "breaker_min_requests": 4,
+        "breaker_error_rate": 0.5, "breaker_slow_call": 5.0, "breaker_slow_rate": 0.8,
+        "breaker_open_seconds": 60.0,
+    }
+    values.update(overrides)
+    return UpstreamPolicy(**values)
 
 @pytest_asyncio.fixture
 async def app() -> AsyncGenerator[FastAPI, None]:
     '''Функция для жизненного цикла приложения для тестов'''
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+        await upstreams.start()
         yield
+        await upstreams.close()
 
     app = FastAPI(lifespan=lifespan)
     app.include_router(employee_router)
     app.include_router(project_router)
     app.include_router(task_router)
     app.include_router(authentication_router)
-    yield app
+    # ASGITransport не запускает lifespan, поэтому запускаем его вручную
+    async with lifespan(app):
+        yield app
 
 @pytest_asyncio.fixture
 async def client(app: FastAPI) -> AsyncGenerator[httpx.AsyncClient, None]:
@@ -32,3 +52,56 @@ async def client(app: FastAPI) -> AsyncGenerator[httpx.AsyncClient, None]:
         print("Client is on")
         yield client
         print("Client is off")
+
+class StubUpstreams:
+    '''Класс сервисов-заглушек для тестов маршрутов: ответы по "МЕТОД путь" и учет запросов'''
+    def __init__(self):
+        self.routes: Dict[str, Callable[[httpx.Request], httpx.Response]] = {}
+        self.calls: List[str] = []
+
+    def json(self, key: str, body, status_code: int = 200):
+        '''Функция ответа заглушки JSON-телом на запрос "МЕТОД путь"'''
+        self.routes[key] = lambda request: httpx.Response(status_code, json=body)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        '''Функция обработки запроса шлюза к сервису'''
+        key = f"{request.method} {request.url.path}"
+        self.calls.append(key)
+        handler = self.routes.get(key)
+        if handler is None:
+            return httpx.Response(404, json={"detail": "Not found"})
+        return handler(request)
+
+@pytest_asyncio.fixture
+async def stub_upstreams() -> AsyncGenerator[StubUpstreams, None]:
+    '''Функция подмены сети к сервисам заглушками (политика вызовов и метрики остаются)'''
+    stubs = StubUpstreams()
+    # Автоматы, бюджеты повторов и балансировщики - свои на тест: ошибки заглушек
+    # не размыкают автомат и не исключают реплики в следующих тестах
+    saved = upstreams.breakers, upstreams.budgets, upstreams.balancers
+    fresh = UpstreamClients(upstreams.names)
+    upstreams.breakers, upstreams.budgets, upstreams.balancers = \
+        fresh.breakers, fresh.budgets, fresh.balancers
+    for name in upstreams.names:
+        await upstreams.set_transport(name, httpx.MockTransport(stubs.handle))
+    response_cache.clear()
+    token_cache.clear()
+    try:
+        yield stubs
+    finally:
+        upstreams.breakers, upstreams.budgets, upstreams.balancers = saved
+        for name in upstreams.names:
+            await upstreams.set_transport(name, None)
+        response_cache.clear()
+
+@pytest_asyncio.fixture
+async def gateway(stub_upstreams: StubUpstreams) -> AsyncGenerator[httpx.AsyncClient, None]:
+    '''Функция клиента приложения шлюза с сервисами-заглушками и без проверки токена'''
+    from main import app  # pylint: disable=import-outside-toplevel
+    app.dependency_overrides[user_logined] = lambda: None
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                     base_url="http://gateway") as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(user_logined, None)
@@ -0,0 +1,119 @@
+'''test_balancer.py'''
+
+import asyncio
+import time
+from collections import Counter
+import httpx
+import pytest
+from balancer import LEAST_OUTSTANDING, BalancingTransport, LoadBalancer
+from gateway_config import GatewaySettings, gateway_settings
+from resilience import CircuitBreaker, ResilientTransport, RetryBudget
+from tests.conftest import make_policy
+from upstream import UpstreamClients
+
+REPLICAS = ["http://10.0.0.1:8003", "http://10.0.0.2:8003/api"]
+
+def make_client(handler, strategy: str = "p2c", resilient: bool = False):
+    '''Функция клиента user-service с двумя репликами'''
+    balancer = LoadBalancer("user", REPLICAS, strategy)
+    transport = BalancingTransport(httpx.MockTransport(handler), {"user-service": balancer})
+    if resilient:
+        policy = make_policy(breaker_min_requests=100)
+        transport = ResilientTransport(transport, policy, CircuitBreaker("user", policy),
+                                       RetryBudget(1.0, 10.0))
+    return httpx.AsyncClient(transport=transport), balancer
+
+@pytest.mark.asyncio
+async def test_requests_are_routed_to_replicas():
+    '''Тест: логический адрес заменяется адресом реплики (с ее префиксом пути)'''
+    seen = []
+
+    def handler(request):
+        seen.append((request.headers["host"], request.url.path, request.url.query))
+        return httpx.Response(200)
+
+    client, _ = make_client(handler)
+    for _ in range(20):
+        await client.get("http://user-service/employee/1", params={"q": "x"})
+    assert set(seen) == {("10.0.0.1:8003", "/employee/1", b"q=x"),
+                         ("10.0.0.2:8003", "/api/employee/1", b"q=x")}
+    await client.get("http://other-host/ping")
+    assert seen[-1][0] == "other-host"
+
+@pytest.mark.asyncio
+async def test_least_outstanding_prefers_idle_replica():
+    '''Тест: пока одна реплика занята долгим запросом, запросы идут на другую'''
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        if request.url.path.endswith("/slow"):
+            started.set()
+            await release.wait()
+        return httpx.Response(200, json=request.url.host)
+
+    client, balancer = make_client(handler, LEAST_OUTSTANDING)
+    slow = asyncio.ensure_future(client.get("http://user-service/slow"))
+    await started.wait()
+    busy = [replica for replica in balancer.replicas if replica.outstanding]
+    assert len(busy) == 1
+    hosts = {(await client.get("http://user-service/fast")).json() for _ in range(10)}
+    assert hosts == {host for host in ("10.0.0.1", "10.0.0.2") if host != busy[0].url.host}
+    release.set()
+    await slow
+    assert all(replica.outstanding == 0 for replica in balancer.replicas)
+
+@pytest.mark.asyncio
+async def test_failing_replica_is_ejected_and_readmitted_after_probe(monkeypatch):
+    '''Тест: реплика с ошибками подряд исключается, проверка возвращает ее в работу'''
+    monkeypatch.setattr(gateway_settings, "UPSTREAM_EJECT_FAILURES", 2)
+    monkeypatch.setattr(gateway_settings, "UPSTREAM_EJECT_SECONDS", 0.05)
+    down = {"10.0.0.2"}
+    hits = Counter()
+
+    def handler(request):
+        hits[request.url.host] += 1
+        if request.url.host in down:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200)
+
+    client, balancer = make_client(handler, resilient=True)
+    # Повторы уходят на здоровую реплику: клиент ошибок не видит
+    for _ in range(20):
+        assert (await client.get("http://user-service/employee/1")).status_code == 200
+    assert balancer.replicas[1].healthy is False
+    assert hits["10.0.0.2"] == 2
+    down.clear()
+    await asyncio.sleep(0.06)
+    await client.get("http://user-service/employee/1")
+    await asyncio.sleep(0.01)
+    assert balancer.replicas[1].healthy is True
+    assert balancer.stats()["http://10.0.0.2:8003/api"]["ejections"] == 1
+
+def test_ejection_backoff_resets_after_healthy_period(monkeypatch):
+    '''Тест: после долгой работы без исключений срок исключения снова минимальный'''
+    monkeypatch.setattr(gateway_settings, "UPSTREAM_EJECT_SECONDS", 10.0)
+    monkeypatch.setattr(gateway_settings, "UPSTREAM_EJECT_RESET_SECONDS", 60.0)
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    balancer = LoadBalancer("user", REPLICAS)
+    replica = balancer.replicas[0]
+    for _ in range(3):
+        balancer.eject(replica)
+        balancer.readmit(replica)
+    assert replica.ejections == 3
+    now[0] += 30.0
+    balancer.record(replica, False)
+    assert replica.ejections == 3
+    now[0] += 30.0
+    balancer.record(replica, False)
+    assert replica.ejections == 0
+    balancer.eject(replica)
+    assert replica.ejected_until == now[0] + 10.0
+
+def test_replicas_missing_from_setting_use_defaults(monkeypatch):
+    '''Тест: UPSTREAM_REPLICAS только для одного сервиса - остальные берут адреса по умолчанию'''
+    monkeypatch.setattr(gateway_settings, "UPSTREAM_REPLICAS", {"task": ["http://10.0.0.9:8004"]})
+    clients = UpstreamClients(("user", "task"))
+    assert list(clients.balancers["task"].stats()) == ["http://10.0.0.9:8004"]
+    assert list(clients.balancers["user"].stats()) == \
+        GatewaySettings.model_fields["UPSTREAM_REPLICAS"].default["user"]
@@ -0,0 +1,28 @@
+'''test_bulk.py'''
+
+import asyncio
+import httpx
+import pytest
+from bulk import create_tasks
+
+@pytest.mark.asyncio
+async def test_create_tasks_reports_each_item_and_caps_concurrency():
+    '''Тест: результат по каждой задаче в порядке пачки, параллельность ограничена'''
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.001)
+        state["active"] -= 1
+        if request.url.params["title"] == "bad":
+            return httpx.Response(422, json={"detail": "invalid"})
+        return httpx.Response(200, json={"id": int(request.url.params["n"])})
+
+    tasks = [{"title": "bad" if n == 2 else "ok", "n": n} for n in range(12)]
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        results = await create_tasks(client, "http://task", tasks, concurrency=3)
+    assert [result["index"] for result in results] == list(range(12))
+    assert results[2] == {"index": 2, "status": 422, "error": {"detail": "invalid"}}
+    assert results[5] == {"index": 5, "status": 200, "task": {"id": 5}}
+    assert state["peak"] <= 3
@@ -0,0 +1,110 @@
+'''test_compression.py'''
+
+import gzip
+import httpx
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from starlette.requests import Request
+from compression import CompressionMiddleware, choose_encoding, compressed_passthrough
+from etag import encoded_etag
+import response_cache as response_cache_module
+from response_cache import ResponseCache
+
+BODY = b'{"items": "' + b"x" * 4096 + b'"}'
+
+def make_request(accept_encoding: str) -> Request:
+    '''Функция построения запроса с заголовком Accept-Encoding'''
+    return Request({"type": "http", "method": "GET",
+                    "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+def make_app() -> FastAPI:
+    '''Функция сборки приложения с ответами разного вида'''
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/large")
+    async def large():
+        return Response(BODY, media_type="application/json")
+
+    @app.get("/small")
+    async def small():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/encoded")
+    async def encoded():
+        return Response(gzip.compress(BODY), media_type="application/json",
+                        headers={"content-encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(4):
+                yield BODY
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    return app
+
+def test_choose_encoding_respects_q_zero():
+    '''Тест: сжатие с q=0 не выбирается'''
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+
+@pytest.mark.asyncio
+async def test_middleware_compresses_only_when_useful():
+    '''Тест: большие и потоковые тела сжимаются, малые и уже сжатые - нет'''
+    transport = httpx.ASGITransport(app=make_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                 headers={"accept-encoding": "gzip"}) as client:
+        large = await client.get("/large")
+        small = await client.get("/small")
+        encoded = await client.get("/encoded")
+        stream = await client.get("/stream")
+    assert large.headers["content-encoding"] == "gzip"
+    assert int(large.headers["content-length"]) < len(BODY)
+    assert large.content == BODY
+    assert "content-encoding" not in small.headers
+    assert encoded.content == BODY
+    assert stream.headers["content-encoding"] == "gzip"
+    assert stream.content == BODY * 4
+
+@pytest.mark.asyncio
+async def test_compressed_response_gets_encoding_specific_etag():
+    '''Тест: сжатое тело получает свой ETag, несжатое - исходный'''
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/tagged")
+    async def tagged():
+        return Response(BODY, media_type="application/json", headers={"etag": '"v1"'})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        gzipped = await client.get("/tagged", headers={"accept-encoding": "gzip"})
+        identity = await client.get("/tagged", headers={"accept-encoding": "identity"})
+    assert gzipped.headers["etag"] == '"v1-gzip"'
+    assert identity.headers["etag"] == '"v1"'
+
+def test_compressed_passthrough_etag_names_encoding():
+    '''Тест: тело сервиса, сжатое шлюзом, отдается с ETag сжатия'''
+    upstream = httpx.Response(200, content=BODY, headers={"content-type": "application/json"})
+    gzipped = compressed_passthrough(make_request("gzip"), upstream, '"v1"')
+    identity = compressed_passthrough(make_request("identity"), upstream, '"v1"')
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == '"v1-gzip"'
+    assert identity.headers["etag"] == '"v1"'
+    assert encoded_etag('W/"v1"', "br") == 'W/"v1-br"'
+
+@pytest.mark.asyncio
+async def test_compressed_copy_is_counted_in_response_cache(monkeypatch):
+    '''Тест: сжатая копия ответа из кэша добавляется к объему его записи'''
+    cache = ResponseCache(max_bytes=1 << 20, ttls={"tasks": 60}, stale_ttl=0)
+    monkeypatch.setattr(response_cache_module, "response_cache", cache)
+
+    async def fetch():
+        return httpx.Response(200, content=BODY, headers={"content-type": "application/json"})
+
+    upstream = await cache.get_or_fetch("tasks", "all", fetch)
+    gzipped = compressed_passthrough(make_request("gzip"), upstream, '"v1"')
+    compressed_passthrough(make_request("gzip"), upstream, '"v1"')
+    assert cache.stats()["bytes"] == len(BODY) + len(gzipped.body)
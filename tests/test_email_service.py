@@ -0,0 +1,98 @@
+'''test_email_service.py'''
+
+import asyncio
+import pytest
+import email_service
+from email_config import email_settings
+
+def task(task_id: int, user_id: int) -> dict:
+    '''Функция данных задачи для сервиса-заглушки'''
+    return {"id": task_id, "title": f"t{task_id}", "user_id": user_id,
+            "due_date": "2026-10-18T09:00:00"}
+
+def employee(user_id: int) -> dict:
+    '''Функция данных работника с email для сервиса-заглушки'''
+    return {"id": user_id, "email": f"u{user_id}@example.com"}
+
+class SentMails(list):
+    '''Класс отправленных писем (получатель, тема, текст) и пика одновременных отправок'''
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+
+    async def send_email(self, subject: str, recipients: list, body: str):
+        '''Функция-подмена отправки письма'''
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.001)
+        self.active -= 1
+        self.append((recipients[0], subject, body))
+        return True
+
+@pytest.fixture
+def sent(monkeypatch):
+    '''Функция подмены отправки писем: письма копятся в списке'''
+    mails = SentMails()
+    monkeypatch.setattr(email_service, "send_email", mails.send_email)
+    monkeypatch.setattr(email_settings, "REMINDER_DIGEST", False)
+    return mails
+
+@pytest.mark.asyncio
+async def test_each_user_email_is_looked_up_once(stub_upstreams, sent):
+    '''Тест: email запрашивается один раз на работника, а не на каждую задачу'''
+    stub_upstreams.json("GET /task/read_all", [task(i, i % 5 + 1) for i in range(30)])
+    for user_id in range(1, 6):
+        stub_upstreams.json(f"GET /employee/{user_id}", employee(user_id))
+    report = await email_service.check_due_tasks()
+    lookups = [call for call in stub_upstreams.calls if call.startswith("GET /employee/")]
+    assert sorted(lookups) == [f"GET /employee/{user_id}" for user_id in range(1, 6)]
+    assert report["users"] == 5 and report["sent"] == 30 and len(sent) == 30
+
+@pytest.mark.asyncio
+async def test_many_users_are_looked_up_with_one_collection_request(stub_upstreams, sent):
+    '''Тест: большой набор работников берется одной выгрузкой коллекции'''
+    stub_upstreams.json("GET /task/read_all", [task(i, i) for i in range(1, 41)])
+    stub_upstreams.json("GET /employee/get_all", [employee(i) for i in range(1, 41)])
+    report = await email_service.check_due_tasks()
+    assert stub_upstreams.calls == ["GET /task/read_all", "GET /employee/get_all"]
+    assert report["sent"] == 40
+
+@pytest.mark.asyncio
+async def test_send_concurrency_is_limited(stub_upstreams, sent, monkeypatch):
+    '''Тест: одновременно отправляется не больше REMINDER_SEND_CONCURRENCY писем'''
+    monkeypatch.setattr(email_settings, "REMINDER_SEND_CONCURRENCY", 3)
+    stub_upstreams.json("GET /task/read_all", [task(i, 1) for i in range(20)])
+    stub_upstreams.json("GET /employee/1", employee(1))
+    await email_service.check_due_tasks()
+    assert len(sent) == 20
+    assert sent.peak == 3
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("digest, mails", [(True, 50), (False, 300)])
+async def test_digest_switch(stub_upstreams, sent, monkeypatch, digest, mails):
+    '''Тест: 300 задач у 50 работников - 50 писем в режиме дайджеста, 300 без него'''
+    monkeypatch.setattr(email_settings, "REMINDER_DIGEST", digest)
+    stub_upstreams.json("GET /task/read_all", [task(i, i % 50 + 1) for i in range(300)])
+    stub_upstreams.json("GET /employee/get_all", [employee(i) for i in range(1, 51)])
+    report = await email_service.check_due_tasks()
+    assert report["digest"] is digest
+    assert report["tasks"] == 300 and report["sent"] == mails and len(sent) == mails
+    assert len({recipient for recipient, _, _ in sent}) == 50
+
+@pytest.mark.asyncio
+async def test_digest_groups_tasks_by_user(stub_upstreams, sent, monkeypatch):
+    '''Тест: дайджест содержит все задачи своего работника и только их'''
+    monkeypatch.setattr(email_settings, "REMINDER_DIGEST", True)
+    stub_upstreams.json("GET /task/read_all",
+                        [task(1, 1), task(2, 2), task(3, 1), task(4, 1), task(5, None)])
+    stub_upstreams.json("GET /employee/1", employee(1))
+    stub_upstreams.json("GET /employee/2", employee(2))
+    await email_service.check_due_tasks()
+    mails = {recipient: (subject, body) for recipient, subject, body in sent}
+    assert len(sent) == 2
+    subject, body = mails["u1@example.com"]
+    assert subject == "Task Due Date Reminder: 3 tasks"
+    assert all(f"'t{task_id}'" in body for task_id in (1, 3, 4)) and "'t2'" not in body
+    subject, body = mails["u2@example.com"]
+    assert subject == "Task Due Date Reminder" and "'t2'" in body
@@ -0,0 +1,58 @@
+'''test_etag.py'''
+
+import httpx
+from starlette.requests import Request
+from etag import encoded_etag, etag_matches, response_etag, upstream_etag
+from passthrough import conditional_response
+
+def make_request(if_none_match=None, accept_encoding=None) -> Request:
+    '''Функция построения запроса с заголовками If-None-Match и Accept-Encoding'''
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    if accept_encoding:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+def test_upstream_etag_prefers_strong_upstream_validator():
+    '''Тест: сильный ETag сервиса используется как есть, слабый заменяется хэшем'''
+    strong = httpx.Response(200, content=b"[]", headers={"etag": '"v1"'})
+    weak = httpx.Response(200, content=b"[]", headers={"etag": 'W/"v1"'})
+    assert upstream_etag(strong) == '"v1"'
+    assert upstream_etag(weak) == upstream_etag(httpx.Response(200, content=b"[]"))
+    assert response_etag(strong, 50, None) != response_etag(strong, 10, None)
+
+def test_etag_matches_list_and_wildcard():
+    '''Тест: If-None-Match сравнивается со списком тегов и с *'''
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+def test_conditional_response_returns_304_on_match():
+    '''Тест: совпавший ETag дает 304 без тела'''
+    upstream = httpx.Response(200, json=[{"id": 1}])
+    first = conditional_response(make_request(), upstream, "tasks")
+    etag = first.headers["etag"]
+    second = conditional_response(make_request(etag), upstream, "tasks")
+    assert first.status_code == 200 and first.body
+    assert second.status_code == 304 and second.body == b""
+    assert second.headers["etag"] == etag
+
+def test_not_modified_only_confirms_same_encoding():
+    '''Тест: ETag сжатого ответа не подтверждает несжатое представление и наоборот'''
+    upstream = httpx.Response(200, json=[{"id": i, "title": "x" * 20} for i in range(100)])
+    gzipped = conditional_response(make_request(accept_encoding="gzip"), upstream, "tasks")
+    identity = conditional_response(make_request(), upstream, "tasks")
+    gzip_etag, identity_etag = gzipped.headers["etag"], identity.headers["etag"]
+    assert gzipped.headers["content-encoding"] == "gzip" and gzip_etag != identity_etag
+    assert conditional_response(make_request(gzip_etag, "gzip"), upstream,
+                                "tasks").status_code == 304
+    assert conditional_response(make_request(gzip_etag), upstream, "tasks").status_code == 200
+    assert conditional_response(make_request(identity_etag, "gzip"), upstream,
+                                "tasks").status_code == 200
+    projected = conditional_response(make_request(accept_encoding="gzip"), upstream,
+                                     "tasks", "id,title")
+    projected_etag = projected.headers["etag"]
+    assert conditional_response(make_request(encoded_etag(projected_etag, "gzip"), "gzip"),
+                                upstream, "tasks", "id,title").status_code == 304
+    assert conditional_response(make_request(projected_etag, "gzip"), upstream,
+                                "tasks", "id,title").status_code == 200
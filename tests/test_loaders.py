@@ -0,0 +1,47 @@
+'''test_loaders.py'''
+
+import pytest
+
+def employee(user_id: int) -> dict:
+    '''Функция данных работника для сервиса-заглушки'''
+    return {"id": user_id, "last_name": "L", "first_name": "F", "patronymic": "P",
+            "email": f"u{user_id}@example.com", "login": f"user{user_id}", "password": "x",
+            "is_supervisor": "no", "is_vacation": "no"}
+
+@pytest.mark.asyncio
+async def test_nested_task_query_batches_relations(gateway, stub_upstreams):
+    '''Тест: 500 задач с исполнителями и проектами - три запроса к сервисам, а не 1001'''
+    stub_upstreams.json("GET /task/read_all", [
+        {"id": i, "title": f"t{i}", "user_id": i % 50, "project_id": i % 20, "type": "dev"}
+        for i in range(500)])
+    stub_upstreams.json("GET /employee/get_all", [employee(i) for i in range(50)])
+    stub_upstreams.json("GET /project/read_all", [
+        {"id": i, "name": f"p{i}", "type": "internal"} for i in range(20)])
+    response = await gateway.post("/graphql", json={
+        "query": "{ allTask { id assignee { login } project { name } } }"})
+    assert response.status_code == 200
+    tasks = response.json()["data"]["allTask"]
+    assert len(tasks) == 500
+    assert tasks[7] == {"id": 7, "assignee": {"login": "user7"}, "project": {"name": "p7"}}
+    assert sorted(stub_upstreams.calls) == ["GET /employee/get_all", "GET /project/read_all",
+                                            "GET /task/read_all"]
+
+@pytest.mark.asyncio
+async def test_subdivision_employees_are_deduplicated_and_missing_is_null(gateway,
+                                                                          stub_upstreams):
+    '''Тест: load_many и load в одном запросе - один запрос на id; 404 - null'''
+    stub_upstreams.json("GET /subdivision/get_all", [
+        {"id": 1, "name": "a", "leader_id": 1, "employee_ids": [1, 2, 3]},
+        {"id": 2, "name": "b", "leader_id": 99, "employee_ids": [2, 3, 3]}])
+    for user_id in (1, 2, 3):
+        stub_upstreams.json(f"GET /employee/{user_id}", employee(user_id))
+    response = await gateway.post("/graphql", json={
+        "query": "{ allSubdivisions { leader { id } employees { id } } }"})
+    assert response.status_code == 200
+    subdivisions = response.json()["data"]["allSubdivisions"]
+    assert subdivisions == [
+        {"leader": {"id": 1}, "employees": [{"id": 1}, {"id": 2}, {"id": 3}]},
+        {"leader": None, "employees": [{"id": 2}, {"id": 3}, {"id": 3}]}]
+    assert sorted(stub_upstreams.calls) == ["GET /employee/1", "GET /employee/2",
+                                            "GET /employee/3", "GET /employee/99",
+                                            "GET /subdivision/get_all"]
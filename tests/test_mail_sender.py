@@ -0,0 +1,101 @@
+'''test_mail_sender.py'''
+
+from typing import List
+import aiosmtplib
+import pytest
+import mail_sender
+from email_config import EmailSettings
+from mail_sender import SMTPSessionPool
+
+class FakeSMTP:
+    '''Класс SMTP-сервера-заглушки: учитывает подключения и письма, отвечает ошибками из очереди'''
+    connects = 0
+    messages: List[str] = []
+    errors: List[Exception] = []
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+
+    async def connect(self):
+        FakeSMTP.connects += 1
+        self.is_connected = True
+
+    async def login(self, username: str, password: str):
+        pass
+
+    async def send_message(self, message):
+        if FakeSMTP.errors:
+            error = FakeSMTP.errors.pop(0)
+            if isinstance(error, aiosmtplib.SMTPServerDisconnected):
+                self.is_connected = False
+            raise error
+        FakeSMTP.messages.append(message["Subject"])
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    '''Функция создания пула SMTP-сессий поверх сервера-заглушки'''
+    monkeypatch.setattr(mail_sender.aiosmtplib, "SMTP", FakeSMTP)
+    FakeSMTP.connects, FakeSMTP.messages, FakeSMTP.errors = 0, [], []
+    settings = EmailSettings(MAIL_USERNAME="user", MAIL_PASSWORD="secret",
+                             MAIL_FROM="noreply@example.com", MAIL_PORT=587,
+                             MAIL_SERVER="smtp.example.com", MAIL_STARTTLS=True,
+                             MAIL_SSL_TLS=False, VALIDATE_CERTS=True, TIMEZONE="UTC")
+
+    def make(size: int = 1, max_messages: int = 50) -> SMTPSessionPool:
+        return SMTPSessionPool(settings, size=size, max_messages_per_session=max_messages)
+    return make
+
+async def send(pool: SMTPSessionPool, subject: str):
+    '''Функция отправки письма через пул'''
+    await pool.send(pool.build_message(subject, ["user@example.com"], "body"))
+
+@pytest.mark.asyncio
+async def test_session_is_reused(make_pool):
+    '''Тест: письма идут через одну сессию, подключение и логин выполняются один раз'''
+    pool = make_pool()
+    for i in range(5):
+        await send(pool, f"m{i}")
+    assert FakeSMTP.messages == ["m0", "m1", "m2", "m3", "m4"]
+    assert FakeSMTP.connects == 1
+
+@pytest.mark.asyncio
+async def test_session_reconnects_after_max_messages(make_pool):
+    '''Тест: после max_messages писем сессия переоткрывается'''
+    pool = make_pool(max_messages=2)
+    for i in range(5):
+        await send(pool, f"m{i}")
+    assert len(FakeSMTP.messages) == 5
+    assert FakeSMTP.connects == 3
+
+@pytest.mark.asyncio
+async def test_dropped_session_is_reconnected_and_message_resent(make_pool):
+    '''Тест: сервер закрыл простаивающую сессию - переподключение и одна повторная отправка'''
+    pool = make_pool()
+    await send(pool, "m0")
+    FakeSMTP.errors = [aiosmtplib.SMTPServerDisconnected("idle timeout")]
+    await send(pool, "m1")
+    assert FakeSMTP.messages == ["m0", "m1"]
+    assert FakeSMTP.connects == 2
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    aiosmtplib.SMTPRecipientsRefused([aiosmtplib.SMTPRecipientRefused(550, "no such user",
+                                                                      "user@example.com")]),
+    aiosmtplib.SMTPResponseException(554, "message rejected"),
+])
+async def test_rejected_message_is_not_retried_and_session_is_kept(make_pool, error):
+    '''Тест: отказ сервера принять письмо не повторяется, исправная сессия остается в пуле'''
+    pool = make_pool()
+    await send(pool, "m0")
+    FakeSMTP.errors = [error]
+    with pytest.raises(type(error)):
+        await send(pool, "m1")
+    await send(pool, "m2")
+    assert FakeSMTP.messages == ["m0", "m2"]
+    assert FakeSMTP.connects == 1
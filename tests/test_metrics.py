@@ -0,0 +1,40 @@
+'''test_metrics.py'''
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from metrics import Counter, Histogram, MetricsMiddleware, registry
+
+def test_histogram_renders_cumulative_buckets():
+    '''Тест: корзины гистограммы накопительные, +Inf равна числу наблюдений'''
+    histogram = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{route="/a"} 3' in lines
+
+def test_counter_escapes_label_values():
+    '''Тест: кавычки в значениях меток экранируются'''
+    counter = Counter("test_total", "Test", ("name",))
+    counter.inc('a"b')
+    assert counter.render() == ['test_total{name="a\\"b"} 1']
+
+@pytest.mark.asyncio
+async def test_middleware_labels_requests_by_route_template():
+    '''Тест: запросы учитываются по шаблону пути, а не по самому пути'''
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+    assert 'gateway_http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' \
+        in registry.render().splitlines()
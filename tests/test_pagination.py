@@ -0,0 +1,45 @@
+'''test_pagination.py'''
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from pagination import decode_cursor, encode_cursor, paginate
+
+def test_cursor_roundtrip():
+    '''Тест: курсор разбирается в тот же id'''
+    assert decode_cursor(encode_cursor(42)) == 42
+
+def test_invalid_cursor_is_rejected():
+    '''Тест: испорченный курсор дает ошибку 400'''
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+def test_paginate_walks_snapshot_in_id_order():
+    '''Тест: страницы идут по id без пропусков и повторов'''
+    response = httpx.Response(200, json=[{"id": i} for i in (5, 3, 1, 4, 2)])
+    first, cursor = paginate(response, 2, None)
+    second, cursor = paginate(response, 2, cursor)
+    third, cursor = paginate(response, 2, cursor)
+    assert [item["id"] for item in first + second + third] == [1, 2, 3, 4, 5]
+    assert cursor is None
+
+def test_items_without_id_are_paged_after_items_with_id():
+    '''Тест: объекты без id не теряются - они идут после объектов с id'''
+    response = httpx.Response(200, json=[{"id": 3}, {"name": "a"}, {"id": 1},
+                                         {"name": "b"}, {"id": 2}, {"name": "c"}])
+    pages, cursor = [], None
+    while True:
+        page, cursor = paginate(response, 2, cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    assert pages == [[{"id": 1}, {"id": 2}], [{"id": 3}, {"name": "a"}],
+                     [{"name": "b"}, {"name": "c"}]]
+
+def test_non_list_collection_is_bad_gateway():
+    '''Тест: тело сервиса не список - ошибка 502'''
+    response = httpx.Response(200, json={"detail": "unexpected"})
+    with pytest.raises(HTTPException) as error:
+        paginate(response, 2, None)
+    assert error.value.status_code == 502
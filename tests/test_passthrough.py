@@ -0,0 +1,151 @@
+'''test_passthrough.py'''
+
+import asyncio
+import gzip
+import httpx
+import orjson
+import pytest
+from fastapi import Response
+from gateway_config import gateway_settings
+from passthrough import composite_response, trusted_response
+
+def test_trusted_route_returns_upstream_body(monkeypatch):
+    '''Тест: доверенный маршрут отдает тело сервиса без разбора'''
+    monkeypatch.setattr(gateway_settings, "TRUSTED_UPSTREAM_ROUTES", {"search_task"})
+    upstream = httpx.Response(200, content=b'[{"id": 1}]',
+                              headers={"content-type": "application/json"})
+    response = trusted_response("search_task", upstream)
+    assert isinstance(response, Response)
+    assert response.body == b'[{"id": 1}]'
+
+def test_untrusted_route_returns_data_for_response_model(monkeypatch):
+    '''Тест: без доверенного режима ответ проверяется через response_model'''
+    monkeypatch.setattr(gateway_settings, "TRUSTED_UPSTREAM_ROUTES", set())
+    upstream = httpx.Response(200, json=[{"id": 1}])
+    assert trusted_response("search_task", upstream) == [{"id": 1}]
+
+def test_composite_response_embeds_bodies_and_errors():
+    '''Тест: тела коллекций вставляются как есть, недоступные - null с ошибкой'''
+    response = composite_response({"tasks": b'[{"id": 1}]', "projects": None},
+                                  {"projects": {"status": 503, "detail": "down"}})
+    assert orjson.loads(response.body) == {
+        "tasks": [{"id": 1}], "projects": None,
+        "errors": {"projects": {"status": 503, "detail": "down"}},
+    }
+
+TASKS = orjson.dumps([{"id": i, "title": f"t{i}"} for i in range(1000)])
+
+class TrackedStream(httpx.AsyncByteStream):
+    '''Класс тела ответа сервиса-заглушки, которое еще не прочитано и помнит закрытие'''
+    def __init__(self, body: bytes):
+        self.body = body
+        self.closed = False
+
+    async def __aiter__(self):
+        for start in range(0, len(self.body), 4096):
+            yield self.body[start:start + 4096]
+
+    async def aclose(self):
+        self.closed = True
+
+@pytest.fixture
+def streaming(monkeypatch):
+    '''Функция включения потоковой передачи коллекции задач'''
+    monkeypatch.setattr(gateway_settings, "PASSTHROUGH_STREAMING_RESOURCES", {"tasks"})
+
+def stream_tasks(stub_upstreams, status_code: int = 200, body: bytes = TASKS,
+                 headers: dict = None) -> list:
+    '''Функция потокового ответа заглушки на /task/read_all; возвращает выданные тела'''
+    streams = []
+
+    def handler(request):
+        stream = TrackedStream(body)
+        streams.append(stream)
+        return httpx.Response(status_code, stream=stream,
+                              headers={"content-type": "application/json", **(headers or {})})
+
+    stub_upstreams.routes["GET /task/read_all"] = handler
+    return streams
+
+@pytest.mark.asyncio
+async def test_streaming_forwards_upstream_encoding(gateway, stub_upstreams, streaming):
+    '''Тест: сжатое сервисом тело передается без распаковки вместе с Content-Encoding'''
+    compressed = gzip.compress(TASKS)
+    streams = stream_tasks(stub_upstreams, body=compressed, headers={
+        "content-encoding": "gzip", "content-length": str(len(compressed)), "etag": '"t1"'})
+    async with gateway.stream("GET", "/task-service/task/read_all",
+                              headers={"accept-encoding": "gzip"}) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"t1"'
+    assert raw == compressed
+    assert streams[0].closed
+
+@pytest.mark.asyncio
+async def test_streaming_decodes_for_client_without_encoding(gateway, stub_upstreams, streaming):
+    '''Тест: клиенту, не принимающему сжатие сервиса, тело отдается распакованным с валидатором'''
+    stream_tasks(stub_upstreams, body=gzip.compress(TASKS), headers={
+        "content-encoding": "gzip", "etag": '"t1"'})
+    response = await gateway.get("/task-service/task/read_all",
+                                 headers={"accept-encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert "etag" in response.headers
+    assert response.content == TASKS
+
+@pytest.mark.asyncio
+async def test_streaming_without_upstream_etag_gets_gateway_validator(gateway, stub_upstreams,
+                                                                       streaming):
+    '''Тест: тело без ETag сервиса получает ETag шлюза, повторный запрос - 304'''
+    stream_tasks(stub_upstreams)
+    headers = {"accept-encoding": "gzip"}
+    first = await gateway.get("/task-service/task/read_all", headers=headers)
+    assert first.status_code == 200 and first.content == TASKS
+    etag = first.headers["etag"]
+    second = await gateway.get("/task-service/task/read_all",
+                               headers={**headers, "if-none-match": etag})
+    assert second.status_code == 304
+
+@pytest.mark.asyncio
+async def test_task_collection_is_coalesced_and_cached_by_default(gateway, stub_upstreams):
+    '''Тест: по умолчанию одновременные запросы задач дают один запрос к сервису'''
+    stub_upstreams.json("GET /task/read_all", [{"id": i} for i in range(100)])
+    responses = await asyncio.gather(*(gateway.get("/task-service/task/read_all")
+                                       for _ in range(20)))
+    assert all(response.status_code == 200 and "etag" in response.headers
+               for response in responses)
+    assert stub_upstreams.calls == ["GET /task/read_all"]
+
+@pytest.mark.asyncio
+async def test_streaming_closes_upstream_on_error_status(gateway, stub_upstreams, streaming):
+    '''Тест: при ответе сервиса не 200 его поток закрывается, клиент получает ошибку'''
+    streams = stream_tasks(stub_upstreams, status_code=404, body=b'{"detail": "gone"}')
+    response = await gateway.get("/task-service/task/read_all")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Could not fetch tasks"}
+    assert len(streams) == 1 and streams[0].closed
+
+@pytest.mark.asyncio
+async def test_streaming_closes_upstream_on_not_modified(gateway, stub_upstreams, streaming):
+    '''Тест: на совпавший If-None-Match отдается 304, поток сервиса закрывается'''
+    streams = stream_tasks(stub_upstreams, headers={"etag": '"t1"'})
+    response = await gateway.get("/task-service/task/read_all",
+                                 headers={"if-none-match": '"t1"',
+                                          "accept-encoding": "identity"})
+    assert response.status_code == 304
+    assert streams[0].closed
+
+@pytest.mark.asyncio
+async def test_write_route_response_follows_response_model(gateway, stub_upstreams):
+    '''Тест: ответ создания задачи проходит через response_model - лишних полей нет'''
+    stub_upstreams.json("POST /task/add", {
+        "id": 7, "title": "t", "description": "d", "due_date": "2026-10-18T09:00:00",
+        "actual_due_date": None, "hours_spent": 0, "user_id": 1, "project_id": 2,
+        "type": "at work", "created_by": "internal"})
+    response = await gateway.post("/task-service/task/add", params={
+        "title": "T", "description": "D", "due_date": "2026-10-18T09:00:00",
+        "project_id": 2, "type": "at work"})
+    assert response.status_code == 200
+    assert set(response.json()) == {"title", "description", "due_date", "actual_due_date",
+                                    "hours_spent", "user_id", "project_id", "type"}
@@ -0,0 +1,40 @@
+'''test_profiling.py'''
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from gateway_config import gateway_settings
+from profiling import ProfilingMiddleware
+
+def make_client() -> httpx.AsyncClient:
+    '''Функция клиента приложения с профилированием'''
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_profile_header_requires_token(monkeypatch):
+    '''Тест: отчет возвращается только на заголовок с верным токеном'''
+    monkeypatch.setattr(gateway_settings, "PROFILING_TOKEN", "secret")
+    async with make_client() as client:
+        profiled = await client.get("/ping", headers={"x-profile": "secret"})
+        rejected = await client.get("/ping", headers={"x-profile": "guess"})
+    assert profiled.headers["content-disposition"].startswith("attachment")
+    assert profiled.headers["x-profile-response-status"] == "200"
+    assert "function calls" in profiled.text
+    assert rejected.json() == {"ok": True}
+
+@pytest.mark.asyncio
+async def test_sampled_requests_are_written_to_directory(monkeypatch, tmp_path):
+    '''Тест: профиль выборочного запроса пишется в каталог, ответ не меняется'''
+    monkeypatch.setattr(gateway_settings, "PROFILING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(gateway_settings, "PROFILING_DIR", str(tmp_path))
+    async with make_client() as client:
+        response = await client.get("/ping")
+    assert response.json() == {"ok": True}
+    assert [path.suffix for path in tmp_path.iterdir()] == [".prof"]
@@ -0,0 +1,21 @@
+'''test_projection.py'''
+
+from projection import LIST_VIEW, parse_fields, project_fields
+
+def test_parse_fields_list_view_hides_password():
+    '''Тест: набор полей для списка работников не содержит пароля'''
+    keys = parse_fields("employees", LIST_VIEW)
+    assert "password" not in keys
+    assert "id" in keys
+
+def test_project_fields_prunes_objects():
+    '''Тест: у объектов остаются только запрошенные поля'''
+    keys = parse_fields("tasks", "id, title,id")
+    data = [{"id": 1, "title": "a", "description": "long"}, {"id": 2}]
+    assert project_fields(data, keys) == [{"id": 1, "title": "a"}, {"id": 2}]
+    assert project_fields({"id": 1, "title": "a"}, ("title",)) == {"title": "a"}
+
+def test_project_fields_without_fields_returns_data():
+    '''Тест: без параметра fields ответ не меняется'''
+    data = [{"id": 1}]
+    assert project_fields(data, parse_fields("tasks", None)) is data
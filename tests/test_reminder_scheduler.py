@@ -0,0 +1,38 @@
+'''test_reminder_scheduler.py'''
+
+import asyncio
+import pytest
+from reminder_scheduler import ReminderScheduler
+
+@pytest.mark.asyncio
+async def test_only_one_scheduler_owns_cron(tmp_path):
+    '''Тест: cron запускается только в процессе, захватившем блокировку'''
+    lock_path = str(tmp_path / "reminders.lock")
+    first = ReminderScheduler(lock_path, retry_interval=0.01)
+    second = ReminderScheduler(lock_path, retry_interval=0.01)
+    try:
+        assert await first.start() is True
+        assert await second.start() is False
+        assert second.is_leader is False
+    finally:
+        await second.stop()
+        await first.stop()
+
+@pytest.mark.asyncio
+async def test_scheduler_takes_over_after_leader_stops(tmp_path):
+    '''Тест: после остановки ведущего cron забирает другой процесс'''
+    lock_path = str(tmp_path / "reminders.lock")
+    first = ReminderScheduler(lock_path, retry_interval=0.01)
+    second = ReminderScheduler(lock_path, retry_interval=0.01)
+    try:
+        await first.start()
+        await second.start()
+        await first.stop()
+        for _ in range(100):
+            if second.is_leader:
+                break
+            await asyncio.sleep(0.01)
+        assert second.is_leader is True
+    finally:
+        await second.stop()
+        await first.stop()
@@ -0,0 +1,66 @@
+'''test_resilience.py'''
+
+import httpx
+import pytest
+from resilience import CircuitBreaker, ResilientTransport, RetryBudget, UpstreamUnavailable
+from tests.conftest import make_policy
+
+def make_client(statuses, policy=None):
+    '''Функция клиента, сервис которого отвечает статусами по очереди'''
+    policy = policy or make_policy()
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1])
+
+    breaker = CircuitBreaker("task", policy)
+    transport = ResilientTransport(httpx.MockTransport(handler), policy, breaker,
+                                   RetryBudget(policy.retry_budget_ratio,
+                                               policy.retry_budget_reserve))
+    return httpx.AsyncClient(transport=transport), calls, breaker
+
+@pytest.mark.asyncio
+async def test_get_is_retried_but_post_is_not():
+    '''Тест: GET повторяется после 503, POST - нет'''
+    client, calls, _ = make_client([503, 200])
+    assert (await client.get("http://task/task/read_all")).status_code == 200
+    assert calls == ["GET", "GET"]
+    calls.clear()
+    assert (await client.post("http://task/task/add")).status_code == 503
+    assert calls == ["POST"]
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast():
+    '''Тест: после порога ошибок вызовы отклоняются без обращения к сервису'''
+    client, calls, breaker = make_client([500], make_policy(retries=0))
+    for _ in range(4):
+        await client.get("http://task/task/read_all")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(UpstreamUnavailable):
+        await client.get("http://task/task/read_all")
+    assert len(calls) == 4
+
+def test_retry_budget_limits_retries():
+    '''Тест: бюджет не дает повторов больше запаса и доли от потока'''
+    budget = RetryBudget(ratio=0.5, reserve=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error, status", [(httpx.ConnectError, 502),
+                                           (httpx.RemoteProtocolError, 502),
+                                           (httpx.ReadTimeout, 504)])
+async def test_upstream_transport_errors_map_to_gateway_statuses(gateway, stub_upstreams,
+                                                                 error, status):
+    '''Тест: сетевая ошибка сервиса дает 502, тайм-аут - 504, а не 500'''
+    def fail(request):
+        raise error("upstream failure", request=request)
+
+    stub_upstreams.routes["POST /project/add"] = fail
+    response = await gateway.post("/task-service/project/add",
+                                  params={"name": "p", "type": "at work"})
+    assert response.status_code == status
@@ -0,0 +1,102 @@
+'''test_response_cache.py'''
+
+import asyncio
+import httpx
+import pytest
+from response_cache import ResponseCache
+
+def make_fetch(counter: dict, body: bytes = b"[]", status_code: int = 200):
+    '''Создает функцию запроса к сервису, считающую вызовы'''
+    async def fetch():
+        counter["calls"] = counter.get("calls", 0) + 1
+        return httpx.Response(status_code, content=body)
+    return fetch
+
+@pytest.mark.asyncio
+async def test_response_cache_hit_after_miss():
+    '''Тест: повторный запрос коллекции отдается из кэша'''
+    cache = ResponseCache(max_bytes=1024, ttls={"tasks": 60}, stale_ttl=0)
+    counter = {}
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter))
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter))
+    assert counter["calls"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["bytes"] == 2
+
+@pytest.mark.asyncio
+async def test_response_cache_does_not_store_errors():
+    '''Тест: ответы с ошибкой не кэшируются'''
+    cache = ResponseCache(max_bytes=1024, ttls={"tasks": 60}, stale_ttl=0)
+    counter = {}
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter, status_code=500))
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter, status_code=500))
+    assert counter["calls"] == 2
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidate_resource():
+    '''Тест: изменение ресурса сбрасывает его записи'''
+    cache = ResponseCache(max_bytes=1024, ttls={"tasks": 60, "projects": 60}, stale_ttl=0)
+    counter = {}
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter))
+    await cache.get_or_fetch("projects", "all", make_fetch(counter))
+    cache.invalidate("tasks")
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter))
+    await cache.get_or_fetch("projects", "all", make_fetch(counter))
+    assert counter["calls"] == 3
+
+@pytest.mark.asyncio
+async def test_response_cache_evicts_by_size():
+    '''Тест: при превышении объема вытесняется самая старая запись'''
+    cache = ResponseCache(max_bytes=10, ttls={"tasks": 60}, stale_ttl=0)
+    counter = {}
+    await cache.get_or_fetch("tasks", "a", make_fetch(counter, body=b"x" * 6))
+    await cache.get_or_fetch("tasks", "b", make_fetch(counter, body=b"x" * 6))
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 6
+
+@pytest.mark.asyncio
+async def test_response_cache_stale_while_revalidate():
+    '''Тест: устаревший ответ отдается, пока идет одно фоновое обновление'''
+    cache = ResponseCache(max_bytes=1024, ttls={"tasks": 0.01}, stale_ttl=60)
+    counter = {}
+    await cache.get_or_fetch("tasks", "all", make_fetch(counter, body=b"old"))
+    await asyncio.sleep(0.02)
+    responses = await asyncio.gather(
+        *(cache.get_or_fetch("tasks", "all", make_fetch(counter, body=b"new")) for _ in range(5)))
+    assert all(response.content == b"old" for response in responses)
+    await asyncio.sleep(0.01)
+    assert counter["calls"] == 2
+    response = await cache.get_or_fetch("tasks", "all", make_fetch(counter))
+    assert response.content == b"new"
+
+@pytest.mark.asyncio
+async def test_response_cache_peek_returns_only_fresh_entries():
+    '''Тест: peek отдает свежую запись и не обращается к сервису'''
+    cache = ResponseCache(max_bytes=1024, ttls={"employees": 0.01}, stale_ttl=60)
+    assert cache.peek("employees", "all") is None
+    await cache.get_or_fetch("employees", "all", make_fetch({}, body=b"[1]"))
+    assert cache.peek("employees", "all").content == b"[1]"
+    await asyncio.sleep(0.02)
+    assert cache.peek("employees", "all") is None
+
+@pytest.mark.asyncio
+async def test_response_cache_counts_derived_data():
+    '''Тест: снимок и сжатая копия ответа учитываются в объеме и вытесняются с записью'''
+    cache = ResponseCache(max_bytes=1024, ttls={"tasks": 60}, stale_ttl=0)
+    response = await cache.get_or_fetch("tasks", "a", make_fetch({}, body=b"x" * 100))
+    cache.charge(response, 100)
+    cache.charge(httpx.Response(200, content=b"[]"), 500)
+    assert cache.stats()["bytes"] == 200
+    cache.invalidate("tasks")
+    assert cache.stats()["bytes"] == 0
+
+@pytest.mark.asyncio
+async def test_response_cache_evicts_when_derived_data_grows():
+    '''Тест: рост производных данных вытесняет старые записи'''
+    cache = ResponseCache(max_bytes=10, ttls={"tasks": 60}, stale_ttl=0)
+    counter = {}
+    await cache.get_or_fetch("tasks", "a", make_fetch(counter, body=b"x" * 4))
+    response = await cache.get_or_fetch("tasks", "b", make_fetch(counter, body=b"x" * 4))
+    cache.charge(response, 4)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 8
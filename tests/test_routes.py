@@ -0,0 +1,114 @@
+'''test_routes.py'''
+
+import httpx
+import pytest
+from gateway_config import gateway_settings
+from router import user_logined
+
+BATCH = "/employee-service/employee/batch"
+
+def employee(user_id: int) -> dict:
+    '''Функция данных работника для сервиса-заглушки'''
+    return {"id": user_id, "last_name": "l", "first_name": "f", "patronymic": "p",
+            "email": f"u{user_id}@example.com", "login": f"user{user_id}", "password": "x",
+            "is_supervisor": "no", "is_vacation": "no"}
+
+@pytest.mark.asyncio
+async def test_batch_deduplicates_ids_and_reports_not_found(gateway, stub_upstreams):
+    '''Тест: повторный id запрашивается один раз, отсутствующие попадают в not_found'''
+    stub_upstreams.json("GET /employee/1", employee(1))
+    stub_upstreams.json("GET /employee/2", employee(2))
+    response = await gateway.get(BATCH, params={"ids": "2,1,2,9,1", "fields": "id,login"})
+    assert response.status_code == 200
+    assert response.json() == {"employees": [{"id": 2, "login": "user2"},
+                                             {"id": 1, "login": "user1"}],
+                               "not_found": [9]}
+    assert sorted(stub_upstreams.calls) == ["GET /employee/1", "GET /employee/2",
+                                            "GET /employee/9"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ids", ["1,x", "", "0,1", "-3"])
+async def test_batch_rejects_malformed_ids(gateway, stub_upstreams, ids):
+    '''Тест: нечисловые, пустые и неположительные id - 400 без запросов к сервису'''
+    response = await gateway.get(BATCH, params={"ids": ids})
+    assert response.status_code == 400
+    assert stub_upstreams.calls == []
+
+@pytest.mark.asyncio
+async def test_batch_rejects_too_many_ids(gateway, stub_upstreams, monkeypatch):
+    '''Тест: больше EMPLOYEE_BATCH_MAX_IDS различных id - 400'''
+    monkeypatch.setattr(gateway_settings, "EMPLOYEE_BATCH_MAX_IDS", 3)
+    assert (await gateway.get(BATCH, params={"ids": "1,2,3,3"})).status_code == 200
+    response = await gateway.get(BATCH, params={"ids": "1,2,3,4"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Too many ids: max 3"}
+
+@pytest.mark.asyncio
+async def test_batch_uses_cached_collection_first(gateway, stub_upstreams):
+    '''Тест: если коллекция работников уже в кэше, набор берется из нее без запросов'''
+    stub_upstreams.json("GET /employee/get_all", [employee(i) for i in range(1, 6)])
+    assert (await gateway.get("/employee-service/employees")).status_code == 200
+    stub_upstreams.calls.clear()
+    response = await gateway.get(BATCH, params={"ids": "5,3,7"})
+    assert [item["id"] for item in response.json()["employees"]] == [5, 3]
+    assert response.json()["not_found"] == [7]
+    assert stub_upstreams.calls == []
+
+def serve_user_collections(stub_upstreams):
+    '''Функция ответов заглушки user-service на коллекции сводки'''
+    stub_upstreams.json("GET /employee/get_all", [employee(1)])
+    stub_upstreams.json("GET /subdivision/get_all", [])
+    stub_upstreams.json("GET /business_and_vacations/get_all", [])
+
+def refuse(request):
+    '''Функция ответа недоступного сервиса: соединение отклонено'''
+    raise httpx.ConnectError("connection refused", request=request)
+
+@pytest.mark.asyncio
+async def test_dashboard_reports_down_service_as_null(gateway, stub_upstreams):
+    '''Тест: недоступный task-service - 200, его коллекции null с причиной в errors'''
+    serve_user_collections(stub_upstreams)
+    stub_upstreams.routes["GET /project/read_all"] = refuse
+    stub_upstreams.routes["GET /task/read_all"] = refuse
+    response = await gateway.get("/dashboard")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["employees"] == [employee(1)]
+    assert body["subdivisions"] == [] and body["vacations"] == []
+    assert body["projects"] is None and body["tasks"] is None
+    assert set(body["errors"]) == {"projects", "tasks"}
+    assert body["errors"]["tasks"]["status"] == 502
+
+@pytest.mark.asyncio
+async def test_dashboard_reports_invalid_json_part_as_error(gateway, stub_upstreams):
+    '''Тест: некорректный JSON коллекции не вставляется в сводку, а попадает в errors'''
+    serve_user_collections(stub_upstreams)
+    stub_upstreams.json("GET /project/read_all", [])
+    stub_upstreams.routes["GET /task/read_all"] = lambda request: httpx.Response(
+        200, content=b'[{"id": 1}', headers={"content-type": "application/json"})
+    response = await gateway.get("/dashboard")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["projects"] == [] and body["tasks"] is None
+    assert body["errors"] == {"tasks": {"status": 502, "detail": "Invalid JSON in tasks"}}
+
+@pytest.mark.asyncio
+async def test_dashboard_with_all_services_down_is_bad_gateway(gateway, stub_upstreams):
+    '''Тест: все коллекции недоступны - 502 с причиной по каждой'''
+    for path in ("/employee/get_all", "/subdivision/get_all",
+                 "/business_and_vacations/get_all", "/project/read_all", "/task/read_all"):
+        stub_upstreams.routes[f"GET {path}"] = refuse
+    response = await gateway.get("/dashboard")
+    assert response.status_code == 502
+    body = response.json()
+    assert all(body[resource] is None for resource in body["errors"])
+    assert len(body["errors"]) == 5
+
+@pytest.mark.parametrize("path", ["/service/cache", "/service/upstreams"])
+@pytest.mark.asyncio
+async def test_service_endpoints_require_token(gateway, path):
+    '''Тест: служебные данные шлюза без токена не отдаются'''
+    from main import app  # pylint: disable=import-outside-toplevel
+    app.dependency_overrides.pop(user_logined)
+    response = await gateway.get(path)
+    assert response.status_code == 401
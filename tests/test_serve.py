@@ -0,0 +1,103 @@
+'''test_serve.py'''
+
+import os
+import serve
+from gateway_config import gateway_settings
+
+def _write(path, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="ascii") as file:
+        file.write(text)
+
+def test_cgroup_v2_quota_limits_cpus(tmp_path):
+    '''Тест: квота cgroup v2 (cpu.max) ограничивает число CPU сверху'''
+    _write(tmp_path / "cpu.max", "150000 100000\n")
+    assert serve._cgroup_cpu_limit(str(tmp_path)) == 1.5
+    assert serve.available_cpus(str(tmp_path)) == min(2, len(os.sched_getaffinity(0)))
+
+def test_cgroup_v1_quota_and_no_quota(tmp_path):
+    '''Тест: квота cgroup v1 учитывается, "max" и -1 означают отсутствие квоты'''
+    _write(tmp_path / "cpu" / "cpu.cfs_quota_us", "300000\n")
+    _write(tmp_path / "cpu" / "cpu.cfs_period_us", "100000\n")
+    assert serve._cgroup_cpu_limit(str(tmp_path)) == 3.0
+    _write(tmp_path / "cpu" / "cpu.cfs_quota_us", "-1\n")
+    assert serve._cgroup_cpu_limit(str(tmp_path)) is None
+    _write(tmp_path / "cpu.max", "max 100000\n")
+    assert serve._cgroup_cpu_limit(str(tmp_path)) is None
+    assert serve.available_cpus(str(tmp_path)) == len(os.sched_getaffinity(0))
+
+def test_worker_count_setting_overrides_cpus(monkeypatch):
+    '''Тест: SERVER_WORKERS задает число воркеров явно'''
+    monkeypatch.setattr(gateway_settings, "SERVER_WORKERS", 3)
+    assert serve.worker_count() == 3
+    monkeypatch.setattr(gateway_settings, "SERVER_WORKERS", 0)
+    assert serve.worker_count() == serve.available_cpus()
+
+class FakeProcess:
+    '''Класс процесса воркера-заглушки'''
+    def __init__(self, pid: int, alive: bool, exitcode=None):
+        self.pid = pid
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.alive = False
+
+class FakeReady:
+    '''Класс признака готовности воркера-заглушки'''
+    def __init__(self, ready: bool):
+        self.ready = ready
+
+    def is_set(self) -> bool:
+        return self.ready
+
+    def wait(self, timeout=None) -> bool:
+        return self.ready
+
+def make_supervisor(monkeypatch, starts: bool = True):
+    '''Функция супервизора, который вместо процессов запускает заглушки
+
+    starts=False - новые воркеры завершаются с кодом 1, не став готовыми.
+    '''
+    supervisor = serve.Supervisor(1)
+    spawned = []
+
+    def spawn():
+        process = FakeProcess(100 + len(spawned), starts, None if starts else 1)
+        worker = serve._Worker(process, FakeReady(starts))
+        spawned.append(worker)
+        supervisor._pool.append(worker)
+        return worker
+
+    monkeypatch.setattr(supervisor, "_spawn", spawn)
+    return supervisor, spawned
+
+def test_failed_worker_is_respawned_after_deadline_without_blocking(monkeypatch):
+    '''Тест: замена воркера, упавшего при старте, ждет срока, но _reap не спит'''
+    def no_sleep(seconds):
+        raise AssertionError(f"supervisor loop blocked for {seconds}s")
+
+    supervisor, spawned = make_supervisor(monkeypatch)
+    supervisor._pool.append(serve._Worker(FakeProcess(1, False, 3), FakeReady(False)))
+    monkeypatch.setattr(serve.time, "sleep", no_sleep)
+    supervisor._reap()
+    assert supervisor._pool == [] and spawned == []
+    assert supervisor._respawn_at > serve.time.monotonic()
+    supervisor._respawn_at = 0.0
+    supervisor._reap()
+    assert supervisor._pool == spawned and len(spawned) == 1
+
+def test_restart_aborts_with_reason_when_new_worker_dies(monkeypatch, capsys):
+    '''Тест: новый воркер упал при старте - перезапуск прерывается, старый работает'''
+    supervisor, _ = make_supervisor(monkeypatch, starts=False)
+    old = serve._Worker(FakeProcess(1, True), FakeReady(True))
+    supervisor._pool.append(old)
+    supervisor.restart()
+    assert supervisor._pool == [old] and old.process.alive
+    assert "exited with code 1 during startup, restart aborted" in capsys.readouterr().out
@@ -0,0 +1,73 @@
+'''test_singleflight.py'''
+
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls():
+    '''Тест: одновременные вызовы с одним ключом выполняются один раз'''
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "data"
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+    assert results == ["data"] * 10
+    assert calls == 1
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_singleflight_propagates_errors_to_all_waiters():
+    '''Тест: исключение получают все ожидающие'''
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_singleflight_cancelled_waiter_does_not_cancel_others():
+    '''Тест: отмена одного ожидающего не отменяет общий вызов'''
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "data"
+
+    first = asyncio.ensure_future(flight.do("key", fetch))
+    second = asyncio.ensure_future(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "data"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+@pytest.mark.asyncio
+async def test_singleflight_cancels_call_when_all_waiters_leave():
+    '''Тест: общий вызов отменяется, когда ушли все ожидающие'''
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.ensure_future(flight.do("key", fetch))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(flight) == 0
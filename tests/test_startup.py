@@ -0,0 +1,32 @@
+'''test_startup.py'''
+
+import os
+import subprocess
+import sys
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_main_is_side_effect_free(tmp_path):
+    '''Тест: импорт main не читает настройки почты и не строит схему GraphQL'''
+    code = ("import sys, main; "
+            "lazy = [m for m in ('graphql_schema', 'strawberry', 'fastapi_mail', "
+            "'apscheduler.schedulers.asyncio') if m in sys.modules]; "
+            "assert not lazy, lazy; "
+            "assert object.__getattribute__(main.email_settings, '_settings') is None")
+    # Каталог без .env: настройки почты при импорте прочитаны быть не должны
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True,
+                            text=True, env=dict(os.environ, PYTHONPATH=ROOT), check=False)
+    assert result.returncode == 0, result.stderr
+
+@pytest.mark.asyncio
+async def test_graphql_schema_is_built_on_first_request():
+    '''Тест: /graphql отвечает, схема собирается при первом запросе'''
+    from main import app, lazy_graphql  # pylint: disable=import-outside-toplevel
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://gateway") as client:
+        response = await client.post("/graphql", json={"query": "{ __typename }"})
+    assert response.status_code == 200
+    assert response.json() == {"data": {"__typename": "Query"}}
+    assert lazy_graphql.load() is lazy_graphql.load()
@@ -0,0 +1,49 @@
+'''test_token_cache.py'''
+
+import time
+from schemas import Employee
+from token_cache import TokenCache
+
+def make_employee(user_id: int) -> Employee:
+    '''Создает работника для тестов кэша'''
+    return Employee(id=user_id, login=f"user{user_id}", is_supervisor="no", is_vacation="no")
+
+def test_token_cache_hit_and_miss():
+    '''Тест попадания и промаха кэша токенов'''
+    cache = TokenCache(max_size=10, max_age=60)
+    key = cache.make_key("user1", "token")
+    assert cache.get(key) is None
+    cache.put(key, make_employee(1))
+    assert cache.get(key).id == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_token_cache_respects_token_exp():
+    '''Тест: запись не живет дольше срока токена'''
+    cache = TokenCache(max_size=10, max_age=60)
+    key = cache.make_key("user1", "token")
+    cache.put(key, make_employee(1), token_exp=time.time() - 1)
+    assert cache.get(key) is None
+
+def test_token_cache_lru_eviction():
+    '''Тест вытеснения самой старой записи'''
+    cache = TokenCache(max_size=2, max_age=60)
+    keys = [cache.make_key(f"user{i}", f"token{i}") for i in range(3)]
+    cache.put(keys[0], make_employee(1))
+    cache.put(keys[1], make_employee(2))
+    cache.get(keys[0])
+    cache.put(keys[2], make_employee(3))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+def test_token_cache_invalidate_user():
+    '''Тест удаления всех токенов работника'''
+    cache = TokenCache(max_size=10, max_age=60)
+    first = cache.make_key("user1", "token-a")
+    second = cache.make_key("user1", "token-b")
+    cache.put(first, make_employee(1))
+    cache.put(second, make_employee(1))
+    cache.invalidate_user(1)
+    assert cache.get(first) is None
+    assert cache.get(second) is None
@@ -0,0 +1,97 @@
+'''token_cache.py'''
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from gateway_config import gateway_settings
+from metrics import CallbackMetric, registry
+from schemas import Employee
+
+class TokenCache:
+    '''Класс кэша проверенных токенов: токен -> работник из user-service'''
+    def __init__(self, max_size: int, max_age: float):
+        self.max_size = max_size
+        self.max_age = max_age
+        # ключ -> (момент истечения по time.monotonic, работник)
+        self._entries: "OrderedDict[str, Tuple[float, Employee]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(subject: str, token: str) -> str:
+        '''Функция построения ключа кэша из sub и хэша токена'''
+        return f"{subject}:{hashlib.sha256(token.encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Employee]:
+        '''Функция получения работника по ключу токена'''
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, employee = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return employee
+
+    def put(self, key: str, employee: Employee, token_exp: Optional[float] = None):
+        '''Функция сохранения работника до exp токена или max_age, что наступит раньше'''
+        if self.max_size <= 0:
+            return
+        ttl = self.max_age
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, employee)
+        self._keys_by_user.setdefault(employee.id, set()).add(key)
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate_user(self, user_id: int):
+        '''Функция удаления всех токенов работника (после изменения или удаления)'''
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._remove(key)
+
+    def clear(self):
+        '''Функция очистки кэша'''
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].id
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def stats(self) -> dict:
+        '''Функция статистики попаданий кэша'''
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+token_cache = TokenCache(gateway_settings.TOKEN_CACHE_MAX_SIZE,
+                         gateway_settings.TOKEN_CACHE_MAX_AGE)
+
+registry.register(CallbackMetric(
+    "gateway_token_cache_requests_total", "Token cache lookups by result", ("result",),
+    lambda: [(("hit",), token_cache.hits), (("miss",), token_cache.misses)], kind="counter"))
+registry.register(CallbackMetric(
+    "gateway_token_cache_entries", "Cached verified tokens", (),
+    lambda: [((), len(token_cache._entries))]))
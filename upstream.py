@@ -0,0 +1,210 @@
+'''upstream.py'''
+
+import functools
+import ssl
+from typing import Dict, Iterable, List, Optional
+import httpx
+from balancer import BalancingTransport, LoadBalancer
+from compression import supported_encodings
+from gateway_config import GatewaySettings, gateway_settings
+from metrics import CallbackMetric, InstrumentedTransport, pool_connections, registry
+from resilience import CircuitBreaker, ResilientTransport, RetryBudget, UpstreamPolicy
+from singleflight import SingleFlight
+
+def _http2_available() -> bool:
+    '''Функция проверки наличия пакета h2 для HTTP/2'''
+    try:
+        import h2  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    return True
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context() -> ssl.SSLContext:
+    '''Функция общего для всех клиентов SSL-контекста: загрузка сертификатов
+    (десятки мс) выполняется один раз на процесс, а не на каждый пул'''
+    return httpx.create_ssl_context()
+
+def upstream_host(name: str) -> str:
+    '''Функция логического имени хоста сервиса'''
+    return f"{name}-service"
+
+def upstream_replicas(name: str) -> List[str]:
+    '''Функция адресов реплик сервиса: из UPSTREAM_REPLICAS или, если сервиса там
+    нет, адреса по умолчанию (окружение может задать реплики только одного сервиса)'''
+    replicas = gateway_settings.UPSTREAM_REPLICAS
+    if name not in replicas:
+        replicas = GatewaySettings.model_fields["UPSTREAM_REPLICAS"].default
+    return replicas.get(name, [])
+
+class UpstreamClients:
+    '''Класс долгоживущих http-клиентов, по одному на каждый сервис
+
+    Реестр сервисов: модули обращаются к логическому адресу сервиса (url), а
+    транспорт клиента распределяет запросы по репликам из UPSTREAM_REPLICAS.
+    '''
+    def __init__(self, names: Iterable[str]):
+        self.names = tuple(names)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # Подмененные транспорты сервисов (заглушки бенчмарков и тестов)
+        self._transports: Dict[str, httpx.AsyncBaseTransport] = {}
+        # Политика, автомат и бюджет повторов живут дольше клиента: пересоздание
+        # клиента не сбрасывает состояние сервиса
+        self.policies = {name: UpstreamPolicy.for_upstream(name) for name in self.names}
+        self.breakers = {name: CircuitBreaker(name, self.policies[name]) for name in self.names}
+        self.budgets = {name: RetryBudget(self.policies[name].retry_budget_ratio,
+                                          self.policies[name].retry_budget_reserve)
+                        for name in self.names}
+        self.balancers = {name: LoadBalancer(name, upstream_replicas(name),
+                                             gateway_settings.UPSTREAM_BALANCER)
+                          for name in self.names}
+
+    def url(self, name: str) -> str:
+        '''Функция базового адреса сервиса для запросов через его клиент'''
+        if name not in self.names:
+            raise KeyError(f"Unknown upstream: {name}")
+        return f"http://{upstream_host(name)}"
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        '''Функция создания клиента с пулом соединений и политикой вызовов сервиса'''
+        limits = httpx.Limits(
+            max_connections=gateway_settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=gateway_settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=gateway_settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        http2 = gateway_settings.UPSTREAM_HTTP2
+        if http2 and not _http2_available():
+            print(f"HTTP/2 for {name} disabled: package 'h2' is not installed")
+            http2 = False
+        # Тела сервисов запрашиваются сжатыми: канал до сервисов - узкое место
+        headers = {"accept-encoding": ", ".join(supported_encodings())}
+        policy = self.policies[name]
+        base = self._transports.get(name) or httpx.AsyncHTTPTransport(
+            verify=_ssl_context(), limits=limits, http2=http2)
+        # Клиент сервиса разрешает логические адреса всех сервисов реестра
+        balanced = BalancingTransport(base, {upstream_host(upstream): balancer
+                                             for upstream, balancer in self.balancers.items()})
+        transport = ResilientTransport(InstrumentedTransport(balanced, name),
+                                       policy, self.breakers[name], self.budgets[name])
+        return httpx.AsyncClient(transport=transport, timeout=policy.timeout(), headers=headers)
+
+    async def set_transport(self, name: str, transport: Optional[httpx.AsyncBaseTransport]):
+        '''Функция подмены сетевого транспорта сервиса (None - вернуть сетевой)
+
+        Политика вызовов, балансировка и метрики остаются: подменяется только нижний уровень.
+        Клиент пересоздается при следующем обращении.
+        '''
+        if name not in self.names:
+            raise KeyError(f"Unknown upstream: {name}")
+        if transport is None:
+            self._transports.pop(name, None)
+        else:
+            self._transports[name] = transport
+        client = self._clients.pop(name, None)
+        if client is not None:
+            await client.aclose()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        '''Функция получения клиента сервиса (создается при первом обращении)'''
+        if name not in self.names:
+            raise KeyError(f"Unknown upstream: {name}")
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    @property
+    def user(self) -> httpx.AsyncClient:
+        '''Клиент user-service'''
+        return self.get("user")
+
+    @property
+    def task(self) -> httpx.AsyncClient:
+        '''Клиент task-service'''
+        return self.get("task")
+
+    async def start(self):
+        '''Функция открытия клиентов при старте приложения'''
+        for name in self.names:
+            self.get(name)
+
+    def stats(self) -> dict:
+        '''Функция состояния сервисов: автоматы, повторы и политики'''
+        result = {}
+        for name in self.names:
+            result[name] = {
+                "breaker": self.breakers[name].stats(),
+                "replicas": self.balancers[name].stats(),
+                "retries": self.budgets[name].spent,
+                "retry_budget": round(self.budgets[name].tokens, 2),
+                "policy": self.policies[name].as_dict(),
+            }
+        return result
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        '''Функция числа соединений пулов сервисов: занятые и свободные'''
+        return {name: pool_connections(getattr(self._clients.get(name), "_transport", None))
+                for name in self.names}
+
+    async def close(self):
+        '''Функция закрытия клиентов и их соединений при остановке приложения'''
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+upstreams = UpstreamClients(("user", "task"))
+
+registry.register(CallbackMetric(
+    "gateway_upstream_breaker_state", "Circuit breaker state (1 for the current state)",
+    ("upstream", "state"),
+    lambda: [((name, state), int(breaker.state == state))
+             for name, breaker in upstreams.breakers.items()
+             for state in (breaker.CLOSED, breaker.OPEN, breaker.HALF_OPEN)]))
+registry.register(CallbackMetric(
+    "gateway_upstream_breaker_rejected_total", "Calls rejected by an open circuit breaker",
+    ("upstream",),
+    lambda: [((name,), breaker.rejected) for name, breaker in upstreams.breakers.items()],
+    kind="counter"))
+registry.register(CallbackMetric(
+    "gateway_upstream_retries_total", "Upstream retries", ("upstream",),
+    lambda: [((name,), budget.spent) for name, budget in upstreams.budgets.items()],
+    kind="counter"))
+registry.register(CallbackMetric(
+    "gateway_upstream_pool_connections", "Upstream pool connections by state",
+    ("upstream", "state"),
+    lambda: [((name, state), count) for name, pool in upstreams.pool_stats().items()
+             for state, count in pool.items()]))
+registry.register(CallbackMetric(
+    "gateway_upstream_replica_healthy", "Upstream replica is in rotation (not ejected)",
+    ("upstream", "replica"),
+    lambda: [((name, str(replica.url)), int(replica.healthy))
+             for name, balancer in upstreams.balancers.items() for replica in balancer.replicas]))
+registry.register(CallbackMetric(
+    "gateway_upstream_replica_outstanding", "Requests in flight to an upstream replica",
+    ("upstream", "replica"),
+    lambda: [((name, str(replica.url)), replica.outstanding)
+             for name, balancer in upstreams.balancers.items() for replica in balancer.replicas]))
+registry.register(CallbackMetric(
+    "gateway_upstream_replica_ejections_total", "Upstream replica ejections",
+    ("upstream", "replica"),
+    lambda: [((name, str(replica.url)), replica.ejections)
+             for name, balancer in upstreams.balancers.items() for replica in balancer.replicas],
+    kind="counter"))
+
+# Одинаковые одновременные GET-запросы к сервисам выполняются один раз
+inflight_gets = SingleFlight()
+
+async def coalesced_get(client: httpx.AsyncClient, url: str,
+                        params: Optional[dict] = None) -> httpx.Response:
+    '''Функция GET-запроса к сервису с объединением одинаковых одновременных запросов'''
+    request = client.build_request("GET", url, params=params)
+    return await inflight_gets.do(("GET", str(request.url)), lambda: client.send(request))
+
+def get_user_client() -> httpx.AsyncClient:
+    '''Зависимость: общий клиент user-service'''
+    return upstreams.user
+
+def get_task_client() -> httpx.AsyncClient:
+    '''Зависимость: общий клиент task-service'''
+    return upstreams.task